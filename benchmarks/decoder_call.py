@@ -0,0 +1,50 @@
+"""Microbenchmark for the per event overhead of calling decoders.
+
+A no-op decoder is used, so that the measured time is dominated by
+parsing the header and by calling the decoder with its arguments.
+
+Run with:
+
+    python benchmarks/decoder_call.py
+"""
+
+import timeit
+
+from mutwo import mmml_converters
+
+EVENT_COUNT = 10000
+REPEAT = 5
+
+
+def noop(event_tuple, duration=1, pitch="", volume="mf", indicator=None):
+    return event_tuple
+
+
+mmml_converters.register_decoder(noop)
+
+HEADER_TUPLE = ("noop 1/4 c mf", "noop _ d", "noop 1/8 _ _ x", "noop")
+NODE = mmml_converters.MMMLExpressionToEvent().parse(
+    "\n".join(
+        ["noop"]
+        + [
+            f"{mmml_converters.constants.INDENTATION}{HEADER_TUPLE[i % 4]}"
+            for i in range(EVENT_COUNT)
+        ]
+    )
+)
+
+
+def main():
+    for use_defaults in (False, True):
+        c = mmml_converters.MMMLExpressionToEvent(use_defaults=use_defaults)
+        duration = min(
+            timeit.repeat(lambda: c.materialize(NODE), number=1, repeat=REPEAT)
+        )
+        print(
+            f"use_defaults={use_defaults}: "
+            f"{(duration / EVENT_COUNT) * 1e6:.3f} µs per event"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Microbenchmark for encoding indicator collections.
+
+In the sparse case no indicator is active, which is true for almost all
+notes of a typical score. In the dense case several indicators are set,
+and each note uses different values, so that the cache can't help.
+
+Run with:
+
+    python benchmarks/indicator_collection.py
+"""
+
+import timeit
+
+from mutwo import mmml_converters
+from mutwo import music_parameters
+
+NOTE_COUNT = 2000
+REPEAT = 5
+
+
+def sparse():
+    return [music_parameters.PlayingIndicatorCollection() for _ in range(NOTE_COUNT)]
+
+
+def dense():
+    indicator_collection_list = []
+    for i in range(NOTE_COUNT):
+        indicator_collection = music_parameters.PlayingIndicatorCollection()
+        indicator_collection.tie.is_active = True
+        indicator_collection.articulation.name = ">"
+        indicator_collection.fermata.type = "fermata"
+        indicator_collection.cue.index = i
+        indicator_collection_list.append(indicator_collection)
+    return indicator_collection_list
+
+
+def main():
+    for case in (sparse, dense):
+        indicator_collection_list = case()
+        for cache_size in (0, 256):
+            c = mmml_converters.IndicatorCollectionToMMMLString(cache_size)
+            duration = min(
+                timeit.repeat(
+                    lambda: [c.convert(i) for i in indicator_collection_list],
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            print(
+                f"{case.__name__} (cache_size={cache_size}): "
+                f"{(duration / NOTE_COUNT) * 1e6:.3f} µs per collection"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -47,3 +47,8 @@ from . import configurations
 from .codes import *
 from .frontends import *
 from .backends import *
+from .asynchronous import *
+from .compiled import *
+from .incremental import *
+from .columnar import *
+from .positions import *
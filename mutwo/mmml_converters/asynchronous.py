@@ -0,0 +1,219 @@
+"""Decode and encode MMML files without blocking an :mod:`asyncio` loop"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import typing
+
+from mutwo import core_converters
+from mutwo import core_events
+from mutwo import mmml_converters
+
+from .frontends import _iter_line, _iter_node, _open
+
+__all__ = ("AsyncMMMLFileToEvent", "AsyncEventToMMMLFile")
+
+
+T = typing.TypeVar("T")
+
+
+class _AsyncConverter(core_converters.abc.Converter):
+    """Run the steps of a conversion in an executor.
+
+    Each step is a separate job, so the loop can run other tasks between
+    two steps. If the conversion is cancelled, the running step is
+    finished, but no further step is started.
+    """
+
+    def __init__(
+        self,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        max_concurrency: typing.Optional[int] = None,
+        chunk_event_count: int = 1000,
+    ):
+        self._executor = executor
+        self._semaphore = (
+            None if max_concurrency is None else asyncio.Semaphore(max_concurrency)
+        )
+        self._chunk_event_count = chunk_event_count
+
+    async def _run(self, step_iterator: typing.Generator[None, None, T]) -> T:
+        if self._semaphore is None:
+            return await self._run_step_iterator(step_iterator)
+        async with self._semaphore:
+            return await self._run_step_iterator(step_iterator)
+
+    async def _run_step_iterator(
+        self, step_iterator: typing.Generator[None, None, T]
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                future = loop.run_in_executor(self._executor, _step, step_iterator)
+                try:
+                    is_done, value = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # A running step can't be interrupted. The generator
+                    # can only be closed after the step is done.
+                    while not future.done():
+                        with contextlib.suppress(asyncio.CancelledError):
+                            await asyncio.wait((future,))
+                    raise
+                if is_done:
+                    return value
+        finally:
+            # Release files of unfinished conversions.
+            step_iterator.close()
+
+
+def _step(step_iterator: typing.Generator[None, None, T]) -> tuple[bool, T]:
+    """Run next step and return if the generator is done and its result"""
+    try:
+        next(step_iterator)
+    except StopIteration as stop:
+        return True, stop.value
+    return False, None
+
+
+class AsyncMMMLFileToEvent(_AsyncConverter):
+    """Decode a MMML file without blocking the :mod:`asyncio` loop.
+
+    :param converter: Defines how MMML is decoded (e.g. if defaults are
+        used). Its ``max_workers`` are ignored. As long as it doesn't keep
+        defaults, one converter can be shared by multiple async
+        converters. If ``None`` a new :class:`MMMLFileToEvent` is used.
+        Default to ``None``.
+    :type converter: typing.Optional[MMMLFileToEvent]
+    :param executor: The executor in which files are read, parsed and
+        decoded. Steps of a conversion depend on each other, so this needs
+        to be a thread pool. If ``None`` the default executor of the loop
+        is used. Default to ``None``.
+    :type executor: typing.Optional[concurrent.futures.Executor]
+    :param max_concurrency: How many files are decoded at the same time
+        at most. Further conversions wait until a running conversion is
+        done. If ``None`` there is no limit. Default to ``None``.
+    :type max_concurrency: typing.Optional[int]
+    :param chunk_event_count: How many expressions are decoded (or how
+        many lines are parsed) in one executor job. Between two jobs the
+        loop can run other tasks and the conversion can be cancelled.
+        Default to 1000.
+    :type chunk_event_count: int
+
+    **Example:**
+
+    >>> import asyncio
+    >>> import io
+    >>> from mutwo import mmml_converters
+    >>> c = mmml_converters.AsyncMMMLFileToEvent()
+    >>> asyncio.run(c.convert(io.StringIO("cns\\n    r 1/4")))
+    Consecution([NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf))])
+    """
+
+    def __init__(
+        self,
+        converter: typing.Optional[mmml_converters.MMMLFileToEvent] = None,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        max_concurrency: typing.Optional[int] = None,
+        chunk_event_count: int = 1000,
+    ):
+        super().__init__(executor, max_concurrency, chunk_event_count)
+        self._converter = converter or mmml_converters.MMMLFileToEvent()
+
+    async def convert(
+        self, file: mmml_converters.MMMLFile, **kwargs
+    ) -> core_events.abc.Event:
+        """Convert MMML file to a mutwo event.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+        """
+        return await self._run(self._iter_convert_step(file, kwargs))
+
+    def _iter_convert_step(
+        self, file: mmml_converters.MMMLFile, kwargs: dict
+    ) -> typing.Generator[None, None, core_events.abc.Event]:
+        c, chunk_event_count = self._converter, self._chunk_event_count
+        with _open(file) as f:
+            node_iterator = _iter_node(_iter_line(f, kwargs))
+            root = next(node_iterator)
+            line_number = root.line_number
+            for node in node_iterator:
+                root.child_list.append(node)
+                if node.line_number - line_number >= chunk_event_count:
+                    line_number = node.line_number
+                    yield
+        default_dict = c._get_default_dict()
+        event = yield from c._iter_materialize_step(
+            root, default_dict, chunk_event_count
+        )
+        c._keep_default_dict(default_dict)
+        return event
+
+
+class AsyncEventToMMMLFile(_AsyncConverter):
+    """Encode an event to a MMML file without blocking the :mod:`asyncio` loop.
+
+    :param converter: Defines how the file is written (e.g. if it's
+        compressed). If ``None`` a new :class:`EventToMMMLFile` is used.
+        Default to ``None``.
+    :type converter: typing.Optional[EventToMMMLFile]
+    :param executor: The executor in which events are encoded and
+        written. Steps of a conversion depend on each other, so this needs
+        to be a thread pool. If ``None`` the default executor of the loop
+        is used. Default to ``None``.
+    :type executor: typing.Optional[concurrent.futures.Executor]
+    :param max_concurrency: How many files are encoded at the same time
+        at most. Further conversions wait until a running conversion is
+        done. If ``None`` there is no limit. Default to ``None``.
+    :type max_concurrency: typing.Optional[int]
+    :param chunk_event_count: How many lines are encoded in one executor
+        job. Between two jobs the loop can run other tasks and the
+        conversion can be cancelled. Default to 1000.
+    :type chunk_event_count: int
+
+    If the conversion is cancelled or fails, atomic writes leave an
+    already existing file untouched (see :class:`EventToMMMLFile`).
+
+    **Example:**
+
+    >>> import asyncio
+    >>> import io
+    >>> from mutwo import core_events, mmml_converters
+    >>> f = io.BytesIO()
+    >>> c = mmml_converters.AsyncEventToMMMLFile()
+    >>> asyncio.run(c.convert(core_events.Consecution(), f))
+    >>> f.getvalue()
+    b'cns\\n'
+    """
+
+    def __init__(
+        self,
+        converter: typing.Optional[mmml_converters.EventToMMMLFile] = None,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        max_concurrency: typing.Optional[int] = None,
+        chunk_event_count: int = 1000,
+    ):
+        super().__init__(executor, max_concurrency, chunk_event_count)
+        self._converter = converter or mmml_converters.EventToMMMLFile()
+
+    async def convert(
+        self,
+        event: core_events.abc.Event,
+        file: typing.Union[str, os.PathLike, typing.BinaryIO],
+    ):
+        """Encode event to a MMML file.
+
+        :param event: The event which is encoded.
+        :type event: core_events.abc.Event
+        :param file: Path of the MMML file or a binary file object.
+        :type file: typing.Union[str, os.PathLike, typing.BinaryIO]
+        """
+        await self._run(
+            self._converter._iter_convert_step(event, file, self._chunk_event_count)
+        )
@@ -1,12 +1,33 @@
+import dataclasses
+import functools
+import gzip
+import itertools
+import multiprocessing
+import operator
+import os
+import re
+import secrets
+import shutil
+import typing
+
 from mutwo import core_converters
 from mutwo import core_events
 from mutwo import core_parameters
 from mutwo import mmml_converters
+from mutwo import mmml_utilities
 from mutwo import music_parameters
 
+from .codes import _encode
+
 __all__ = (
     "EventToMMMLExpression",
+    "EventToMMMLFile",
+    "MMMLHeaderAndBlock",
+    "DeduplicationInfo",
     "encode_event",
+    "render_encoded",
+    "write_event",
+    "MMMLSink",
     "DurationToMMMLString",
     "TempoToMMMLString",
     "PitchToMMMLString",
@@ -17,13 +38,591 @@ __all__ = (
 )
 
 
+MMMLSink: typing.TypeAlias = typing.Union[typing.TextIO, list[str]]
+
+
 class EventToMMMLExpression(core_converters.abc.Converter):
+    """Encode event to a MMML expression.
+
+    :param deduplicate: If ``True`` each distinct subtree of the event is
+        encoded only once. Repetitions of a subtree (the same event object
+        or an event with the same MMML expression) reuse its text. This
+        makes encoding of pieces which repeat the same material again and
+        again much faster, but the texts of all distinct subtrees are kept
+        in memory (which can be a lot for very deeply nested events).
+        Statistics of the last conversion are available at
+        :attr:`deduplication_info`. Default to ``False``.
+    :type deduplicate: bool
+    :param max_workers: If set, big events are encoded in parallel by
+        this many workers: the events in the block of the root event (e.g.
+        the voices of a :class:`mutwo.core_events.Concurrence` or the bars
+        of a long :class:`mutwo.core_events.Consecution`) are split into
+        chunks, which are encoded independently. The resulting expression
+        is the same as if it would have been encoded serially. Can't be
+        combined with ``deduplicate``. Default to ``None``.
+    :type max_workers: typing.Optional[int]
+    :param use_processes: If ``True`` the workers are processes, otherwise
+        threads. Events are pickled and custom encoders need to be
+        registered in the worker processes, too (unless the worker
+        processes are forked). Default to ``True``.
+    :type use_processes: bool
+    :param parallel_threshold: Events with less nested events are
+        always encoded serially. Default to 2000.
+    :type parallel_threshold: int
+    :param chunk_event_count: How many nested events each chunk which is
+        passed to the executor contains at least (unless it's the last
+        chunk). Default to 1000.
+    :type chunk_event_count: int
+    :param mp_context: The context with which worker processes are
+        started. If ``None`` the default start method of the platform is
+        used. Forked workers (``multiprocessing.get_context("fork")``)
+        inherit the event and don't need to unpickle it, but forking a
+        process which runs multiple threads can deadlock. Default to
+        ``None``.
+    :type mp_context: typing.Optional[multiprocessing.context.BaseContext]
+
+    **Example:**
+
+    >>> from mutwo import core_events, mmml_converters, music_events
+    >>> bar = core_events.Consecution([music_events.NoteLike('c', 1)])
+    >>> c = mmml_converters.EventToMMMLExpression(deduplicate=True)
+    >>> print(c.convert(core_events.Consecution([bar, bar, bar])))
+    cns
+    <BLANKLINE>
+        cns
+    <BLANKLINE>
+            n 1 c4 _ _ _
+    <BLANKLINE>
+        cns
+    <BLANKLINE>
+            n 1 c4 _ _ _
+    <BLANKLINE>
+        cns
+    <BLANKLINE>
+            n 1 c4 _ _ _
+    <BLANKLINE>
+    <BLANKLINE>
+    >>> c.deduplication_info
+    DeduplicationInfo(event_count=7, encoded_event_count=3, unique_subtree_count=3, reused_subtree_count=2)
+    """
+
+    def __init__(
+        self,
+        deduplicate: bool = False,
+        max_workers: typing.Optional[int] = None,
+        use_processes: bool = True,
+        parallel_threshold: int = 2000,
+        chunk_event_count: int = 1000,
+        mp_context: typing.Optional[multiprocessing.context.BaseContext] = None,
+    ):
+        if deduplicate and max_workers is not None:
+            raise ValueError("Deduplication can't be combined with parallel encoding.")
+        self._deduplicate = deduplicate
+        self._max_workers = max_workers
+        self._use_processes = use_processes
+        self._parallel_threshold = parallel_threshold
+        self._chunk_event_count = chunk_event_count
+        self._mp_context = mp_context
+        self.deduplication_info: typing.Optional[DeduplicationInfo] = None
+
     def convert(self, event: core_events.abc.Event) -> mmml_converters.MMMLExpression:
+        if self._deduplicate:
+            mmml, self.deduplication_info = _encode_event_deduplicated(event)
+            return mmml
+        if self._max_workers is not None:
+            return _encode_event_in_parallel(
+                event,
+                self._max_workers,
+                self._use_processes,
+                self._parallel_threshold,
+                self._chunk_event_count,
+                self._mp_context,
+            )
         return encode_event(event)
 
+    def write(self, event: core_events.abc.Event, sink: MMMLSink):
+        """Write MMML expression of event to a text sink.
+
+        :param event: The event which is encoded.
+        :type event: core_events.abc.Event
+        :param sink: A text file object (or anything else with a ``write``
+            method) or a list to which chunks of the expression are appended.
+        :type sink: typing.Union[typing.TextIO, list[str]]
+
+        **Example:**
+
+        >>> import io
+        >>> from mutwo import core_events, mmml_converters, music_events
+        >>> f = io.StringIO()
+        >>> c = mmml_converters.EventToMMMLExpression()
+        >>> c.write(core_events.Consecution([music_events.NoteLike('c', 1)]), f)
+        >>> print(f.getvalue())
+        cns
+        <BLANKLINE>
+            n 1 c4 _ _ _
+        <BLANKLINE>
+        """
+        if self._deduplicate or self._max_workers is not None:
+            mmml = self.convert(event)
+            if isinstance(sink, list):
+                sink.append(mmml)
+            else:
+                sink.write(mmml)
+        else:
+            write_event(event, sink)
+
+
+class EventToMMMLFile(core_converters.abc.Converter):
+    """Encode event and write its MMML expression to a file.
+
+    :param buffer_size: How many bytes are collected before they are
+        written to the file. Default to 65536.
+    :type buffer_size: int
+    :param compress: If ``True`` the file is compressed with gzip. Such a
+        file can be decoded with :class:`MMMLFileToEvent` by passing
+        ``gzip.open(path, "rt")``. Default to ``False``.
+    :type compress: bool
+    :param atomic: If ``True`` and if the file is given as a path, the
+        expression is written to a temporary file in the same directory
+        first. Only after the event has been encoded completely, the
+        temporary file replaces the target file. So if encoding fails,
+        an already existing file stays untouched. Default to ``True``.
+    :type atomic: bool
+
+    Memory usage only depends on ``buffer_size`` and not on the size
+    of the event.
+
+    **Example:**
+
+    >>> import io
+    >>> from mutwo import core_events, mmml_converters
+    >>> f = io.BytesIO()
+    >>> mmml_converters.EventToMMMLFile().convert(core_events.Consecution(), f)
+    >>> f.getvalue()
+    b'cns\\n'
+    """
+
+    def __init__(
+        self, buffer_size: int = 2**16, compress: bool = False, atomic: bool = True
+    ):
+        self._buffer_size = buffer_size
+        self._compress = compress
+        self._atomic = atomic
+
+    def convert(
+        self,
+        event: core_events.abc.Event,
+        file: typing.Union[str, os.PathLike, typing.BinaryIO],
+    ):
+        """Encode event to a MMML file.
+
+        :param event: The event which is encoded.
+        :type event: core_events.abc.Event
+        :param file: Path of the MMML file or a binary file object.
+        :type file: typing.Union[str, os.PathLike, typing.BinaryIO]
+        """
+        for _ in self._iter_convert_step(event, file):
+            pass
+
+    def _iter_convert_step(
+        self,
+        event: core_events.abc.Event,
+        file: typing.Union[str, os.PathLike, typing.BinaryIO],
+        chunk_line_count: int = 1024,
+    ) -> typing.Iterator[None]:
+        """Encode event to a MMML file and pause after each chunk of lines.
+
+        If the generator is closed before it's exhausted, a temporary file
+        is removed just like after an error.
+        """
+        if not isinstance(file, (str, os.PathLike)):
+            return (yield from self._iter_write_step(event, file, chunk_line_count))
+        if not self._atomic:
+            with open(file, "wb") as f:
+                return (yield from self._iter_write_step(event, f, chunk_line_count))
+        path = os.fspath(file)
+        directory, name = os.path.split(os.path.abspath(path))
+        temporary_path = os.path.join(directory, f".{name}.{secrets.token_hex(8)}.tmp")
+        # In contrast to 'tempfile' this respects the umask.
+        fd = os.open(
+            temporary_path,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+            0o666,
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield from self._iter_write_step(event, f, chunk_line_count)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, temporary_path)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+    def _iter_write_step(
+        self, event: core_events.abc.Event, f: typing.BinaryIO, chunk_line_count: int
+    ) -> typing.Iterator[None]:
+        if self._compress:
+            with gzip.GzipFile(fileobj=f, mode="wb") as gzip_file:
+                return (
+                    yield from self._iter_write_uncompressed_step(
+                        event, gzip_file, chunk_line_count
+                    )
+                )
+        return (
+            yield from self._iter_write_uncompressed_step(event, f, chunk_line_count)
+        )
+
+    def _iter_write_uncompressed_step(
+        self, event: core_events.abc.Event, f: typing.BinaryIO, chunk_line_count: int
+    ) -> typing.Iterator[None]:
+        sink = _BufferedBinarySink(f, self._buffer_size)
+        for chunk in _iter_chunk(event, chunk_line_count):
+            sink.write(chunk)
+            yield
+        sink.flush()
+
+
+class _BufferedBinarySink(object):
+    """Collect text chunks and write them utf-8 encoded in big portions"""
+
+    def __init__(self, f: typing.BinaryIO, buffer_size: int):
+        self._f = f
+        self._buffer_size = buffer_size
+        self._chunk_list: list[bytes] = []
+        self._size = 0
+
+    def write(self, text: str):
+        # Chunks are encoded immediately, so that 'buffer_size' counts
+        # bytes and not characters.
+        data = text.encode("utf-8")
+        self._chunk_list.append(data)
+        self._size += len(data)
+        if self._size >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._chunk_list:
+            self._f.write(b"".join(self._chunk_list))
+            self._chunk_list = []
+            self._size = 0
+
+
+class MMMLHeaderAndBlock(typing.NamedTuple):
+    """Encoded header of an event and the events of its block.
+
+    Encoders can return this instead of a fully rendered string. In this
+    case the events of the block are encoded (and indented) by the caller,
+    so that encoding doesn't need to recurse into nested events. If
+    ``block`` is ``None`` the expression has no block at all.
+
+    Encoders which are registered with ``register_encoder`` and return
+    this can still be called by other encoders: use
+    :func:`render_encoded` to render their result to a string.
+    """
+
+    header: str
+    block: typing.Optional[typing.Sequence[core_events.abc.Event]] = None
+
 
 def encode_event(event: core_events.abc.Event) -> mmml_converters.MMMLExpression:
-    return mmml_converters.constants.ENCODER_REGISTRY[type(event)](event)
+    chunk_list: list[str] = []
+    write_event(event, chunk_list)
+    return "".join(chunk_list)
+
+
+def write_event(
+    event: core_events.abc.Event, sink: MMMLSink, chunk_line_count: int = 1024
+):
+    """Encode event and write its MMML expression to a text sink.
+
+    :param event: The event which is encoded.
+    :type event: core_events.abc.Event
+    :param sink: A text file object (or anything else with a ``write``
+        method) or a list to which chunks of the expression are appended.
+    :type sink: typing.Union[typing.TextIO, list[str]]
+    :param chunk_line_count: How many lines are collected before they are
+        written to the sink. Default to 1024.
+    :type chunk_line_count: int
+
+    Each line is created exactly once, so the expression never exists
+    in memory as a whole (unless the sink collects it).
+    """
+    write = sink.append if isinstance(sink, list) else sink.write
+    for chunk in _iter_chunk(event, chunk_line_count):
+        write(chunk)
+
+
+def _iter_chunk(
+    event: core_events.abc.Event, chunk_line_count: int
+) -> typing.Iterator[str]:
+    """Encode event to chunks of 'chunk_line_count' lines"""
+    indentation = mmml_converters.constants.INDENTATION
+    indentation_list = [""]
+    line_iterator = _iter_line(event)
+    # The first line isn't preceded by a line break.
+    depth, line = next(line_iterator)
+    chunk = [f"{indentation * depth}{line}"]
+    for depth, line in line_iterator:
+        if line:
+            try:
+                prefix = indentation_list[depth]
+            except IndexError:
+                indentation_list.extend(
+                    indentation * d for d in range(len(indentation_list), depth + 1)
+                )
+                prefix = indentation_list[depth]
+            chunk.append(f"\n{prefix}{line}")
+        else:
+            chunk.append("\n")
+        if len(chunk) >= chunk_line_count:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _iter_line(event: core_events.abc.Event) -> typing.Iterator[tuple[int, str]]:
+    """Encode event to '(depth, line)' pairs without recursion"""
+    return _iter_encoded_line(_encode(event))
+
+
+def _iter_encoded_line(
+    encoded: typing.Union[str, MMMLHeaderAndBlock],
+) -> typing.Iterator[tuple[int, str]]:
+    """Render encoded event to '(depth, line)' pairs without recursion.
+
+    Nested events are tracked with an explicit stack, therefore there is
+    no limit for how deeply events can be nested.
+    """
+    # Each stack item is '(depth, event_iterator)'.
+    stack = []
+    depth = 0
+    while True:
+        match encoded:
+            case str():
+                for line in encoded.split("\n"):
+                    yield depth, line
+            case MMMLHeaderAndBlock(header, block):
+                yield depth, header
+                if block is not None:
+                    yield depth, ""
+                    if block:
+                        stack.append((depth + 1, iter(block)))
+            case _:
+                raise NotImplementedError(encoded)
+        while stack:
+            depth, event_iterator = stack[-1]
+            try:
+                e = next(event_iterator)
+            except StopIteration:
+                stack.pop()
+                # Each block is closed by an empty line.
+                yield depth - 1, ""
+                continue
+            break
+        else:
+            return
+        encoded = _encode(e)
+
+
+def render_encoded(
+    encoded: typing.Union[str, MMMLHeaderAndBlock],
+) -> mmml_converters.MMMLExpression:
+    """Render the return value of an encoder to a MMML expression.
+
+    :param encoded: What an encoder of :const:`ENCODER_REGISTRY` returned
+        for an event.
+    :type encoded: typing.Union[str, MMMLHeaderAndBlock]
+
+    Encoders may return a :class:`MMMLHeaderAndBlock` instead of a
+    string. Code which calls such encoders directly (e.g. to wrap them)
+    can use this function to get the same string as :func:`encode_event`.
+
+    **Example:**
+
+    >>> from mutwo import mmml_converters, music_events
+    >>> encoded = mmml_converters.MMMLHeaderAndBlock(
+    ...     "cns", [music_events.NoteLike("c", 1)]
+    ... )
+    >>> print(mmml_converters.render_encoded(encoded))
+    cns
+    <BLANKLINE>
+        n 1 c4 _ _ _
+    <BLANKLINE>
+    """
+    indentation = mmml_converters.constants.INDENTATION
+    return "\n".join(
+        f"{indentation * depth}{line}" if line else ""
+        for depth, line in _iter_encoded_line(encoded)
+    )
+
+
+def _encode_event_in_parallel(
+    event: core_events.abc.Event,
+    max_workers: int,
+    use_processes: bool,
+    parallel_threshold: int,
+    chunk_event_count: int,
+    mp_context: typing.Optional[multiprocessing.context.BaseContext],
+) -> mmml_converters.MMMLExpression:
+    """Encode chunks of the block of the root event in parallel"""
+    encoded = _encode(event)
+    if not isinstance(encoded, MMMLHeaderAndBlock) or not encoded.block:
+        return encode_event(event)
+    header, block = encoded
+    event_count_list = [_count_events(e) for e in block]
+    if sum(event_count_list) < parallel_threshold:
+        return encode_event(event)
+    chunk_slice_list, start, event_count = [], 0, 0
+    for i, c in enumerate(event_count_list, 1):
+        if (event_count := event_count + c) >= chunk_event_count:
+            chunk_slice_list.append(slice(start, i))
+            start, event_count = i, 0
+    if start < len(block):
+        chunk_slice_list.append(slice(start, len(block)))
+
+    text_list = mmml_utilities.parallel_map(
+        _encode_chunk,
+        block,
+        chunk_slice_list,
+        max_workers,
+        use_processes,
+        mp_context,
+    )
+    # The same lines as in '_iter_line': header, empty line, the indented
+    # lines of the block and a final empty line.
+    return "\n".join([f"{header}\n", *text_list, ""])
+
+
+def _encode_chunk(
+    block: typing.Sequence[core_events.abc.Event], chunk_slice: slice
+) -> str:
+    return "\n".join([_indent(encode_event(e)) for e in block[chunk_slice]])
+
+
+def _count_events(event: core_events.abc.Event) -> int:
+    """Count event and all events nested in compound events"""
+    event_count, stack = 0, [event]
+    while stack:
+        e = stack.pop()
+        event_count += 1
+        if isinstance(e, core_events.abc.Compound):
+            stack.extend(e)
+    return event_count
+
+
+class DeduplicationInfo(typing.NamedTuple):
+    """Statistics of encoding an event with deduplication"""
+
+    # How many events the encoded event contains (including itself)
+    event_count: int
+    # How many events had to be passed to their encoder
+    encoded_event_count: int
+    # How many distinct subtrees (with distinct MMML) have been found
+    unique_subtree_count: int
+    # How often the text of an already encoded subtree has been reused
+    reused_subtree_count: int
+
+
+def _encode_event_deduplicated(
+    event: core_events.abc.Event,
+) -> tuple[mmml_converters.MMMLExpression, DeduplicationInfo]:
+    """Encode event, but each distinct subtree only once.
+
+    Subtrees are hash-consed: each distinct subtree gets an integer id,
+    its key is its own header and the ids of its children. A repeated
+    event object is recognized by its identity without visiting it again.
+    The text of each subtree is created only once and indented only once
+    (subtrees always appear one level deeper than their parent).
+    """
+    subtree_id_dict: dict[typing.Hashable, int] = {}
+    text_list: list[str] = []
+    indented_text_list: list[typing.Optional[str]] = []
+    event_count_list: list[int] = []
+    # 'id(event)' -> (event, subtree id). The event is kept, so that its
+    # id can't be reused by another object during encoding.
+    identity_dict: dict[int, tuple[core_events.abc.Event, int]] = {}
+    encoded_event_count = reused_subtree_count = 0
+
+    def get_subtree_id(key: typing.Hashable, text: str, event_count: int) -> int:
+        nonlocal reused_subtree_count
+        try:
+            subtree_id = subtree_id_dict[key]
+        except KeyError:
+            subtree_id = subtree_id_dict[key] = len(text_list)
+            text_list.append(text)
+            indented_text_list.append(None)
+            event_count_list.append(event_count)
+        else:
+            reused_subtree_count += 1
+        return subtree_id
+
+    def get_indented_text(subtree_id: int) -> str:
+        if (text := indented_text_list[subtree_id]) is None:
+            text = indented_text_list[subtree_id] = _indent(text_list[subtree_id])
+        return text
+
+    # Each stack item is '(event, header, child_id_list, event_iterator)'.
+    # The first item only collects the id of the root event.
+    stack: list[tuple] = [(None, None, [], iter((event,)))]
+    while True:
+        e, header, child_id_list, event_iterator = stack[-1]
+        try:
+            e = next(event_iterator)
+        except StopIteration:
+            if len(stack) == 1:
+                break
+            stack.pop()
+            text = "\n".join(
+                [f"{header}\n"] + [get_indented_text(i) for i in child_id_list] + [""]
+            )
+            subtree_id = get_subtree_id(
+                (header, tuple(child_id_list)),
+                text,
+                1 + sum([event_count_list[i] for i in child_id_list]),
+            )
+        else:
+            try:
+                _, subtree_id = identity_dict[id(e)]
+            except KeyError:
+                encoded_event_count += 1
+                match encoded := _encode(e):
+                    case str():
+                        subtree_id = get_subtree_id(encoded, encoded, 1)
+                    case MMMLHeaderAndBlock(header, block):
+                        if block:
+                            stack.append((e, header, [], iter(block)))
+                            continue
+                        if block is not None:
+                            header = f"{header}\n"
+                        subtree_id = get_subtree_id(header, header, 1)
+                    case _:
+                        raise NotImplementedError(encoded)
+            else:
+                reused_subtree_count += 1
+                stack[-1][2].append(subtree_id)
+                continue
+        identity_dict[id(e)] = (e, subtree_id)
+        stack[-1][2].append(subtree_id)
+    (root_id,) = stack[0][2]
+    return text_list[root_id], DeduplicationInfo(
+        event_count_list[root_id],
+        encoded_event_count,
+        len(text_list),
+        reused_subtree_count,
+    )
+
+
+def _indent(text: str) -> str:
+    """Indent all lines of text by one level, except empty lines"""
+    return _NON_EMPTY_LINE_START.sub(mmml_converters.constants.INDENTATION, text)
+
+
+_NON_EMPTY_LINE_START = re.compile("^(?=.)", re.MULTILINE)
 
 
 # NOTE Parameter parsers inverse '<Param>.from_any'
@@ -33,34 +632,45 @@ class DurationToMMMLString(core_converters.abc.Converter):
     def convert(self, duration: core_parameters.abc.Duration) -> str:
         match duration:
             case core_parameters.DirectDuration():
-                d = duration.beat_count
-                if (intd := int(d)) == float(d):
-                    d = intd
-                return str(d)
+                return _number_to_mmml(duration.beat_count)
             case core_parameters.RatioDuration():
-                return str(duration.ratio)
+                ratio = duration.ratio
+                return _ratio_to_mmml(ratio.numerator, ratio.denominator)
             case _:
                 raise NotImplementedError(duration)
 
 
+@functools.lru_cache(maxsize=1024, typed=True)
+def _number_to_mmml(d: float) -> str:
+    if (intd := int(d)) == float(d):
+        d = intd
+    return str(d)
+
+
+@functools.lru_cache(maxsize=1024)
+def _ratio_to_mmml(numerator: int, denominator: int) -> str:
+    if denominator == 1:
+        return str(numerator)
+    return f"{numerator}/{denominator}"
+
+
 class TempoToMMMLString(core_converters.abc.Converter):
     def convert(self, tempo: core_parameters.abc.Tempo) -> str:
         match tempo:
             case core_parameters.FlexTempo():
-                point_list = list(
-                    map(
-                        list,
-                        zip(
-                            map(_int, tempo.absolute_time_in_floats_tuple),
-                            map(_int, tempo.value_tuple),
-                        ),
-                    )
+                return _point_tuple_to_mmml(
+                    tuple(tempo.absolute_time_in_floats_tuple), tuple(tempo.value_tuple)
                 )
-                return str(point_list).replace(" ", "")
             case _:
                 return str(_int(tempo.bpm))
 
 
+@functools.lru_cache(maxsize=256)
+def _point_tuple_to_mmml(time_tuple: tuple[float, ...], value_tuple: tuple) -> str:
+    point_list = list(map(list, zip(map(_int, time_tuple), map(_int, value_tuple))))
+    return str(point_list).replace(" ", "")
+
+
 def _int(v: float):
     """Write number without digits if possible"""
     try:
@@ -81,17 +691,27 @@ class PitchToMMMLString(core_converters.abc.Converter):
             case music_parameters.ScalePitch():
                 return f"{pitch.scale_degree + 1}:{pitch.octave}"
             case music_parameters.JustIntonationPitch():
-                r = str(pitch.ratio)
-                # Ensure we always render ratios with '/', otherwise
-                # the pitch parser of 'mutwo.music' won't be able to
-                # re-load them.
-                if "/" not in r:
-                    r = f"{r}/1"
-                return r
+                return _exponent_tuple_to_mmml(pitch.exponent_tuple)
             case _:
                 raise NotImplementedError(pitch)
 
 
+@functools.lru_cache(maxsize=1024)
+def _exponent_tuple_to_mmml(exponent_tuple: tuple[int, ...]) -> str:
+    """Render ratio of a just intonation pitch given by its exponents.
+
+    Calculating the ratio of a :class:`mutwo.music_parameters.JustIntonationPitch`
+    is expensive, but its exponents are a cheap and immutable key.
+    """
+    r = str(music_parameters.JustIntonationPitch(exponent_tuple).ratio)
+    # Ensure we always render ratios with '/', otherwise
+    # the pitch parser of 'mutwo.music' won't be able to
+    # re-load them.
+    if "/" not in r:
+        r = f"{r}/1"
+    return r
+
+
 class PitchListToMMMLString(core_converters.abc.Converter):
     def __init__(self, parse_pitch=PitchToMMMLString()):
         self._parse_pitch = parse_pitch
@@ -104,13 +724,7 @@ class PitchIntervalToMMMLString(core_converters.abc.Converter):
     def convert(self, pitch_interval: music_parameters.abc.PitchInterval) -> str:
         match pitch_interval:
             case music_parameters.JustIntonationPitch():
-                r = str(pitch_interval.ratio)
-                # Ensure we always render ratios with '/', otherwise
-                # the pitch parser of 'mutwo.music' won't be able to
-                # re-load them.
-                if "/" not in r:
-                    r = f"{r}/1"
-                return r
+                return _exponent_tuple_to_mmml(pitch_interval.exponent_tuple)
             case music_parameters.WesternPitchInterval():
                 return pitch_interval.name
             case _:
@@ -127,18 +741,262 @@ class VolumeToMMMLString(core_converters.abc.Converter):
 
 
 class IndicatorCollectionToMMMLString(core_converters.abc.Converter):
+    """Encode indicator collection to MMML.
+
+    :param cache_size: How many encoded indicator collections are
+        remembered. Set to 0 to disable the cache. Default to 256.
+    :type cache_size: int
+
+    Instead of asking each indicator if it's active, the state of all
+    indicators of a collection is fetched at once: the values of their
+    dataclass fields (or, for indicators without fields, their
+    ``is_active`` property). If each value is still the value of a new
+    collection, the encoded new collection is returned without any
+    further work. Otherwise only the changed indicators are encoded,
+    and the result is cached with the state as key. Only states which
+    exclusively consist of values of type ``None``, ``bool``, ``int``,
+    ``float`` or ``str`` are cached, because only then they can't change
+    behind our back.
+    """
+
+    def __init__(self, cache_size: int = 256):
+        self._cache = (
+            mmml_utilities.LRUCache(maxsize=cache_size) if cache_size else None
+        )
+
     def convert(
         self, indicator_collection: music_parameters.abc.IndicatorCollection
     ) -> str:
-        mmml = ""
-        for name, indicator in indicator_collection.indicator_dict.items():
-            if indicator.is_active:
-                # XXX: This needs to be fixed in 'mutwo.music':
-                # ottava with 'octave_count=0' must be inactive.
-                if getattr(indicator, "octave_count", None) == 0:
+        plan = _get_indicator_collection_plan(type(indicator_collection))
+        try:
+            value_tuple = plan.get_value_tuple(indicator_collection)
+        except AttributeError:  # Indicators have been replaced by the user
+            return _indicator_collection_to_mmml(indicator_collection)
+        if value_tuple == plan.default_value_tuple and (
+            # Equal values can still be rendered differently (e.g. '1'
+            # and 'True'), but they can't change if an indicator is active.
+            plan.default_mmml == mmml_converters.constants.IGNORE_MAGIC
+            or all(map(operator.is_, value_tuple, plan.default_value_tuple))
+        ):
+            return plan.default_mmml
+        if plan.get_class_tuple(indicator_collection) != plan.default_class_tuple:
+            return _indicator_collection_to_mmml(indicator_collection)
+        value_type_tuple = tuple(map(type, value_tuple))
+        if self._cache is None or not _CACHEABLE_TYPE_SET.issuperset(value_type_tuple):
+            return plan.render(indicator_collection, value_tuple)[0]
+        if float in value_type_tuple:
+            # Equal floats can be rendered differently (e.g. '0.0' and
+            # '-0.0'), but their representations are only equal if they
+            # are rendered equally.
+            key_value_tuple = tuple(
+                repr(v) if t is float else v
+                for v, t in zip(value_tuple, value_type_tuple)
+            )
+        else:
+            key_value_tuple = value_tuple
+        key = (type(indicator_collection), key_value_tuple, value_type_tuple)
+        try:
+            return self._cache[key]
+        except KeyError:
+            mmml, is_cacheable = plan.render(indicator_collection, value_tuple)
+            if is_cacheable:
+                self._cache.set(key, mmml)
+            return mmml
+
+
+def _indicator_collection_to_mmml(
+    indicator_collection: music_parameters.abc.IndicatorCollection,
+) -> str:
+    """Encode indicator collection without any precompiled plan"""
+    mmml_list = []
+    for name, indicator in indicator_collection.indicator_dict.items():
+        if indicator.is_active:
+            _append_arguments(mmml_list, name, indicator)
+    return ";".join(mmml_list) or mmml_converters.constants.IGNORE_MAGIC
+
+
+def _append_arguments(
+    mmml_list: list[str], name: str, indicator: music_parameters.abc.Indicator
+):
+    # XXX: This needs to be fixed in 'mutwo.music':
+    # ottava with 'octave_count=0' must be inactive.
+    if getattr(indicator, "octave_count", None) == 0:
+        return
+    mmml_list.extend(
+        f"{name}.{k}={v}" for k, v in indicator.get_arguments_dict().items()
+    )
+
+
+_CACHEABLE_TYPE_SET = frozenset((type(None), bool, int, float, str))
+
+
+class _IndicatorPlan(typing.NamedTuple):
+    """Precompiled way how to encode one indicator of a collection"""
+
+    name: str
+    # Position of the values of the indicator in the collection state
+    start: int
+    stop: int
+    # Templates 'name.field={}' for each value. If 'None', the indicator
+    # itself has to be asked for its arguments.
+    template_tuple: typing.Optional[tuple[str, ...]]
+    # Indicators with fields are active if all fields are set, all
+    # other indicators if 'is_active' is true.
+    has_fields: bool
+    octave_count_index: typing.Optional[int]
+
+
+class _IndicatorCollectionPlan(typing.NamedTuple):
+    """Precompiled way how to fetch the state of an indicator collection"""
+
+    get_class_tuple: typing.Callable[[typing.Any], tuple]
+    get_value_tuple: typing.Callable[[typing.Any], tuple]
+    indicator_plan_tuple: tuple[_IndicatorPlan, ...]
+    # Index of the indicator to which a value of the state belongs
+    owner_tuple: tuple[int, ...]
+    # State & MMML of a new collection
+    default_class_tuple: tuple
+    default_value_tuple: tuple
+    default_mmml: str
+
+    def render(
+        self,
+        indicator_collection: music_parameters.abc.IndicatorCollection,
+        value_tuple: tuple,
+    ) -> tuple[str, bool]:
+        """Encode collection whose indicators are of the default types.
+
+        Returns the MMML and if it only depends on the collection state.
+        """
+        if self.default_mmml == mmml_converters.constants.IGNORE_MAGIC:
+            # Indicators which still have their default values are
+            # inactive, so only changed indicators need to be checked.
+            indicator_plan_iterable = map(
+                self.indicator_plan_tuple.__getitem__,
+                dict.fromkeys(
+                    itertools.compress(
+                        self.owner_tuple,
+                        map(operator.is_not, value_tuple, self.default_value_tuple),
+                    )
+                ),
+            )
+        else:
+            indicator_plan_iterable = self.indicator_plan_tuple
+        mmml_list, is_cacheable = [], True
+        for plan in indicator_plan_iterable:
+            indicator_value_tuple = value_tuple[plan.start : plan.stop]
+            if plan.template_tuple is None:
+                if indicator_value_tuple[0]:
+                    indicator = getattr(indicator_collection, plan.name)
+                    _append_arguments(mmml_list, plan.name, indicator)
+                    is_cacheable = False
+                continue
+            if plan.has_fields:
+                if None in indicator_value_tuple:
                     continue
-                for k, v in indicator.get_arguments_dict().items():
-                    if mmml:
-                        mmml += ";"
-                    mmml += f"{name}.{k}={v}"
-        return mmml or mmml_converters.constants.IGNORE_MAGIC
+            elif not indicator_value_tuple[0]:
+                continue
+            if (
+                plan.octave_count_index is not None
+                and indicator_value_tuple[plan.octave_count_index] == 0
+            ):
+                continue
+            mmml_list.extend(
+                map(str.format, plan.template_tuple, indicator_value_tuple)
+            )
+        return (
+            ";".join(mmml_list) or mmml_converters.constants.IGNORE_MAGIC,
+            is_cacheable,
+        )
+
+
+def _get_indicator_collection_plan(
+    indicator_collection_type: typing.Type[music_parameters.abc.IndicatorCollection],
+) -> _IndicatorCollectionPlan:
+    # Indicators can be registered to a collection type at any time,
+    # therefore the plan is bound to the current indicator count.
+    key = (
+        indicator_collection_type,
+        len(indicator_collection_type._indicator_type_dict),
+    )
+    try:
+        return _INDICATOR_COLLECTION_PLAN_DICT[key]
+    except KeyError:
+        pass
+    default = indicator_collection_type()
+    class_path_list, value_path_list = [], []
+    indicator_plan_list, owner_list = [], []
+    for name, indicator in default.indicator_dict.items():
+        class_path_list.append(f"{name}.__class__")
+        indicator_type = type(indicator)
+        try:
+            field_name_tuple = tuple(f.name for f in dataclasses.fields(indicator))
+        except TypeError:
+            field_name_tuple = ()
+        has_fields = bool(field_name_tuple)
+        # Only for the indicators of 'mutwo.music' we know how their
+        # arguments & activity depend on their state.
+        if has_fields and indicator_type.get_arguments_dict is (
+            music_parameters.abc.Indicator.get_arguments_dict
+        ):
+            value_name_tuple = field_name_tuple
+            is_known = indicator_type.is_active in (
+                music_parameters.abc.ImplicitPlayingIndicator.is_active,
+                music_parameters.abc.NotationIndicator.is_active,
+            )
+        else:
+            value_name_tuple = ("is_active",)
+            is_known = (
+                indicator_type.get_arguments_dict
+                is music_parameters.abc.ExplicitPlayingIndicator.get_arguments_dict
+                and indicator_type.is_active
+                is music_parameters.abc.ExplicitPlayingIndicator.is_active
+            )
+        start = len(value_path_list)
+        value_path_list.extend(f"{name}.{v}" for v in value_name_tuple)
+        owner_list.extend([len(indicator_plan_list)] * len(value_name_tuple))
+        indicator_plan_list.append(
+            _IndicatorPlan(
+                name,
+                start,
+                len(value_path_list),
+                (
+                    tuple(f"{name}.{v}={{}}" for v in value_name_tuple)
+                    if is_known
+                    else None
+                ),
+                has_fields and is_known,
+                (
+                    value_name_tuple.index("octave_count")
+                    if "octave_count" in value_name_tuple
+                    else None
+                ),
+            )
+        )
+    get_class_tuple = _tuple_getter(class_path_list)
+    get_value_tuple = _tuple_getter(value_path_list)
+    plan = _INDICATOR_COLLECTION_PLAN_DICT[key] = _IndicatorCollectionPlan(
+        get_class_tuple,
+        get_value_tuple,
+        tuple(indicator_plan_list),
+        tuple(owner_list),
+        get_class_tuple(default),
+        get_value_tuple(default),
+        _indicator_collection_to_mmml(default),
+    )
+    return plan
+
+
+_INDICATOR_COLLECTION_PLAN_DICT: dict[tuple, _IndicatorCollectionPlan] = {}
+
+
+def _tuple_getter(path_list: list[str]) -> typing.Callable[[typing.Any], tuple]:
+    """Like 'operator.attrgetter', but always returns a tuple"""
+    match len(path_list):
+        case 0:
+            return lambda _: ()
+        case 1:
+            get = operator.attrgetter(path_list[0])
+            return lambda o: (get(o),)
+        case _:
+            return operator.attrgetter(*path_list)
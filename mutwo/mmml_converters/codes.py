@@ -1,3 +1,5 @@
+import copy
+import functools
 import typing
 
 from mutwo import core_events
@@ -7,10 +9,11 @@ from mutwo import mmml_converters
 from mutwo import music_events
 from mutwo import music_parameters
 
-__all__ = ("register_decoder", "register_encoder")
+__all__ = ("register_decoder", "unregister_decoder", "register_encoder")
 
 
 register_decoder = mmml_converters.constants.DECODER_REGISTRY.register_decoder
+unregister_decoder = mmml_converters.constants.DECODER_REGISTRY.unregister_decoder
 register_encoder = mmml_converters.constants.ENCODER_REGISTRY.register_encoder
 
 EventTuple: typing.TypeAlias = tuple[core_events.abc.Event, ...]
@@ -39,9 +42,9 @@ def n(
     if not pitch:
         pitch = []
     return music_events.NoteLike(
-        pitch,
-        duration,
-        volume=volume,
+        _parse(music_parameters.abc.PitchList, pitch, copy.deepcopy),
+        _parse(core_parameters.abc.Duration, duration),
+        volume=_parse(music_parameters.abc.Volume, volume),
         playing_indicator_collection=playing_indicator_collection,
         notation_indicator_collection=notation_indicator_collection,
         lyric=lyric,
@@ -67,8 +70,8 @@ def r(
 ):
     return music_events.NoteLike(
         [],
-        duration,
-        volume=volume,
+        _parse(core_parameters.abc.Duration, duration),
+        volume=_parse(music_parameters.abc.Volume, volume),
         playing_indicator_collection=playing_indicator_collection,
         notation_indicator_collection=notation_indicator_collection,
         lyric=lyric,
@@ -77,6 +80,26 @@ def r(
     )
 
 
+def _parse(
+    parameter_type: typing.Type,
+    value: typing.Any,
+    copy_function: typing.Callable[[typing.Any], typing.Any] = copy.copy,
+) -> typing.Any:
+    """Parse MMML argument to parameter.
+
+    Scores only use a small vocabulary of arguments, so each string is only
+    parsed once. Because parameters are mutable, each call returns a copy.
+    """
+    if isinstance(value, str):
+        return copy_function(_parse_string(parameter_type, value))
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_string(parameter_type: typing.Type, value: str) -> typing.Any:
+    return parameter_type.from_any(value)
+
+
 @register_decoder
 def cns(event_tuple: EventTuple, tag=None, tempo=None):
     return core_events.Consecution(event_tuple, tag=tag, tempo=tempo)
@@ -87,7 +110,37 @@ def cnc(event_tuple: EventTuple, tag=None, tempo=None):
     return core_events.Concurrence(event_tuple, tag=tag, tempo=tempo)
 
 
-@register_encoder(music_events.NoteLike)
+def _register_header_and_block_encoder(*encoding_type):
+    """Register function which encodes the header of an event separately.
+
+    The registered encoder still returns a string (just like any other
+    encoder), but internally (see :func:`_encode`) the header and the
+    unencoded block are used, so that encoding doesn't need to recurse
+    into nested events.
+    """
+
+    def _(function):
+        @functools.wraps(function)
+        def encoder(event: core_events.abc.Event) -> str:
+            return mmml_converters.render_encoded(function(event))
+
+        encoder._header_and_block_encoder = function
+        register_encoder(*encoding_type)(encoder)
+        return function
+
+    return _
+
+
+def _encode(event: core_events.abc.Event):
+    """Encode event, but keep blocks of builtin encoders unencoded.
+
+    Returns a string or a :class:`MMMLHeaderAndBlock`.
+    """
+    encoder = mmml_converters.constants.ENCODER_REGISTRY[type(event)]
+    return getattr(encoder, "_header_and_block_encoder", encoder)(event)
+
+
+@_register_header_and_block_encoder(music_events.NoteLike)
 def note_like(n: music_events.NoteLike):
     d = _asmmml.duration(n.duration)
     if _is_default_volume(n.volume):
@@ -103,31 +156,24 @@ def note_like(n: music_events.NoteLike):
     else:
         header = f"r {d} {v} {pic} {nic}"
 
-    if n.grace_note_consecution:
-        block = "\n" + _compound_to_block(n.grace_note_consecution)
-    else:
-        block = ""
+    return mmml_converters.MMMLHeaderAndBlock(header, n.grace_note_consecution or None)
 
-    return f"{header}{block}"
 
-
-@register_encoder(core_events.Chronon)
+@_register_header_and_block_encoder(core_events.Chronon)
 def chronon(chn: core_events.Chronon):
     # NOTE Don't use directly local 'note_like' function to support case
     # when user overrides 'note_like' encoder.
-    return mmml_converters.constants.ENCODER_REGISTRY[music_events.NoteLike](
-        music_events.NoteLike(duration=chn.duration)
-    )
+    return _encode(music_events.NoteLike(duration=chn.duration))
 
 
-@register_encoder(core_events.Consecution)
+@_register_header_and_block_encoder(core_events.Consecution)
 def consecution(
     cns: core_events.Consecution,
 ):
     return _compound("cns", cns)
 
 
-@register_encoder(core_events.Concurrence)
+@_register_header_and_block_encoder(core_events.Concurrence)
 def concurrence(
     cnc: core_events.Concurrence,
 ):
@@ -142,8 +188,7 @@ def _compound(code: str, e: core_events.abc.Compound):
         header = f"{code} {e.tag}"
     elif not is_default_tempo:
         header = f"{code} {e.tag or '_'} {tempo}"
-    block = _compound_to_block(e)
-    return f"{header}\n{block}"
+    return mmml_converters.MMMLHeaderAndBlock(header, e)
 
 
 def _is_default_tempo(tempo: core_parameters.abc.Tempo):
@@ -165,19 +210,6 @@ def _is_default_volume(volume: music_parameters.abc.Volume):
             return music_parameters.WesternVolume(default_volume) == volume
 
 
-def _compound_to_block(compound: core_events.abc.Compound) -> str:
-    if not compound:
-        return ""
-    block = [""]
-    for e in compound:
-        expression = mmml_converters.encode_event(e)
-        for line in expression.split("\n"):
-            line = f"{mmml_converters.constants.INDENTATION}{line}" if line else line
-            block.append(line)
-    block.append("")
-    return "\n".join(block)
-
-
 class __asmmml:
     _cache = {}  # singleton
 
@@ -0,0 +1,632 @@
+"""Decode flat blocks of notes to columns of note data and encode them back"""
+
+from __future__ import annotations
+
+import fractions
+import functools
+import typing
+
+try:
+    import numpy
+except ImportError:  # numpy is an optional dependency
+    numpy = None
+
+from mutwo import core_converters
+from mutwo import core_events
+from mutwo import core_parameters
+from mutwo import mmml_converters
+from mutwo import mmml_utilities
+from mutwo import music_events
+from mutwo import music_parameters
+
+from .backends import MMMLHeaderAndBlock
+from .codes import _asmmml, _encode, _is_default_volume, _parse_string
+from .frontends import (
+    HeaderArguments,
+    _DecoderCallPlan,
+    _get_decoder_call_plan,
+    _get_ignored_required_error,
+    _iter_node,
+    _render,
+)
+
+__all__ = (
+    "NoteColumns",
+    "MMMLExpressionToNoteColumns",
+    "ColumnarNotesToMMMLExpression",
+)
+
+
+class NoteColumns(typing.NamedTuple):
+    """Notes and rests of a block as parallel :mod:`numpy` arrays.
+
+    The arrays ``duration``, ``duration_numerator``,
+    ``duration_denominator``, ``amplitude`` and ``is_rest`` have one item
+    for each note. The pitches of all notes are concatenated in
+    ``frequency`` and ``midi_pitch_number``: the pitches of note ``i`` are
+    at ``pitch_offset[i]:pitch_offset[i + 1]``, so chords have multiple
+    pitches and rests have none.
+
+    Durations are also given as fractions. For durations which aren't
+    written as a fraction in MMML (e.g. '0.5'), the fraction of their
+    shortest decimal representation is used.
+    """
+
+    # Duration in beats (float64)
+    duration: numpy.ndarray
+    # Duration as fraction (int64)
+    duration_numerator: numpy.ndarray
+    duration_denominator: numpy.ndarray
+    # Position of the pitches of each note and the end of the pitches of
+    # the last note (int64)
+    pitch_offset: numpy.ndarray
+    # Frequency (in Hertz) and MIDI pitch number of each pitch (float64)
+    frequency: numpy.ndarray
+    midi_pitch_number: numpy.ndarray
+    # Amplitude of the volume of each note (float64)
+    amplitude: numpy.ndarray
+    # If a note has no pitches (bool)
+    is_rest: numpy.ndarray
+    # Decoder name and arguments (including defaults) of each note
+    header_tuple: tuple[tuple[str, HeaderArguments], ...]
+
+    def materialize(self) -> tuple[music_events.NoteLike, ...]:
+        """Decode all notes to events.
+
+        **Example:**
+
+        >>> from mutwo import mmml_converters
+        >>> c = mmml_converters.MMMLExpressionToNoteColumns()
+        >>> c.convert("cns\\n    n 1/4 c\\n    r 1/4").materialize()
+        (NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('c', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf)), NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf)))
+        """
+        return tuple(map(self.materialize_note, range(len(self.header_tuple))))
+
+    def materialize_note(self, index: int) -> music_events.NoteLike:
+        """Decode one note to an event.
+
+        :param index: The position of the note in its block.
+        :type index: int
+
+        The note is decoded by the decoder which is registered for its
+        expression, exactly as if its block would have been decoded to
+        events.
+        """
+        decoder_name, argument_tuple = self.header_tuple[index]
+        decoder = mmml_converters.constants.DECODER_REGISTRY[decoder_name]
+        return _get_decoder_call_plan(decoder)(decoder_name, (), argument_tuple)
+
+
+class MMMLExpressionToNoteColumns(core_converters.abc.Converter):
+    """Decode the notes and rests in the block of a MMML expression to columns.
+
+    :param converter: Defines how MMML is decoded (e.g. if defaults are
+        used). Its ``cache`` and ``max_workers`` are ignored. If ``None``
+        a new :class:`MMMLExpressionToEvent` is used. Default to ``None``.
+    :type converter: typing.Optional[MMMLExpressionToEvent]
+
+    The block of the root expression may only contain ``n`` and ``r``
+    expressions without blocks (e.g. without grace notes). Their
+    arguments are understood just like the ``n`` and ``r`` decoders of
+    :mod:`mutwo.mmml_converters` understand them (including ``_`` and
+    defaults), but no events are created. The positions of the
+    ``duration``, ``pitch`` and ``volume`` arguments are taken from the
+    parameters of the registered decoders. Each distinct argument is
+    parsed only once. The events can still be created later (see
+    :meth:`NoteColumns.materialize`). This converter needs :mod:`numpy`
+    (e.g. ``pip install mutwo.mmml[columnar]``).
+
+    **Example:**
+
+    >>> from mutwo import mmml_converters
+    >>> c = mmml_converters.MMMLExpressionToNoteColumns(
+    ...     mmml_converters.MMMLExpressionToEvent(use_defaults=True)
+    ... )
+    >>> mmml = r'''
+    ... cns
+    ...     n 1/4 c,e ff
+    ...     n 1/8 d
+    ...     r 0.5
+    ... '''
+    >>> columns = c.convert(mmml)
+    >>> columns.duration
+    array([0.25 , 0.125, 0.5  ])
+    >>> columns.duration_denominator
+    array([4, 8, 2])
+    >>> columns.pitch_offset
+    array([0, 2, 3, 3])
+    >>> columns.midi_pitch_number.round()
+    array([60., 64., 62.])
+    >>> columns.is_rest
+    array([False, False,  True])
+    """
+
+    def __init__(
+        self, converter: typing.Optional[mmml_converters.MMMLExpressionToEvent] = None
+    ):
+        if numpy is None:
+            raise ImportError(
+                f"'{type(self).__name__}' needs 'numpy': "
+                "install 'mutwo.mmml[columnar]'."
+            )
+        self._converter = converter or mmml_converters.MMMLExpressionToEvent()
+
+    def convert(
+        self, expression: mmml_converters.MMMLExpression, **kwargs
+    ) -> NoteColumns:
+        """Decode the block of a MMML expression to note columns.
+
+        :param expression: A MMML expression.
+        :type expression: str
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+        """
+        c = self._converter
+        node_iterator = _iter_node(_render(expression, kwargs).split("\n"))
+        root = next(node_iterator)
+        default_dict = c._get_default_dict()
+        note_columns = self._decode(node_iterator, default_dict)
+        # Like any decoded expression, the root expression is decoded
+        # after its block.
+        if c._use_defaults:
+            c._apply_defaults(root.expression_name, root.argument_tuple, default_dict)
+        c._keep_default_dict(default_dict)
+        return note_columns
+
+    def _decode(
+        self,
+        node_iterable: typing.Iterable[mmml_converters.MMMLNode],
+        default_dict: dict[str, HeaderArguments],
+    ) -> NoteColumns:
+        c = self._converter
+        decoder_registry = mmml_converters.constants.DECODER_REGISTRY
+        duration_list, ratio_list, amplitude_list, pitch_count_list = [], [], [], []
+        frequency_list, midi_pitch_number_list, header_list = [], [], []
+        # Each distinct argument is parsed only once.
+        duration_dict, pitch_list_dict, amplitude_dict = {}, {}, {}
+        for node in node_iterable:
+            decoder_name = node.expression_name
+            try:
+                decoder = decoder_registry[decoder_name]
+            except KeyError:
+                raise mmml_utilities.NoDecoderExists(decoder_name, node.line_number)
+            if (
+                node.child_list
+                or decoder_name not in _NOTE_DECODER_NAME_TUPLE
+                or (plan := _get_column_plan(decoder)) is None
+            ):
+                raise ValueError(
+                    f"Line {node.line_number}: Only 'n' and 'r' expressions "
+                    "without blocks can be decoded to note columns, but found "
+                    f"'{decoder_name}'{' with block' if node.child_list else ''}."
+                )
+            argument_tuple = node.argument_tuple
+            if c._use_defaults:
+                argument_tuple = c._apply_defaults(
+                    decoder_name, argument_tuple, default_dict
+                )
+            # Check arguments like '_DecoderCallPlan' before it calls
+            # its decoder.
+            call_plan = plan.call_plan
+            argument_count = len(argument_tuple)
+            if argument_count < call_plan.minimum or (
+                call_plan.maximum is not None and argument_count > call_plan.maximum
+            ):
+                raise mmml_utilities.InvalidArgumentCount(
+                    decoder_name,
+                    argument_count,
+                    call_plan.minimum,
+                    call_plan.maximum,
+                    node.line_number,
+                )
+            if (
+                name := call_plan.get_ignored_required_name(argument_tuple)
+            ) is not None:
+                raise _get_ignored_required_error(decoder_name, name, node.line_number)
+            header_list.append((decoder_name, argument_tuple))
+            duration, pitch, volume = [
+                _get_argument(argument_tuple, index, default)
+                for index, default in plan.index_and_default_tuple
+            ]
+            try:
+                beat_count, ratio = duration_dict[duration]
+            except KeyError:
+                beat_count, ratio = duration_dict[duration] = _parse_duration(duration)
+            try:
+                frequency_tuple, midi_pitch_number_tuple = pitch_list_dict[pitch]
+            except KeyError:
+                frequency_tuple, midi_pitch_number_tuple = pitch_list_dict[pitch] = (
+                    _parse_pitch_list(pitch)
+                )
+            try:
+                amplitude = amplitude_dict[volume]
+            except KeyError:
+                amplitude = amplitude_dict[volume] = _parse_argument(
+                    music_parameters.abc.Volume, volume
+                ).amplitude
+            duration_list.append(beat_count)
+            ratio_list.append(ratio)
+            amplitude_list.append(amplitude)
+            pitch_count_list.append(len(frequency_tuple))
+            frequency_list.extend(frequency_tuple)
+            midi_pitch_number_list.extend(midi_pitch_number_tuple)
+
+        pitch_count_array = numpy.array(pitch_count_list, dtype=numpy.int64)
+        pitch_offset = numpy.zeros(len(pitch_count_list) + 1, dtype=numpy.int64)
+        numpy.cumsum(pitch_count_array, out=pitch_offset[1:])
+        ratio_array = numpy.array(ratio_list, dtype=numpy.int64).reshape(-1, 2)
+        return NoteColumns(
+            numpy.array(duration_list, dtype=numpy.float64),
+            ratio_array[:, 0],
+            ratio_array[:, 1],
+            pitch_offset,
+            numpy.array(frequency_list, dtype=numpy.float64),
+            numpy.array(midi_pitch_number_list, dtype=numpy.float64),
+            numpy.array(amplitude_list, dtype=numpy.float64),
+            pitch_count_array == 0,
+            tuple(header_list),
+        )
+
+
+_NOTE_DECODER_NAME_TUPLE = ("n", "r")
+
+
+class _ColumnPlan(typing.NamedTuple):
+    """Where the arguments of a note decoder are found"""
+
+    # Index (or 'None' if the decoder has no such parameter) and default
+    # value of the duration, pitch and volume argument
+    index_and_default_tuple: tuple[tuple[typing.Optional[int], typing.Any], ...]
+    call_plan: _DecoderCallPlan
+
+
+@functools.lru_cache(maxsize=None)
+def _get_column_plan(decoder: typing.Callable) -> typing.Optional[_ColumnPlan]:
+    """Get plan of a decoder or ``None`` if it has no duration parameter"""
+    call_plan = _get_decoder_call_plan(decoder)
+    if "duration" not in call_plan.name_tuple:
+        return None
+    index_and_default_list = []
+    for name, default in (("duration", None), ("pitch", ""), ("volume", "mf")):
+        try:
+            index = call_plan.name_tuple.index(name)
+        except ValueError:
+            index_and_default_list.append((None, default))
+        else:
+            index_and_default_list.append((index, call_plan.default_tuple[index]))
+    return _ColumnPlan(tuple(index_and_default_list), call_plan)
+
+
+def _get_argument(
+    argument_tuple: HeaderArguments, index: typing.Optional[int], default: typing.Any
+) -> typing.Any:
+    """Get argument like :class:`_DecoderCallPlan` passes it to its decoder"""
+    if index is None or index >= len(argument_tuple):
+        return default
+    argument = argument_tuple[index]
+    if argument == mmml_converters.constants.IGNORE_MAGIC:
+        return default
+    return argument
+
+
+def _parse_argument(parameter_type: typing.Type, value: typing.Any) -> typing.Any:
+    if isinstance(value, str):
+        return _parse_string(parameter_type, value)
+    return parameter_type.from_any(value)
+
+
+def _parse_duration(value: typing.Any) -> tuple[float, tuple[int, int]]:
+    duration = _parse_argument(core_parameters.abc.Duration, value)
+    beat_count = duration.beat_count
+    if (ratio := getattr(duration, "ratio", None)) is None:
+        ratio = fractions.Fraction(repr(beat_count))
+    return beat_count, (ratio.numerator, ratio.denominator)
+
+
+def _parse_pitch_list(
+    value: typing.Any,
+) -> tuple[tuple[float, ...], tuple[float, ...]]:
+    # See 'mutwo.mmml_converters.codes.n'
+    if isinstance(value, str):
+        value = value.replace(",", " ")
+    if not value:
+        return (), ()
+    pitch_list = _parse_argument(music_parameters.abc.PitchList, value)
+    return (
+        tuple(pitch.hertz for pitch in pitch_list),
+        tuple(pitch.midi_pitch_number for pitch in pitch_list),
+    )
+
+
+class ColumnarNotesToMMMLExpression(core_converters.abc.Converter):
+    """Encode notes which are given as columns to a MMML expression.
+
+    :param chunk_line_count: How many lines are collected before they are
+        written to the sink (see :meth:`write`). Default to 1024.
+    :type chunk_line_count: int
+
+    The expression is the same as the expression of
+    :func:`encode_event` for a compound which contains one
+    :class:`mutwo.music_events.NoteLike` for each note. Note ``i`` is
+    ``NoteLike(pitch_list, duration[i], volume[i])``, where ``pitch_list``
+    is the list of its pitch values (or empty if it's a rest). The values
+    are taken from the arrays with ``tolist``, so they are the same python
+    objects which you would pass to ``NoteLike``. Only use ``dtype=object``
+    for values which aren't numbers or strings (e.g. fractions or
+    :class:`mutwo.music_parameters.abc.Pitch` objects).
+
+    The lines are written like the ``note_like`` encoder writes them, but
+    no events are created: each distinct value is parsed and encoded only
+    once. This converter needs :mod:`numpy` (e.g. ``pip install
+    mutwo.mmml[columnar]``).
+
+    **Example:**
+
+    >>> import numpy
+    >>> from mutwo import core_events, mmml_converters
+    >>> c = mmml_converters.ColumnarNotesToMMMLExpression()
+    >>> print(
+    ...     c.convert(
+    ...         [0.25, 0.25, 0.5],
+    ...         pitch=["c4", "e4", "g4", "a4"],
+    ...         pitch_offset=[0, 2, 3, 4],
+    ...         volume=["ff", "mf", "mf"],
+    ...         is_rest=[False, False, True],
+    ...         compound=core_events.Concurrence(tag="piano"),
+    ...     )
+    ... )
+    cnc piano
+    <BLANKLINE>
+        n 0.25 c4,e4 ff _ _
+        n 0.25 g4 _ _ _
+        r 0.5 _ _ _
+    <BLANKLINE>
+    """
+
+    def __init__(self, chunk_line_count: int = 1024):
+        if numpy is None:
+            raise ImportError(
+                f"'{type(self).__name__}' needs 'numpy': "
+                "install 'mutwo.mmml[columnar]'."
+            )
+        self._chunk_line_count = chunk_line_count
+
+    def convert(
+        self,
+        duration: numpy.typing.ArrayLike,
+        pitch: typing.Optional[numpy.typing.ArrayLike] = None,
+        pitch_offset: typing.Optional[numpy.typing.ArrayLike] = None,
+        volume: typing.Optional[numpy.typing.ArrayLike] = None,
+        is_rest: typing.Optional[numpy.typing.ArrayLike] = None,
+        compound: typing.Optional[core_events.abc.Compound] = None,
+    ) -> mmml_converters.MMMLExpression:
+        """Encode columns of notes to a MMML expression.
+
+        :param duration: The duration of each note.
+        :type duration: numpy.typing.ArrayLike
+        :param pitch: The pitches of all notes. If ``None`` all notes
+            are rests. Default to ``None``.
+        :type pitch: typing.Optional[numpy.typing.ArrayLike]
+        :param pitch_offset: Position of the pitches of each note and the
+            end of the pitches of the last note: the pitches of note ``i``
+            are ``pitch[pitch_offset[i]:pitch_offset[i + 1]]`` (see
+            :class:`NoteColumns`). If ``None`` each note has exactly one
+            pitch. Default to ``None``.
+        :type pitch_offset: typing.Optional[numpy.typing.ArrayLike]
+        :param volume: The volume of each note. If ``None`` all notes
+            have the default volume. Default to ``None``.
+        :type volume: typing.Optional[numpy.typing.ArrayLike]
+        :param is_rest: If a note is a rest. Notes without pitches are
+            always rests. If ``None`` only notes without pitches are rests.
+            Default to ``None``.
+        :type is_rest: typing.Optional[numpy.typing.ArrayLike]
+        :param compound: The compound which contains the notes. Only its
+            type, tag and tempo are used. If ``None`` the notes are
+            written in a :class:`mutwo.core_events.Consecution`. Default
+            to ``None``.
+        :type compound: typing.Optional[core_events.abc.Compound]
+        """
+        chunk_list: list[str] = []
+        self.write(duration, chunk_list, pitch, pitch_offset, volume, is_rest, compound)
+        return "".join(chunk_list)
+
+    def write(
+        self,
+        duration: numpy.typing.ArrayLike,
+        sink: mmml_converters.MMMLSink,
+        pitch: typing.Optional[numpy.typing.ArrayLike] = None,
+        pitch_offset: typing.Optional[numpy.typing.ArrayLike] = None,
+        volume: typing.Optional[numpy.typing.ArrayLike] = None,
+        is_rest: typing.Optional[numpy.typing.ArrayLike] = None,
+        compound: typing.Optional[core_events.abc.Compound] = None,
+    ):
+        """Write MMML expression of columns of notes to a text sink.
+
+        :param sink: A text file object (or anything else with a ``write``
+            method) or a list to which chunks of the expression are appended.
+        :type sink: typing.Union[typing.TextIO, list[str]]
+
+        All other parameters are the same as in :meth:`convert`.
+        """
+        write = sink.append if isinstance(sink, list) else sink.write
+        for chunk in self._iter_chunk(
+            duration, pitch, pitch_offset, volume, is_rest, compound
+        ):
+            write(chunk)
+
+    def _iter_chunk(
+        self,
+        duration: numpy.typing.ArrayLike,
+        pitch: typing.Optional[numpy.typing.ArrayLike],
+        pitch_offset: typing.Optional[numpy.typing.ArrayLike],
+        volume: typing.Optional[numpy.typing.ArrayLike],
+        is_rest: typing.Optional[numpy.typing.ArrayLike],
+        compound: typing.Optional[core_events.abc.Compound],
+    ) -> typing.Iterator[str]:
+        if compound is None:
+            compound = core_events.Consecution()
+        match encoded := _encode(compound):
+            case MMMLHeaderAndBlock(header, _):
+                pass
+            case _:
+                raise NotImplementedError(encoded)
+
+        duration = _as_column(duration)
+        note_count = len(duration)
+        if not note_count:
+            yield f"{header}\n"
+            return
+
+        pitch_string_array, has_pitch = _format_pitch_column(
+            pitch, pitch_offset, note_count
+        )
+        if is_rest is not None:
+            has_pitch &= ~_as_column(is_rest, note_count).astype(bool)
+        duration_string_array = _format_column(duration, _format_duration)
+        if volume is None:
+            volume_string_array = numpy.full(
+                note_count, mmml_converters.constants.IGNORE_MAGIC, dtype=object
+            )
+        else:
+            volume_string_array = _format_column(
+                _as_column(volume, note_count), _format_volume
+            )
+        # Notes don't have any indicators.
+        default_note = music_events.NoteLike()
+        pic, nic = (
+            _asmmml.indicator_collection(default_note.playing_indicator_collection),
+            _asmmml.indicator_collection(default_note.notation_indicator_collection),
+        )
+        n_prefix = f"\n{mmml_converters.constants.INDENTATION}n "
+        r_prefix = f"\n{mmml_converters.constants.INDENTATION}r "
+        suffix = f" {pic} {nic}"
+
+        # The block is preceded and closed by an empty line.
+        chunk_line_count = self._chunk_line_count
+        yield f"{header}\n"
+        for start in range(0, note_count, chunk_line_count):
+            stop = start + chunk_line_count
+            yield "".join(
+                [
+                    (
+                        f"{n_prefix}{d} {p} {v}{suffix}"
+                        if is_note
+                        else f"{r_prefix}{d} {v}{suffix}"
+                    )
+                    for d, p, v, is_note in zip(
+                        duration_string_array[start:stop].tolist(),
+                        pitch_string_array[start:stop].tolist(),
+                        volume_string_array[start:stop].tolist(),
+                        has_pitch[start:stop].tolist(),
+                    )
+                ]
+            )
+        yield "\n"
+
+
+def _as_column(
+    value: numpy.typing.ArrayLike, length: typing.Optional[int] = None
+) -> numpy.ndarray:
+    column = numpy.asarray(value)
+    if column.ndim != 1:
+        raise ValueError(f"Columns need to be one-dimensional, but got '{value}'.")
+    if length is not None and len(column) != length:
+        raise ValueError(
+            f"Columns need to have one item for each of the {length} notes, "
+            f"but got {len(column)} items."
+        )
+    return column
+
+
+def _format_column(
+    column: numpy.ndarray, format_value: typing.Callable[[typing.Any], str]
+) -> numpy.ndarray:
+    """Format each distinct value once and gather the strings"""
+    if column.dtype.kind != "O":
+        unique, inverse = numpy.unique(column, return_inverse=True)
+        string_list = list(map(format_value, unique.tolist()))
+    else:
+        # numpy can't find distinct python objects, because they can't
+        # always be sorted. Values of different types are never the same
+        # (e.g. '0.5' and 'Fraction(1, 2)' are encoded differently).
+        index_dict: dict[tuple[type, typing.Any], int] = {}
+        string_list, inverse = [], []
+        for value in column.tolist():
+            key = _get_key(value)
+            try:
+                index = index_dict[key]
+            except KeyError:
+                index = index_dict[key] = len(string_list)
+                string_list.append(format_value(value))
+            except TypeError:  # Unhashable values, e.g. pitches
+                index = len(string_list)
+                string_list.append(format_value(value))
+            inverse.append(index)
+    return numpy.array(string_list, dtype=object)[inverse]
+
+
+def _format_pitch_column(
+    pitch: typing.Optional[numpy.typing.ArrayLike],
+    pitch_offset: typing.Optional[numpy.typing.ArrayLike],
+    note_count: int,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Get encoded pitch list and if it has any pitches of each note"""
+    pitch_string_array = numpy.full(note_count, None, dtype=object)
+    if pitch is None:
+        return pitch_string_array, numpy.zeros(note_count, dtype=bool)
+    if pitch_offset is None:
+        pitch = _as_column(pitch, note_count)
+        pitch_offset = numpy.arange(note_count + 1)
+    else:
+        pitch = _as_column(pitch)
+        pitch_offset = _as_column(pitch_offset, note_count + 1).astype(numpy.int64)
+        if pitch_offset[0] != 0 or pitch_offset[-1] != len(pitch):
+            raise ValueError(
+                "Pitch offsets need to start with 0 and end with the count "
+                f"of pitches ({len(pitch)}), but got '{pitch_offset}'."
+            )
+    pitch_count = numpy.diff(pitch_offset)
+    if (pitch_count < 0).any():
+        raise ValueError(f"Pitch offsets need to increase, but got '{pitch_offset}'.")
+    # Most notes have one pitch: encode each distinct pitch only once. The
+    # pitch list converter is still used, so the result is the same as if
+    # the pitch list of each note would have been encoded.
+    is_single = pitch_count == 1
+    pitch_string_array[is_single] = _format_column(
+        pitch[pitch_offset[:-1][is_single]], _format_pitch
+    )
+    chord_dict: dict[tuple, str] = {}
+    for index in numpy.flatnonzero(pitch_count > 1).tolist():
+        value_list = pitch[pitch_offset[index] : pitch_offset[index + 1]].tolist()
+        try:
+            pitch_string = chord_dict[key := tuple(map(_get_key, value_list))]
+        except KeyError:
+            pitch_string = chord_dict[key] = _format_pitch_list(value_list)
+        except TypeError:  # Unhashable values, e.g. pitches
+            pitch_string = _format_pitch_list(value_list)
+        pitch_string_array[index] = pitch_string
+    return pitch_string_array, pitch_count > 0
+
+
+def _get_key(value: typing.Any) -> tuple[type, typing.Any]:
+    return type(value), value
+
+
+def _format_duration(value: typing.Any) -> str:
+    return _asmmml.duration(core_parameters.abc.Duration.from_any(value))
+
+
+def _format_pitch(value: typing.Any) -> str:
+    return _format_pitch_list([value])
+
+
+def _format_pitch_list(value_list: list) -> str:
+    return _asmmml.pitch_list(music_parameters.abc.PitchList.from_any(value_list))
+
+
+def _format_volume(value: typing.Any) -> str:
+    volume = music_parameters.abc.Volume.from_any(value)
+    if _is_default_volume(volume):
+        return mmml_converters.constants.IGNORE_MAGIC
+    return _asmmml.volume(volume)
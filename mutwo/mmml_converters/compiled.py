@@ -0,0 +1,266 @@
+"""Cache decoded MMML files in compiled binary files"""
+
+from __future__ import annotations
+
+import functools
+import gc
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import secrets
+import sys
+import types
+import typing
+
+from mutwo import core_converters
+from mutwo import core_events
+from mutwo import core_version
+from mutwo import mmml_converters
+from mutwo import mmml_version
+from mutwo import music_version
+
+from .frontends import HeaderArguments, _render
+
+__all__ = ("CompiledMMMLFileToEvent",)
+
+
+# Magic bytes and format version at the start of each compiled file
+_HEADER = b"MMMLC\x00\x00\x01"
+
+
+class CompiledMMMLFileToEvent(core_converters.abc.Converter):
+    """Decode a MMML file and cache its event in a compiled file.
+
+    :param converter: Defines how MMML is decoded (e.g. if defaults are
+        used). If ``None`` a new :class:`MMMLFileToEvent` is used. Default
+        to ``None``.
+    :type converter: typing.Optional[MMMLFileToEvent]
+    :param directory: Where compiled files are saved. If ``None`` each
+        compiled file is saved next to its MMML file (e.g. 'score.mmml' is
+        compiled to 'score.mmmlc'). Default to ``None``.
+    :type directory: typing.Optional[typing.Union[str, os.PathLike]]
+
+    A compiled file is only loaded if it has been compiled from the same
+    rendered MMML expression (the MMML file content after the mustache
+    data has been filled in), with the same defaults and decoders and with the same versions of ``mutwo.mmml``, ``mutwo.core``,
+    ``mutwo.music`` and Python. Otherwise the MMML file is decoded again
+    and the compiled file is replaced. Changes of functions which are
+    called by a custom decoder aren't noticed, only changes of the decoder
+    itself.
+
+    Compiled files contain pickled events, so custom decoders need to
+    return picklable events. Just like any other pickle, compiled files
+    must never be loaded from untrusted sources.
+
+    Only MMML files which are given as paths are compiled, file objects
+    are always decoded.
+
+    **Example:**
+
+    >>> import os, tempfile
+    >>> from mutwo import mmml_converters
+    >>> d = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(d.name, "score.mmml")
+    >>> with open(path, "w") as f:
+    ...     _ = f.write("cns\\n    r 1/4")
+    >>> c = mmml_converters.CompiledMMMLFileToEvent()
+    >>> c.convert(path)
+    Consecution([NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf))])
+    >>> sorted(os.listdir(d.name))
+    ['score.mmml', 'score.mmmlc']
+    >>> d.cleanup()
+    """
+
+    def __init__(
+        self,
+        converter: typing.Optional[mmml_converters.MMMLFileToEvent] = None,
+        directory: typing.Optional[typing.Union[str, os.PathLike]] = None,
+    ):
+        self._converter = converter or mmml_converters.MMMLFileToEvent()
+        self._directory = directory
+
+    def convert(
+        self, file: mmml_converters.MMMLFile, **kwargs
+    ) -> core_events.abc.Event:
+        """Convert MMML file to a mutwo event.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+        """
+        c = self._converter
+        if not isinstance(file, (str, os.PathLike)):
+            return c.convert(file, **kwargs)
+        with open(file, "rb") as f:
+            content = f.read()
+        # Read like 'MMMLFileToEvent' (with universal newlines). Only the
+        # rendered expression is known to define the event: different
+        # mustache data may be rendered to the same string and vice versa.
+        expression = _render(
+            io.StringIO(content.decode("utf-8"), newline=None).read(), kwargs
+        )
+        default_dict = c._get_default_dict()
+        key = _get_key(expression, default_dict, c._use_defaults)
+        compiled_path = self.get_compiled_path(file)
+        if key is None or (data := _load(compiled_path, key)) is None:
+            node = c._parse_line_iterable(expression.split("\n"))
+            data = (c._materialize_root(node, default_dict), default_dict)
+            if key is not None:
+                _dump(compiled_path, key, data)
+        event, default_dict = data
+        c._keep_default_dict(default_dict)
+        return event
+
+    def get_compiled_path(self, path: typing.Union[str, os.PathLike]) -> str:
+        """Get path of the compiled file of a MMML file.
+
+        :param path: Path of the MMML file.
+        :type path: typing.Union[str, os.PathLike]
+        """
+        extension = mmml_converters.constants.COMPILED_FILE_EXTENSION
+        stem = os.path.splitext(os.fspath(path))[0]
+        if self._directory is None:
+            return f"{stem}{extension}"
+        # Files with the same name in different directories mustn't
+        # share their compiled file.
+        path_hash = hashlib.blake2b(
+            os.path.abspath(path).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        return os.path.join(
+            self._directory, f"{os.path.basename(stem)}-{path_hash}{extension}"
+        )
+
+
+def _get_key(
+    expression: str,
+    default_dict: dict[str, HeaderArguments],
+    use_defaults: bool,
+) -> typing.Optional[bytes]:
+    """Get key of a compiled file or ``None`` if it can't be cached"""
+    if (default_fingerprint := _get_default_fingerprint(default_dict)) is None:
+        return None
+    h = hashlib.blake2b(expression.encode("utf-8"), digest_size=32)
+    for part in (
+        _get_version_fingerprint(),
+        _get_decoder_fingerprint(mmml_converters.constants.DECODER_REGISTRY.items()),
+        default_fingerprint,
+        repr(use_defaults).encode("utf-8"),
+    ):
+        h.update(b"\x00")
+        h.update(part)
+    return h.digest()
+
+
+def _get_default_fingerprint(
+    default_dict: dict[str, HeaderArguments],
+) -> typing.Optional[bytes]:
+    """Get fingerprint of defaults or ``None`` if they have none.
+
+    Defaults are usually strings of MMML headers. All other arguments are
+    pickled, because their ``repr`` may be the same although they are
+    passed differently to decoders.
+    """
+    h = hashlib.blake2b(digest_size=32)
+    for decoder_name, argument_tuple in sorted(default_dict.items()):
+        h.update(f"{decoder_name}\x00{len(argument_tuple)}\x00".encode("utf-8"))
+        for argument in argument_tuple:
+            if isinstance(argument, str):
+                part = b"s" + argument.encode("utf-8")
+            else:
+                try:
+                    part = b"p" + pickle.dumps(argument, protocol=4)
+                except Exception:
+                    return None
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+    return h.digest()
+
+
+@functools.cache
+def _get_version_fingerprint() -> bytes:
+    return repr(
+        (
+            mmml_version.VERSION,
+            core_version.VERSION,
+            music_version.VERSION,
+            sys.version_info[:2],
+        )
+    ).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=16)
+def _get_decoder_fingerprint(
+    decoder_item_tuple: tuple[tuple[str, typing.Callable], ...],
+) -> bytes:
+    h = hashlib.blake2b(digest_size=32)
+    for name, decoder in sorted(decoder_item_tuple, key=lambda item: item[0]):
+        qualname = getattr(decoder, "__qualname__", type(decoder).__qualname__)
+        module = getattr(decoder, "__module__", None)
+        h.update(f"{name}\x00{module}\x00{qualname}\x00".encode("utf-8"))
+        if isinstance(code := getattr(decoder, "__code__", None), types.CodeType):
+            for part in _iter_code_part(code):
+                h.update(part)
+    return h.digest()
+
+
+def _iter_code_part(code: types.CodeType) -> typing.Iterator[bytes]:
+    """Get parts of code which define its behaviour.
+
+    In contrast to ``marshal`` the parts are the same in each process.
+    """
+    yield code.co_code
+    yield repr(code.co_names).encode("utf-8")
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            yield from _iter_code_part(constant)
+        elif isinstance(constant, frozenset):
+            # The order of sets changes between processes.
+            yield repr(sorted(map(repr, constant))).encode("utf-8")
+        else:
+            yield repr(constant).encode("utf-8")
+
+
+def _load(path: str, key: bytes) -> typing.Optional[tuple]:
+    try:
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            prefix = _HEADER + key
+            if m[: len(prefix)] != prefix:
+                return None
+            with memoryview(m)[len(prefix) :] as payload:
+                # Events consist of many small objects, whose creation
+                # would trigger the garbage collector again and again.
+                is_gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return pickle.loads(payload)
+                finally:
+                    if is_gc_enabled:
+                        gc.enable()
+    # Missing, broken or outdated compiled files are simply replaced.
+    except Exception:
+        return None
+
+
+def _dump(path: str, key: bytes, data: tuple):
+    directory, name = os.path.split(os.path.abspath(path))
+    temporary_path = os.path.join(directory, f".{name}.{secrets.token_hex(8)}.tmp")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            f.write(_HEADER)
+            f.write(key)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    except BaseException as e:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        # The cache is optional: it doesn't matter if it can't be written
+        # (e.g. because of missing permissions or unpicklable events).
+        if not isinstance(e, Exception):
+            raise
@@ -10,5 +10,8 @@ IGNORE_MAGIC = r"_"
 COMMENT_MAGIC = r"#"
 """All lines starting with this character are ignored."""
 
+COMPILED_FILE_EXTENSION = r".mmmlc"
+"""The extension of compiled MMML files"""
+
 
 del mmml_utilities
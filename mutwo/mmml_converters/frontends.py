@@ -1,3 +1,12 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import inspect
+import multiprocessing
+import os
+import pickle
+import sys
 import typing
 
 import chevron
@@ -7,17 +16,162 @@ from mutwo import core_events
 from mutwo import mmml_converters
 from mutwo import mmml_utilities
 
-__all__ = ("MMMLExpressionToEvent", "MMMLExpression")
+__all__ = (
+    "MMMLNode",
+    "MMMLExpressionToEvent",
+    "MMMLFileToEvent",
+    "MMMLExpression",
+    "MMMLFile",
+)
 
 
 MMMLExpression: typing.TypeAlias = str
+MMMLFile: typing.TypeAlias = typing.Union[str, os.PathLike, typing.TextIO]
 ExpressionName: typing.TypeAlias = str
 HeaderArguments: typing.TypeAlias = tuple[typing.Any, ...]
+T = typing.TypeVar("T")
+
+
+class MMMLNode(object):
+    """A parsed, but not yet decoded MMML expression.
+
+    :param expression_name: The name of the expression, which defines its
+        decoder.
+    :type expression_name: str
+    :param argument_tuple: The raw (string) arguments of the expression.
+    :type argument_tuple: tuple[str, ...]
+    :param child_list: The nodes of the expressions block.
+    :type child_list: typing.Optional[list[MMMLNode]]
+    :param line_number: The line of the expression header in its source
+        (starting with 1). Default to 0.
+    :type line_number: int
+    :param column: Where the expression header starts in its line
+        (starting with 0). Default to 0.
+    :type column: int
+    :param end_column: Where the expression header ends in its line
+        (the first column after the header). Default to 0.
+    :type end_column: int
+
+    Nodes are returned by :meth:`MMMLExpressionToEvent.parse` and can be
+    decoded to events with :meth:`MMMLExpressionToEvent.materialize`.
+    Iterating over a node or indexing it accesses its children. Two nodes
+    are equal if their expressions are equal (positions are ignored).
+    """
+
+    __slots__ = (
+        "expression_name",
+        "argument_tuple",
+        "child_list",
+        "line_number",
+        "column",
+        "end_column",
+    )
+
+    def __init__(
+        self,
+        expression_name: ExpressionName,
+        argument_tuple: HeaderArguments = (),
+        child_list: typing.Optional[list[MMMLNode]] = None,
+        line_number: int = 0,
+        column: int = 0,
+        end_column: int = 0,
+    ):
+        self.expression_name = expression_name
+        self.argument_tuple = argument_tuple
+        self.child_list = [] if child_list is None else child_list
+        self.line_number = line_number
+        self.column = column
+        self.end_column = end_column
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}({repr(self.expression_name)}, "
+            f"{repr(self.argument_tuple)}, child_count={len(self.child_list)}, "
+            f"line_number={self.line_number})"
+        )
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if not isinstance(other, MMMLNode):
+            return False
+        # Compare without recursion, nodes may be nested very deeply.
+        stack = [(self, other)]
+        while stack:
+            n0, n1 = stack.pop()
+            if (
+                n0.expression_name != n1.expression_name
+                or n0.argument_tuple != n1.argument_tuple
+                or len(n0.child_list) != len(n1.child_list)
+            ):
+                return False
+            stack.extend(zip(n0.child_list, n1.child_list))
+        return True
+
+    __hash__ = None  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self.child_list)
+
+    def __iter__(self) -> typing.Iterator[MMMLNode]:
+        return iter(self.child_list)
+
+    def __getitem__(self, index):
+        return self.child_list[index]
 
 
 class MMMLExpressionToEvent(core_converters.abc.Converter):
     """Convert a MMML expression to a mutwo event.
 
+    :param use_defaults: If set to ``True``, arguments which aren't
+        specified in an expression are taken from the previous expression
+        with the same name. Default to ``False``.
+    :type use_defaults: bool
+    :param cache: If set, the results of :meth:`convert` are cached by the
+        (rendered) expression. Events are cached as pickles, so each cache
+        hit returns a new copy of the cached event. The byte size of a
+        cache item is the size of its pickle and its expression, which
+        is all memory the item holds. Events which can't be pickled
+        aren't cached. Default to ``None``.
+    :type cache: typing.Optional[mmml_utilities.LRUCache]
+    :param max_workers: If set, big expressions are decoded in parallel
+        by this many workers: the expressions at ``parallel_depth`` (e.g.
+        the voices of the root ``cnc``) are split into chunks, which are
+        decoded independently. Defaults are handled exactly as if the
+        expression would have been decoded serially. Default to ``None``.
+    :type max_workers: typing.Optional[int]
+    :param use_processes: If ``True`` the workers are processes, otherwise
+        threads. The decoded events are pickled to return them from worker
+        processes, therefore custom decoders need to return picklable
+        events. Default to ``True``.
+    :type use_processes: bool
+    :param parallel_threshold: Expressions which contain less nested
+        expressions are always decoded serially. Default to 2000.
+    :type parallel_threshold: int
+    :param chunk_event_count: How many nested expressions each chunk
+        contains at least (unless it's the last chunk). Default to 1000.
+    :type chunk_event_count: int
+    :param parallel_depth: The depth of the expressions which are
+        distributed to the workers. The root expression has depth 0.
+        Default to 1.
+    :type parallel_depth: int
+    :param mp_context: The context with which worker processes are
+        started. If ``None`` the default start method of the platform is
+        used. Worker processes which aren't forked only know decoders
+        which are registered when their modules are imported. Nodes which
+        fail in a worker are decoded again serially. Default to ``None``.
+    :type mp_context: typing.Optional[multiprocessing.context.BaseContext]
+    :param keep_defaults: If set to ``True``, the defaults of one
+        conversion are kept for the next conversion (until
+        :meth:`reset_defaults` is called). If set to ``False``, each
+        conversion starts without any defaults. Default to ``True``.
+    :type keep_defaults: bool
+
+    One converter can be shared by multiple threads: the decoder call
+    plans are immutable and all defaults are local to each conversion
+    (which is published when the conversion is done). If the converter
+    uses defaults, ``keep_defaults`` should be ``False`` in this case,
+    otherwise each conversion starts with the defaults of whichever
+    conversion finished last.
+
     **Example:**
 
     >>> from mutwo import mmml_converters
@@ -33,17 +187,52 @@ class MMMLExpressionToEvent(core_converters.abc.Converter):
     Consecution([NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('c', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf)), NoteLike(duration=RatioDuration(0.125), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('d', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(ff)), NoteLike(duration=RatioDuration(0.125), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('e', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(ff)), NoteLike(duration=RatioDuration(0.5), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('d', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(ff))])
     """
 
-    def __init__(self, use_defaults: bool = False):
+    def __init__(
+        self,
+        use_defaults: bool = False,
+        cache: typing.Optional[mmml_utilities.LRUCache] = None,
+        max_workers: typing.Optional[int] = None,
+        use_processes: bool = True,
+        parallel_threshold: int = 2000,
+        chunk_event_count: int = 1000,
+        parallel_depth: int = 1,
+        keep_defaults: bool = True,
+        mp_context: typing.Optional[multiprocessing.context.BaseContext] = None,
+    ):
+        if parallel_depth < 1:
+            raise ValueError("'parallel_depth' needs to be at least 1.")
         self._use_defaults = use_defaults
+        self._keep_defaults = keep_defaults
+        self.cache = cache
+        self._max_workers = max_workers
+        self._use_processes = use_processes
+        self._parallel_threshold = parallel_threshold
+        self._chunk_event_count = chunk_event_count
+        self._parallel_depth = parallel_depth
+        self._mp_context = mp_context
 
-        self._wrapped_decoder_dict = {}
+        # Call plans are immutable, so concurrent conversions can share
+        # them. At worst the same plan is added twice, which is harmless.
+        self._decoder_call_plan_dict: dict[str, _DecoderCallPlan] = {}
 
-        self.__decoder_default_dict = {}
-        self.__decoder_varnames_dict = {}
+        # Defaults which are kept from the previous conversion. This
+        # dict is never mutated, it's only replaced by a new one.
+        self.__decoder_default_dict: dict[str, HeaderArguments] = {}
 
     def reset_defaults(self):
         self.__decoder_default_dict = {}
 
+    def _get_default_dict(self) -> dict[str, HeaderArguments]:
+        """Get new defaults for one conversion"""
+        if self._use_defaults and self._keep_defaults:
+            return dict(self.__decoder_default_dict)
+        return {}
+
+    def _keep_default_dict(self, default_dict: dict[str, HeaderArguments]):
+        """Publish defaults of a finished conversion for the next one"""
+        if self._use_defaults and self._keep_defaults:
+            self.__decoder_default_dict = dict(default_dict)
+
     def convert(self, expression: MMMLExpression, **kwargs) -> core_events.abc.Event:
         """Convert MMML expression to a mutwo event.
 
@@ -63,43 +252,413 @@ class MMMLExpressionToEvent(core_converters.abc.Converter):
         >>> c.convert(expr, duration='1/2', pitch='c')
         NoteLike(duration=RatioDuration(0.5), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('c', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf))
         """
-        e = chevron.render(expression, dict(**kwargs))
-        return self._process_expression(e)
+        e = _render(expression, kwargs)
+        if self.cache is None:
+            return self._process_expression(e)
+        return self._process_expression_with_cache(e)
+
+    def iter_events(
+        self, expression: MMMLExpression, **kwargs
+    ) -> typing.Iterator[core_events.abc.Event]:
+        """Iterate over the events in the block of the root MMML expression.
+
+        :param expression: A MMML expression.
+        :type expression: str
+        :param **kwargs: Data for the mustache parser (see :meth:`convert`).
+        :type **kwargs: typing.Any
+
+        Each event is yielded as soon as it has been decoded, so consumers
+        can already process it while the rest of the expression is still
+        parsed. The decoder of the root expression itself is never called.
+
+        **Example:**
+
+        >>> from mutwo import mmml_converters
+        >>> c = mmml_converters.MMMLExpressionToEvent()
+        >>> mmml = r'''
+        ... cns
+        ...     n 1/4 c
+        ...     r 1/4
+        ... '''
+        >>> for e in c.iter_events(mmml):
+        ...     print(e.duration)
+        R(1/4)
+        R(1/4)
+        """
+        e = _render(expression, kwargs)
+        yield from self._iter_event(e.split("\n"))
 
     def _process_expression(self, expression: str) -> core_events.abc.Event:
-        expression = _drop_comments_and_empty_lines(expression)
-        header, block = _split_to_header_and_block(expression)
-        expression_name, arguments = self._process_header(header)
-        event_tuple = self._process_block(block)
+        return self._process_line_iterable(expression.split("\n"))
+
+    def _process_expression_with_cache(self, expression: str) -> core_events.abc.Event:
+        default_dict = self._get_default_dict()
+        # The result of an expression also depends on the defaults,
+        # so they need to be part of the key.
+        key = (expression, self._get_default_state(default_dict))
         try:
-            wrapped_decoder = self._wrapped_decoder_dict[expression_name]
+            data, default_state = self.cache[key]
         except KeyError:
+            event = self._materialize_root(
+                self._parse_line_iterable(expression.split("\n")), default_dict
+            )
+            # Pickles are much smaller than events and unpickling them is
+            # faster than copying events. Their size is also exactly known.
             try:
-                decoder = mmml_converters.constants.DECODER_REGISTRY[expression_name]
-            except KeyError:
-                raise mmml_utilities.NoDecoderExists(expression_name)
-            self._wrapped_decoder_dict[expression_name] = wrapped_decoder = (
-                self._wrap_decoder(expression_name, decoder)
+                data = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                pass
+            else:
+                self.cache.set(
+                    key,
+                    (data, self._get_default_state(default_dict)),
+                    len(data) + sys.getsizeof(expression),
+                )
+            self._keep_default_dict(default_dict)
+            return event
+        self._keep_default_dict(dict(default_state or ()))
+        return pickle.loads(data)
+
+    def _get_default_state(
+        self, default_dict: dict[str, HeaderArguments]
+    ) -> typing.Optional[frozenset]:
+        if not self._use_defaults:
+            return None
+        return frozenset(default_dict.items())
+
+    def parse(self, expression: MMMLExpression, **kwargs) -> MMMLNode:
+        """Parse MMML expression without decoding it.
+
+        :param expression: A MMML expression.
+        :type expression: str
+        :param **kwargs: Data for the mustache parser (see :meth:`convert`).
+        :type **kwargs: typing.Any
+
+        The returned node can be decoded later with :meth:`materialize`.
+
+        **Example:**
+
+        >>> from mutwo import mmml_converters
+        >>> c = mmml_converters.MMMLExpressionToEvent()
+        >>> node = c.parse("cns melody\\n    n 1/4 c\\n    n 1/4 d")
+        >>> node
+        MMMLNode('cns', ('melody',), child_count=2, line_number=1)
+        >>> c.materialize(node[1])
+        NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('d', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf))
+        """
+        return self._parse_line_iterable(_render(expression, kwargs).split("\n"))
+
+    def materialize(self, node: MMMLNode) -> core_events.abc.Event:
+        """Decode a parsed MMML expression to a mutwo event.
+
+        :param node: The root of the MMML expression which is decoded.
+            This can also be a child node of a bigger expression.
+        :type node: MMMLNode
+        """
+        default_dict = self._get_default_dict()
+        event = self._materialize_root(node, default_dict)
+        self._keep_default_dict(default_dict)
+        return event
+
+    def _materialize_root(
+        self, node: MMMLNode, default_dict: dict[str, HeaderArguments]
+    ) -> core_events.abc.Event:
+        if self._max_workers is not None:
+            return self._materialize_in_parallel(node, default_dict)
+        return self._materialize(node, default_dict)
+
+    def _materialize(
+        self, node: MMMLNode, default_dict: dict[str, HeaderArguments]
+    ) -> core_events.abc.Event:
+        return _exhaust(self._iter_materialize_step(node, default_dict))
+
+    def _iter_materialize_step(
+        self,
+        node: MMMLNode,
+        default_dict: dict[str, HeaderArguments],
+        step_event_count: typing.Optional[int] = None,
+    ) -> typing.Generator[None, None, core_events.abc.Event]:
+        """Decode node and pause after each 'step_event_count' decoded nodes.
+
+        The generator returns the decoded event. If 'step_event_count' is
+        ``None`` it never pauses.
+        """
+        event_count = 0
+        # Each stack item represents a node whose children are currently
+        # decoded and is composed of '(node, child_iterator, event_list)'.
+        # Children are decoded before their parents.
+        stack = [(node, iter(node.child_list), [])]
+        while stack:
+            n, child_iterator, event_list = stack[-1]
+            for child in child_iterator:
+                if child.child_list:
+                    stack.append((child, iter(child.child_list), []))
+                    break
+                event_list.append(self._decode(child, (), default_dict))
+                if step_event_count and (event_count := event_count + 1) >= (
+                    step_event_count
+                ):
+                    event_count = 0
+                    yield
+            else:
+                stack.pop()
+                event = self._decode(n, event_list, default_dict)
+                if not stack:
+                    return event
+                stack[-1][2].append(event)
+
+    def _materialize_in_parallel(
+        self, node: MMMLNode, default_dict: dict[str, HeaderArguments]
+    ) -> core_events.abc.Event:
+        depth = self._parallel_depth
+        # Find the nodes which are decoded by the workers and the defaults
+        # before and after each of them. Defaults only depend on header
+        # arguments, so they can be simulated without decoding anything.
+        partition_node_list: list[MMMLNode] = []
+        # Before & after state of each partition node
+        default_state_list: list[tuple] = []
+        event_count_list: list[int] = []
+        use_defaults = self._use_defaults
+        # The simulation mustn't change the defaults of the conversion.
+        simulated_default_dict = dict(default_dict)
+        stack = [(node, iter(node.child_list))]
+        while stack:
+            n, child_iterator = stack[-1]
+            for child in child_iterator:
+                if len(stack) == depth:
+                    before = self._get_default_state(simulated_default_dict)
+                    event_count = 0
+                    for c in _iter_post_order(child):
+                        event_count += 1
+                        if use_defaults:
+                            _simulate_defaults(simulated_default_dict, c)
+                    partition_node_list.append(child)
+                    event_count_list.append(event_count)
+                    default_state_list.append(
+                        (before, self._get_default_state(simulated_default_dict))
+                    )
+                elif child.child_list:
+                    stack.append((child, iter(child.child_list)))
+                    break
+                elif use_defaults:
+                    _simulate_defaults(simulated_default_dict, child)
+            else:
+                stack.pop()
+                if use_defaults:
+                    _simulate_defaults(simulated_default_dict, n)
+        if sum(event_count_list) < self._parallel_threshold:
+            return self._materialize(node, default_dict)
+
+        chunk_slice_list, start, event_count = [], 0, 0
+        for i, c in enumerate(event_count_list, 1):
+            if (event_count := event_count + c) >= self._chunk_event_count:
+                chunk_slice_list.append(slice(start, i))
+                start, event_count = i, 0
+        if start < len(partition_node_list):
+            chunk_slice_list.append(slice(start, len(partition_node_list)))
+        result_list: list[core_events.abc.Event] = []
+        for chunk_slice, event_list in zip(
+            chunk_slice_list,
+            mmml_utilities.parallel_map(
+                _materialize_chunk,
+                (
+                    use_defaults,
+                    partition_node_list,
+                    [before for before, _ in default_state_list],
+                ),
+                chunk_slice_list,
+                self._max_workers,
+                self._use_processes,
+                self._mp_context,
+            ),
+        ):
+            result_list.extend(event_list)
+            # Workers stop at the first error.
+            result_list.extend(
+                [None] * (chunk_slice.stop - chunk_slice.start - len(event_list))
+            )
+        result_iterator = zip(result_list, default_state_list)
+
+        # Decode the remaining nodes in the same order as '_materialize'.
+        # Nodes which failed in a worker are decoded again when they are
+        # reached, so that always the same error as in serial decoding is
+        # raised (and errors never need to be pickled).
+        stack = [(node, iter(node.child_list), [])]
+        while stack:
+            n, child_iterator, event_list = stack[-1]
+            for child in child_iterator:
+                if len(stack) == depth:
+                    event, (before, after) = next(result_iterator)
+                    if event is None:
+                        _set_default_state(default_dict, before)
+                        event = self._materialize(child, default_dict)
+                    _set_default_state(default_dict, after)
+                    event_list.append(event)
+                elif child.child_list:
+                    stack.append((child, iter(child.child_list), []))
+                    break
+                else:
+                    event_list.append(self._decode(child, (), default_dict))
+            else:
+                stack.pop()
+                event = self._decode(n, event_list, default_dict)
+                if not stack:
+                    return event
+                stack[-1][2].append(event)
+
+    def check(self, expression: MMMLExpression, **kwargs) -> tuple[Exception, ...]:
+        """Find all errors of a MMML expression without decoding it.
+
+        :param expression: A MMML expression.
+        :type expression: str
+        :param **kwargs: Data for the mustache parser (see :meth:`convert`).
+        :type **kwargs: typing.Any
+        :return: All errors sorted by their ``line_number``. If the
+            expression is valid, the tuple is empty.
+
+        The indentation, the expression names and the argument count of
+        each expression are checked. No decoder is called.
+
+        **Example:**
+
+        >>> from mutwo import mmml_converters
+        >>> c = mmml_converters.MMMLExpressionToEvent()
+        >>> mmml = r'''
+        ... cns
+        ...     n 1/4 c mf _ _ _ _ _
+        ...   n 1/4 d
+        ...     x
+        ... '''
+        >>> for error in c.check(mmml):
+        ...     print(error)
+        Line 3: Decoder 'n' takes 0 to 7 argument(s), but 8 were given.
+        Line 4: Bad line '  n 1/4 d'. Missing indentation?
+        Line 5: No decoder has been defined for expression 'x'.
+        """
+        return self._check_line_iterable(_render(expression, kwargs).split("\n"))
+
+    def _check_line_iterable(
+        self, line_iterable: typing.Iterable[str]
+    ) -> tuple[Exception, ...]:
+        error_list: list[Exception] = []
+        for node in _iter_node(line_iterable, error_list.append):
+            stack = [node]
+            while stack:
+                n = stack.pop()
+                stack.extend(n.child_list)
+                if error := self._check_node(n):
+                    error_list.append(error)
+        # Nodes are checked in a different order than lines are parsed.
+        error_list.sort(key=lambda e: e.line_number or 0)
+        return tuple(error_list)
+
+    def _check_node(self, node: MMMLNode) -> typing.Optional[Exception]:
+        try:
+            decoder = mmml_converters.constants.DECODER_REGISTRY[node.expression_name]
+        except KeyError:
+            return mmml_utilities.NoDecoderExists(
+                node.expression_name, node.line_number
+            )
+        call_plan = _get_decoder_call_plan(decoder)
+        minimum, maximum = call_plan.minimum, call_plan.maximum
+        argument_tuple = node.argument_tuple
+        argument_count = len(argument_tuple)
+        # Ignored arguments are never set by a previous expression.
+        if (name := call_plan.get_ignored_required_name(argument_tuple)) is not None:
+            return _get_ignored_required_error(
+                node.expression_name, name, node.line_number
             )
-        return wrapped_decoder(event_tuple, *arguments)
+        # If we use defaults, omitted arguments may be set by a
+        # previous expression.
+        if self._use_defaults:
+            minimum = 0
+        if (maximum is not None and argument_count > maximum) or (
+            argument_count < minimum
+        ):
+            return mmml_utilities.InvalidArgumentCount(
+                node.expression_name,
+                argument_count,
+                minimum,
+                maximum,
+                node.line_number,
+            )
+        return None
+
+    def _process_line_iterable(
+        self, line_iterable: typing.Iterable[str]
+    ) -> core_events.abc.Event:
+        return self.materialize(self._parse_line_iterable(line_iterable))
+
+    def _parse_line_iterable(self, line_iterable: typing.Iterable[str]) -> MMMLNode:
+        node_iterator = _iter_node(line_iterable)
+        root = next(node_iterator)
+        root.child_list.extend(node_iterator)
+        return root
 
-    def _process_header(self, header: str) -> tuple[ExpressionName, HeaderArguments]:
-        data = []
-        for n in header.split(" "):
-            if n:
-                data.extend(n.split("\t"))
-        expression_name, *arguments = filter(bool, data)
-        return expression_name, arguments
+    def _iter_event(
+        self, line_iterable: typing.Iterable[str]
+    ) -> typing.Iterator[core_events.abc.Event]:
+        node_iterator = _iter_node(line_iterable)
+        next(node_iterator)
+        default_dict = self._get_default_dict()
+        for node in node_iterator:
+            yield self._materialize_root(node, default_dict)
+            self._keep_default_dict(default_dict)
 
-    def _process_block(self, block: str) -> tuple[core_events.abc.Event, ...]:
-        expression_tuple = _split_to_expression_tuple(block)
-        return tuple(self._process_expression(e) for e in expression_tuple)
+    def _decode(
+        self,
+        node: MMMLNode,
+        event_sequence: typing.Sequence[core_events.abc.Event],
+        default_dict: dict[str, HeaderArguments],
+    ) -> core_events.abc.Event:
+        expression_name = node.expression_name
+        try:
+            call_plan = self._decoder_call_plan_dict[expression_name]
+        except KeyError:
+            try:
+                decoder = mmml_converters.constants.DECODER_REGISTRY[expression_name]
+            except KeyError:
+                raise mmml_utilities.NoDecoderExists(expression_name, node.line_number)
+            self._decoder_call_plan_dict[expression_name] = call_plan = (
+                _get_decoder_call_plan(decoder)
+            )
+        argument_tuple = node.argument_tuple
+        if self._use_defaults:
+            argument_tuple = self._apply_defaults(
+                expression_name, argument_tuple, default_dict
+            )
+        try:
+            return call_plan(expression_name, tuple(event_sequence), argument_tuple)
+        except mmml_utilities.MalformedMMML as e:
+            if e.line_number is None:
+                e.line_number = node.line_number
+            raise
+        except Exception as e:
+            # Errors of decoders keep their type, so that they can still
+            # be caught as before. Their line is added as an attribute
+            # and (since Python 3.11) as a note, which tracebacks show.
+            if getattr(e, "line_number", None) is None:
+                try:
+                    e.line_number = node.line_number
+                except AttributeError:  # e.g. exceptions with '__slots__'
+                    pass
+            if hasattr(e, "add_note"):
+                e.add_note(
+                    f"While decoding expression '{expression_name}' "
+                    f"in line {node.line_number}."
+                )
+            raise
 
-    def _wrap_decoder(self, decoder_name: str, function: typing.Callable):
-        """Wrap decoder so that it uses the previously used values for its args
+    def _apply_defaults(
+        self,
+        decoder_name: str,
+        argument_tuple: HeaderArguments,
+        default_dict: dict[str, HeaderArguments],
+    ) -> HeaderArguments:
+        """Add previously used arguments to argument tuple and save them.
 
-        With the help of wrapping in the following MMML expression the second
-        note also has a volume of 'fff':
+        In this way the second note of the following MMML expression also
+        has a volume of 'fff':
 
             seq
                 n 1/1 c fff
@@ -107,91 +666,407 @@ class MMMLExpressionToEvent(core_converters.abc.Converter):
                 {{! the previous NoteLike set it as its default. }}
                 n 1/1 c
         """
+        default_tuple = default_dict.get(decoder_name, ())
+        argument_tuple = argument_tuple + default_tuple[len(argument_tuple) :]
+        default_dict[decoder_name] = argument_tuple
+        return argument_tuple
+
+
+def _materialize_chunk(
+    shared: tuple[bool, list[MMMLNode], list[typing.Optional[frozenset]]],
+    chunk_slice: slice,
+) -> list[core_events.abc.Event]:
+    """Decode nodes, each with its own defaults, until the first error"""
+    use_defaults, node_list, default_state_list = shared
+    c = MMMLExpressionToEvent(use_defaults)
+    event_list = []
+    for node, default_state in zip(
+        node_list[chunk_slice], default_state_list[chunk_slice]
+    ):
+        try:
+            event_list.append(c._materialize(node, dict(default_state or ())))
+        except Exception:
+            break
+    return event_list
+
+
+def _set_default_state(
+    default_dict: dict[str, HeaderArguments], default_state: typing.Optional[frozenset]
+):
+    default_dict.clear()
+    default_dict.update(default_state or ())
 
-        varnames = function.__code__.co_varnames
-        self.__decoder_varnames_dict[decoder_name] = varnames
-
-        def _(*args):
-            if self._use_defaults:
-                self._set_decoder_default_args(decoder_name, args)
-                args = self._get_decoder_default_args(decoder_name, args)
-            kwargs = self._args_to_kwargs(decoder_name, args)
-            return function(**kwargs)
-
-        return _
-
-    def _args_to_kwargs(self, decoder_name: str, args: tuple) -> dict:
-        varnames = self.__decoder_varnames_dict[decoder_name]
-        return {
-            name: arg
-            for name, arg in zip(varnames, args)
-            if arg != mmml_converters.constants.IGNORE_MAGIC
-        }
-
-    def _set_decoder_default_args(self, decoder_name: str, args: tuple):
-        """Set currently defined arguments as new default values for decoder"""
-        present_default = self.__decoder_default_dict.get(decoder_name, [])
-        if len(args) > len(present_default):
-            default = list(args)
+
+def _exhaust(step_iterator: typing.Generator[None, None, T]) -> T:
+    """Run all steps of a generator and return its result"""
+    while True:
+        try:
+            next(step_iterator)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _iter_post_order(node: MMMLNode) -> typing.Iterator[MMMLNode]:
+    """Iterate over node and all its descendants, children before parents"""
+    stack = [(node, iter(node.child_list))]
+    while stack:
+        n, child_iterator = stack[-1]
+        for child in child_iterator:
+            stack.append((child, iter(child.child_list)))
+            break
         else:
-            default = present_default
-            for i, v in enumerate(args):
-                default[i] = v
-        self.__decoder_default_dict[decoder_name] = default
-
-    def _get_decoder_default_args(self, decoder_name: str, args: tuple):
-        """Add previously used arguments for decoder to argument list"""
-        arg_list = list(args)
-        arg_count = len(arg_list)
-        present_default = self.__decoder_default_dict[decoder_name]
-        diff = len(present_default) - arg_count
-        for i in range(diff):
-            arg_list.append(present_default[arg_count + i])
-        return tuple(arg_list)
-
-
-def _split_to_header_and_block(expression: str):
-    header, block = None, expression
-    while not header:
-        if not block:
-            raise mmml_utilities.MalformedMMML(
-                f"No MMML expression found in expression '{expression}'"
+            stack.pop()
+            yield n
+
+
+def _simulate_defaults(default_dict: dict[str, HeaderArguments], node: MMMLNode):
+    """Change defaults like :meth:`MMMLExpressionToEvent._apply_defaults`"""
+    argument_tuple = node.argument_tuple
+    default_dict[node.expression_name] = (
+        argument_tuple
+        + default_dict.get(node.expression_name, ())[len(argument_tuple) :]
+    )
+
+
+class MMMLFileToEvent(MMMLExpressionToEvent):
+    """Convert a MMML file to a mutwo event.
+
+    In contrast to :class:`MMMLExpressionToEvent` the file is read and
+    decoded line by line, so the complete MMML expression never needs to
+    be loaded into memory. Only files which contain commands of the
+    mustache template language are fully loaded, because they need to be
+    rendered before they can be decoded.
+
+    **Example:**
+
+    >>> import io
+    >>> from mutwo import mmml_converters
+    >>> c = mmml_converters.MMMLFileToEvent()
+    >>> c.convert(io.StringIO("cns\\n    n 1/4 c"))
+    Consecution([NoteLike(duration=RatioDuration(0.25), instrument_list=[], lyric=DirectLyric(), pitch_list=[WesternPitch('c', 4)], tag=None, tempo=DirectTempo(60.0), volume=WesternVolume(mf))])
+    """
+
+    def convert(self, file: MMMLFile, **kwargs) -> core_events.abc.Event:
+        """Convert MMML file to a mutwo event.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+        """
+        with _open(file) as f:
+            return self._process_line_iterable(_iter_line(f, kwargs))
+
+    def parse(self, file: MMMLFile, **kwargs) -> MMMLNode:
+        """Parse MMML file without decoding it.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+        """
+        with _open(file) as f:
+            return self._parse_line_iterable(_iter_line(f, kwargs))
+
+    def check(self, file: MMMLFile, **kwargs) -> tuple[Exception, ...]:
+        """Find all errors of a MMML file without decoding it.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+
+        See :meth:`MMMLExpressionToEvent.check` for more details.
+        """
+        with _open(file) as f:
+            return self._check_line_iterable(_iter_line(f, kwargs))
+
+    def iter_events(
+        self, file: MMMLFile, **kwargs
+    ) -> typing.Iterator[core_events.abc.Event]:
+        """Iterate over the events in the block of the root MMML expression.
+
+        :param file: Path of a MMML file or a text file object.
+        :type file: typing.Union[str, os.PathLike, typing.TextIO]
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+
+        See :meth:`MMMLExpressionToEvent.iter_events` for more details.
+        """
+        with _open(file) as f:
+            yield from self._iter_event(_iter_line(f, kwargs))
+
+
+def _iter_line(f: typing.TextIO, kwargs: dict) -> typing.Iterable[str]:
+    if _has_mustache_tag(f):
+        return _render(f.read(), kwargs).split("\n")
+    return _strip_line_break(f)
+
+
+def _render(template: str, data: dict) -> str:
+    """Render mustache template.
+
+    Templates without any mustache tag are returned unchanged, all other
+    templates are only tokenized once (see :func:`_tokenize`).
+    """
+    if "{{" not in template:
+        return template
+    return chevron.render(_tokenize(template), data)
+
+
+@functools.lru_cache(maxsize=256)
+def _tokenize(template: str) -> tuple[tuple[str, str], ...]:
+    return tuple(chevron.tokenizer.tokenize(template))
+
+
+@contextlib.contextmanager
+def _open(file: MMMLFile) -> typing.Iterator[typing.TextIO]:
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "r", encoding="utf-8") as f:
+            yield f
+    else:
+        yield file
+
+
+def _has_mustache_tag(f: typing.TextIO, chunk_size: int = 2**16) -> bool:
+    """Test if file contains a mustache tag.
+
+    This doesn't change the position of the file. If the file isn't
+    seekable, we can't find out and therefore assume it has a tag.
+    """
+    if not f.seekable():
+        return True
+    position = f.tell()
+    previous_chunk = ""
+    try:
+        while chunk := f.read(chunk_size):
+            # Don't miss tags which are split between two chunks.
+            if "{{" in f"{previous_chunk[-1:]}{chunk}":
+                return True
+            previous_chunk = chunk
+        return False
+    finally:
+        f.seek(position)
+
+
+def _strip_line_break(line_iterable: typing.Iterable[str]) -> typing.Iterator[str]:
+    for line in line_iterable:
+        yield line[:-1] if line.endswith("\n") else line
+
+
+def _iter_node(
+    line_iterable: typing.Iterable[str],
+    on_error: typing.Optional[typing.Callable[[Exception], None]] = None,
+    first_line_number: int = 1,
+) -> typing.Iterator[MMMLNode]:
+    """Parse MMML lines in a single pass.
+
+    First yields the root node and then each node of the root nodes block
+    as soon as it is complete. The nodes of the root block are not added
+    to the root node.
+
+    The indentation of each line defines its depth. Open nodes are kept
+    on a stack, and are closed as soon as a line with a smaller (or equal)
+    depth appears.
+
+    If 'on_error' is given, errors are passed to it instead of being
+    raised and parsing continues as if the line had a valid indentation.
+
+    'first_line_number' is the line number of the first line, if the
+    lines are only a part of a bigger expression.
+    """
+
+    def error(exception: Exception):
+        if on_error is None:
+            raise exception
+        on_error(exception)
+
+    stack: list[MMMLNode] = []
+    for line_number, line in _filter_comments_and_empty_lines(
+        line_iterable, first_line_number
+    ):
+        # The first line is always the header of the root expression,
+        # regardless of its indentation.
+        if not stack:
+            stack.append(root := _process_header(line, line_number))
+            yield root
+            continue
+        depth = _get_depth(line)
+        if depth == 0:
+            error(
+                mmml_utilities.MalformedMMML(
+                    f"Bad line '{line}'. Missing indentation?", line_number
+                )
             )
-        header, _, block = block.partition("\n")
-    return header, block
+            depth = 1
+        # The line is more than one level deeper than the expression
+        # which is currently open: there is no header for its block.
+        if depth > len(stack):
+            error(
+                mmml_utilities.MalformedMMML(
+                    "First line needs to start a block", line_number
+                )
+            )
+            depth = len(stack)
+        while len(stack) > depth:
+            if (node := _close_node(stack)) is not None:
+                yield node
+        stack.append(_process_header(line, line_number))
+
+    if not stack:
+        error(mmml_utilities.MalformedMMML("No MMML expression found in expression ''"))
+    while len(stack) > 1:
+        if (node := _close_node(stack)) is not None:
+            yield node
+
 
+class _DecoderCallPlan(typing.NamedTuple):
+    """Precompiled way how to call a decoder with header arguments.
 
-def _split_to_expression_tuple(mmml: str) -> tuple[list[str], ...]:
-    lines = filter(bool, mmml.split("\n"))
+    Header arguments are passed positionally. Only if an argument is
+    :const:`IGNORE_MAGIC`, it is replaced by the default value of its
+    parameter.
+    """
+
+    decoder: typing.Callable
+    # Names & default values of all parameters which can be set by
+    # header arguments.
+    name_tuple: tuple[str, ...]
+    default_tuple: tuple[typing.Any, ...]
+    # Minimal and maximal (or 'None' for unlimited) header argument count
+    minimum: int
+    maximum: typing.Optional[int]
 
-    expression_list = []
-    expression_line_list: list[str] = []
-    for line in lines:
-        # First drop indentation, but check if actually exists. If it
-        # doesn't exist it means there is a problem in the expression.
-        if not line.startswith(mmml_converters.constants.INDENTATION):
-            raise mmml_utilities.MalformedMMML(
-                f"Bad line '{line}'. Missing indentation?"
+    def __call__(
+        self,
+        decoder_name: str,
+        event_tuple: tuple[core_events.abc.Event, ...],
+        argument_tuple: HeaderArguments,
+    ) -> core_events.abc.Event:
+        argument_count = len(argument_tuple)
+        if argument_count < self.minimum or (
+            self.maximum is not None and argument_count > self.maximum
+        ):
+            raise mmml_utilities.InvalidArgumentCount(
+                decoder_name, argument_count, self.minimum, self.maximum
             )
-        line = line[len(mmml_converters.constants.INDENTATION) :]
+        ignore_magic = mmml_converters.constants.IGNORE_MAGIC
+        if ignore_magic in argument_tuple:
+            default_tuple = self.default_tuple
+            argument_list = []
+            for i, argument in enumerate(argument_tuple):
+                if argument == ignore_magic:
+                    try:
+                        argument = default_tuple[i]
+                    # Ignored arguments of '*args' are dropped.
+                    except IndexError:
+                        continue
+                    if argument is inspect.Parameter.empty:
+                        raise _get_ignored_required_error(
+                            decoder_name, self.name_tuple[i]
+                        )
+                argument_list.append(argument)
+            argument_tuple = tuple(argument_list)
+        return self.decoder(event_tuple, *argument_tuple)
 
-        # Test that first line is a header / has no indentation
-        if line.startswith(mmml_converters.constants.INDENTATION):
-            if not expression_line_list:
-                raise mmml_utilities.MalformedMMML("First line needs to start a block")
-            expression_line_list.append(line)
-        else:
-            if expression_line_list:
-                expression_list.append(expression_line_list)
-            expression_line_list = [line]
-    if expression_line_list:
-        expression_list.append(expression_line_list)
-    return tuple("\n".join(e) for e in expression_list)
+    def get_ignored_required_name(
+        self, argument_tuple: HeaderArguments
+    ) -> typing.Optional[str]:
+        """Get name of the first required parameter whose argument is ignored"""
+        ignore_magic = mmml_converters.constants.IGNORE_MAGIC
+        for name, argument in zip(
+            self.name_tuple[: self.minimum], argument_tuple[: self.minimum]
+        ):
+            if argument == ignore_magic:
+                return name
+        return None
 
 
-def _drop_comments_and_empty_lines(expression: str) -> str:
-    def _(line):
-        sline = line.strip()
-        return bool(sline) and sline[0] != mmml_converters.constants.COMMENT_MAGIC
+def _get_ignored_required_error(
+    decoder_name: str, name: str, line_number: typing.Optional[int] = None
+) -> mmml_utilities.MalformedMMML:
+    return mmml_utilities.MalformedMMML(
+        f"Required argument '{name}' of decoder '{decoder_name}' can't be "
+        f"skipped with '{mmml_converters.constants.IGNORE_MAGIC}'.",
+        line_number,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_decoder_call_plan(decoder: typing.Callable) -> _DecoderCallPlan:
+    """Compile call plan from the signature of a decoder.
+
+    The first parameter of each decoder is the event tuple of its block,
+    which isn't set by a header argument.
+    """
+    name_list, default_list = [], []
+    minimum, maximum = 0, 0
+    parameter_list = list(inspect.signature(decoder).parameters.values())[1:]
+    for parameter in parameter_list:
+        match parameter.kind:
+            case parameter.POSITIONAL_ONLY | parameter.POSITIONAL_OR_KEYWORD:
+                name_list.append(parameter.name)
+                default_list.append(parameter.default)
+                maximum += 1
+                if parameter.default is parameter.empty:
+                    minimum = maximum
+            case parameter.VAR_POSITIONAL:
+                maximum = None
+                break
+    return _DecoderCallPlan(
+        decoder, tuple(name_list), tuple(default_list), minimum, maximum
+    )
 
-    return "\n".join(filter(_, expression.split("\n")))
+
+def _close_node(stack: list[MMMLNode]) -> typing.Optional[MMMLNode]:
+    """Pop node from stack and add it to its parent.
+
+    Nodes of the root block aren't added to the root, but returned.
+    """
+    node = stack.pop()
+    if len(stack) > 1:
+        stack[-1].child_list.append(node)
+        return None
+    return node
+
+
+def _process_header(header: str, line_number: int) -> MMMLNode:
+    data = []
+    for n in header.split(" "):
+        if n:
+            data.extend(n.split("\t"))
+    expression_name, *arguments = filter(bool, data)
+    # Positional arguments are faster, this is called for each line.
+    return MMMLNode(
+        expression_name,
+        tuple(arguments),
+        None,
+        line_number,
+        len(header) - len(header.lstrip()),
+        len(header.rstrip()),
+    )
+
+
+def _get_depth(line: str) -> int:
+    """Count how often a line starts with :const:`INDENTATION`"""
+    indentation = mmml_converters.constants.INDENTATION
+    indentation_size = len(indentation)
+    depth, position = 0, 0
+    while line.startswith(indentation, position):
+        depth += 1
+        position += indentation_size
+    return depth
+
+
+def _filter_comments_and_empty_lines(
+    line_iterable: typing.Iterable[str], first_line_number: int = 1
+) -> typing.Iterator[tuple[int, str]]:
+    comment_magic = mmml_converters.constants.COMMENT_MAGIC
+    for line_number, line in enumerate(line_iterable, first_line_number):
+        sline = line.strip()
+        if sline and sline[0] != comment_magic:
+            yield line_number, line
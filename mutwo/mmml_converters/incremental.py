@@ -0,0 +1,681 @@
+"""Update converted MMML expressions and events after small changes"""
+
+from __future__ import annotations
+
+import bisect
+import gc
+import operator
+import typing
+
+from mutwo import core_converters
+from mutwo import core_events
+from mutwo import mmml_converters
+from mutwo import music_parameters
+
+from .backends import MMMLHeaderAndBlock, _get_indicator_collection_plan, _indent
+from .codes import _encode
+
+from .frontends import (
+    HeaderArguments,
+    MMMLNode,
+    _get_depth,
+    _filter_comments_and_empty_lines,
+    _iter_node,
+    _render,
+    _set_default_state,
+)
+
+__all__ = ("IncrementalMMMLExpressionToEvent", "IncrementalEventToMMMLExpression")
+
+
+class _Record(typing.NamedTuple):
+    """Decoded event of a node and the defaults around it"""
+
+    event: core_events.abc.Event
+    # Defaults before the first and after the last expression of the
+    # node (including its block) has been decoded.
+    before: typing.Optional[frozenset]
+    after: typing.Optional[frozenset]
+
+
+class IncrementalMMMLExpressionToEvent(core_converters.abc.Converter):
+    """Convert a MMML expression and update its event after each edit.
+
+    :param converter: Defines how MMML is decoded (e.g. if defaults are
+        used). Its ``cache`` and ``max_workers`` are ignored. If ``None``
+        a new :class:`MMMLExpressionToEvent` is used. Default to ``None``.
+    :type converter: typing.Optional[MMMLExpressionToEvent]
+
+    After an expression has been converted with :meth:`convert`, lines of
+    it can be replaced with :meth:`edit`. Only the expressions which
+    contain changed lines are parsed and decoded again. Expressions after
+    them are decoded again only if ``use_defaults`` is ``True`` and their
+    defaults changed. All other events are reused, so the returned events
+    share unchanged events with previously returned events and must not be
+    mutated. The decoders of the expressions which enclose changed lines
+    are called again with the (partly reused) events of their blocks.
+
+    If the expression contains commands of the mustache template
+    language, each edit converts the complete expression again.
+
+    **Example:**
+
+    >>> from mutwo import mmml_converters
+    >>> c = mmml_converters.IncrementalMMMLExpressionToEvent(
+    ...     mmml_converters.MMMLExpressionToEvent(use_defaults=True)
+    ... )
+    >>> mmml = r'''cns
+    ...     n 1/4 c ff
+    ...     n 1/4 d
+    ...     n 1/4 e'''
+    >>> [n.volume for n in c.convert(mmml)]
+    [WesternVolume(ff), WesternVolume(ff), WesternVolume(ff)]
+    >>> [n.volume for n in c.edit(2, 3, "    n 1/4 c pp")]
+    [WesternVolume(pp), WesternVolume(pp), WesternVolume(pp)]
+    >>> print(c.expression)
+    cns
+        n 1/4 c pp
+        n 1/4 d
+        n 1/4 e
+    """
+
+    def __init__(
+        self, converter: typing.Optional[mmml_converters.MMMLExpressionToEvent] = None
+    ):
+        self._converter = converter or mmml_converters.MMMLExpressionToEvent()
+        self._line_list: list[str] = []
+        self._kwargs: dict = {}
+        self._is_template = False
+        self._root: typing.Optional[MMMLNode] = None
+        self._record_dict: dict[int, _Record] = {}
+        # Defaults before the expression is decoded: edits which convert
+        # the complete expression again need to start with them (and not
+        # with the defaults after the previous version of the expression).
+        self._default_state: typing.Optional[frozenset] = None
+
+    @property
+    def expression(self) -> mmml_converters.MMMLExpression:
+        """The current (edited) MMML expression"""
+        return "\n".join(self._line_list)
+
+    def convert(
+        self, expression: mmml_converters.MMMLExpression, **kwargs
+    ) -> core_events.abc.Event:
+        """Convert MMML expression to a mutwo event.
+
+        :param expression: A MMML expression.
+        :type expression: str
+        :param **kwargs: Data for the mustache parser (see
+            :meth:`MMMLExpressionToEvent.convert`).
+        :type **kwargs: typing.Any
+
+        The expression replaces any previously converted expression.
+        """
+        c = self._converter
+        return self._convert_line_list(
+            expression.split("\n"), kwargs, c._get_default_dict()
+        )
+
+    def edit(self, start: int, stop: int, text: str) -> core_events.abc.Event:
+        """Replace lines of the expression and update its event.
+
+        :param start: The number of the first replaced line (starting
+            with 1).
+        :type start: int
+        :param stop: The number of the line after the last replaced line.
+            If it's equal to ``start``, the text is inserted before line
+            ``start``.
+        :type stop: int
+        :param text: The lines which replace the old lines.
+        :type text: str
+
+        If the edited expression can't be decoded, the error is raised and
+        the expression stays unchanged.
+        """
+        line_list = self._line_list
+        if not 1 <= start <= stop <= len(line_list) + 1:
+            raise ValueError(
+                f"Invalid line range {start} to {stop} for an expression "
+                f"with {len(line_list)} lines."
+            )
+        text_line_list = text.split("\n")
+        new_line_list = line_list[: start - 1] + text_line_list + line_list[stop - 1 :]
+        root = self._root
+        if (
+            root is None
+            or self._is_template
+            or "{{" in text
+            or start <= root.line_number
+        ):
+            return self._convert_line_list(
+                new_line_list, self._kwargs, dict(self._default_state or ())
+            )
+        return self._edit(start, stop, text_line_list, new_line_list)
+
+    def _convert_line_list(
+        self,
+        line_list: list[str],
+        kwargs: dict,
+        default_dict: dict[str, HeaderArguments],
+    ) -> core_events.abc.Event:
+        c = self._converter
+        expression = "\n".join(line_list)
+        root = c._parse_line_iterable(_render(expression, kwargs).split("\n"))
+        default_state = c._get_default_state(default_dict)
+        record_dict: dict[int, _Record] = {}
+        event = self._decode_tree(root, default_dict, record_dict)
+        self._line_list, self._kwargs = line_list, kwargs
+        self._default_state = default_state
+        self._is_template = "{{" in expression
+        self._root, self._record_dict = root, record_dict
+        c._keep_default_dict(default_dict)
+        return event
+
+    def _edit(
+        self,
+        start: int,
+        stop: int,
+        text_line_list: list[str],
+        new_line_list: list[str],
+    ) -> core_events.abc.Event:
+        c = self._converter
+        delta = len(text_line_list) - (stop - start)
+        text_depth = min(
+            (
+                _get_depth(line)
+                for _, line in _filter_comments_and_empty_lines(text_line_list)
+            ),
+            default=None,
+        )
+
+        # Find the deepest node whose block contains all changed lines
+        # and which can't be changed by the new lines.
+        node, end, depth = self._root, len(self._line_list), 0
+        path: list[tuple[MMMLNode, int]] = []
+        while text_depth is None or text_depth > depth + 1:
+            child_list = node.child_list
+            i = bisect.bisect_left(child_list, start, key=_get_line_number) - 1
+            if i < 0:
+                break
+            child_end = _get_end(child_list, i, end)
+            if stop - 1 > child_end:
+                break
+            path.append((node, i))
+            node, end, depth = child_list[i], child_end, depth + 1
+
+        # Find the children whose lines are changed. The child before
+        # them is parsed again, too: new lines may belong to its block.
+        child_list = node.child_list
+        last_line_number = stop - 1 if start < stop else start - 1
+        i1 = bisect.bisect_right(child_list, last_line_number, key=_get_line_number)
+        i0 = max(bisect.bisect_right(child_list, start, key=_get_line_number) - 2, 0)
+        if i0 < i1:
+            first_line_number = min(start, child_list[i0].line_number)
+            last_line_number = max(last_line_number, _get_end(child_list, i1 - 1, end))
+        else:
+            first_line_number = start
+
+        # Parse the lines of the changed children as the block of a
+        # placeholder root which is at the depth of 'node'.
+        indentation = mmml_converters.constants.INDENTATION * depth
+        region_line_list = [
+            line[len(indentation) :] if line.startswith(indentation) else line
+            for line in new_line_list[first_line_number - 1 : last_line_number + delta]
+        ]
+        node_iterator = _iter_node(
+            ["_", *region_line_list], first_line_number=first_line_number - 1
+        )
+        next(node_iterator)
+        new_child_list = list(node_iterator)
+
+        # Decode the new children and all expressions whose defaults
+        # changed. Records are only saved if everything could be decoded.
+        get_record = self._record_dict.__getitem__
+        record_dict: dict[int, _Record] = {}
+
+        def record(n: MMMLNode) -> _Record:
+            try:
+                return record_dict[id(n)]
+            except KeyError:
+                return get_record(id(n))
+
+        default_dict: dict = {}
+        _set_default_state(
+            default_dict,
+            record(child_list[i0 - 1]).after if i0 > 0 else record(node).before,
+        )
+        for child in new_child_list:
+            self._decode_tree(child, default_dict, record_dict)
+        # Decode the changed node, its ancestors and all their following
+        # siblings whose defaults changed.
+        level_list = [
+            (
+                node,
+                [record(n).event for n in child_list[:i0]]
+                + [record(n).event for n in new_child_list],
+                child_list[i1:],
+            )
+        ]
+        for parent, i in reversed(path):
+            level_list.append(
+                (
+                    parent,
+                    [record(n).event for n in parent.child_list[:i]],
+                    parent.child_list[i + 1 :],
+                )
+            )
+        event = None
+        for n, event_list, sibling_list in level_list:
+            if event is not None:
+                event_list.append(event)
+            state = c._get_default_state(default_dict)
+            for sibling_index, sibling in enumerate(sibling_list):
+                if record(sibling).before == state:
+                    # Nothing changed for this and all following siblings.
+                    event_list.extend(
+                        record(s).event for s in sibling_list[sibling_index:]
+                    )
+                    _set_default_state(default_dict, record(sibling_list[-1]).after)
+                    break
+                event_list.append(self._decode_tree(sibling, default_dict, record_dict))
+                state = c._get_default_state(default_dict)
+            event = c._decode(n, event_list, default_dict)
+            record_dict[id(n)] = _Record(
+                event, record(n).before, c._get_default_state(default_dict)
+            )
+
+        # Everything could be decoded: apply changes.
+        removed_child_list = child_list[i0:i1]
+        child_list[i0:i1] = new_child_list
+        if delta:
+            for _, _, sibling_list in level_list:
+                for sibling in sibling_list:
+                    for n in _iter_tree(sibling):
+                        n.line_number += delta
+        for removed_child in removed_child_list:
+            for n in _iter_tree(removed_child):
+                self._record_dict.pop(id(n), None)
+        self._record_dict.update(record_dict)
+        self._line_list = new_line_list
+        root_record = self._record_dict[id(self._root)]
+        c._keep_default_dict(dict(root_record.after or ()))
+        return root_record.event
+
+    def _decode_tree(
+        self,
+        node: MMMLNode,
+        default_dict: dict,
+        record_dict: dict[int, _Record],
+    ) -> core_events.abc.Event:
+        """Decode node like :meth:`MMMLExpressionToEvent.materialize`.
+
+        The event and defaults of each decoded node are recorded.
+        """
+        c = self._converter
+        get_state = c._get_default_state
+        stack = [(node, iter(node.child_list), [])]
+        before_list = [get_state(default_dict)]
+        while stack:
+            n, child_iterator, event_list = stack[-1]
+            for child in child_iterator:
+                before = get_state(default_dict)
+                if child.child_list:
+                    stack.append((child, iter(child.child_list), []))
+                    before_list.append(before)
+                    break
+                event = c._decode(child, (), default_dict)
+                record_dict[id(child)] = _Record(event, before, get_state(default_dict))
+                event_list.append(event)
+            else:
+                stack.pop()
+                event = c._decode(n, event_list, default_dict)
+                record_dict[id(n)] = _Record(
+                    event, before_list.pop(), get_state(default_dict)
+                )
+                if not stack:
+                    return event
+                stack[-1][2].append(event)
+
+
+def _get_line_number(node: MMMLNode) -> int:
+    return node.line_number
+
+
+def _get_end(child_list: list[MMMLNode], index: int, end: int) -> int:
+    """Get the last line of a child (including its block)"""
+    try:
+        return child_list[index + 1].line_number - 1
+    except IndexError:
+        return end
+
+
+def _iter_tree(node: MMMLNode) -> typing.Iterator[MMMLNode]:
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        yield n
+        stack.extend(n.child_list)
+
+
+class _Fingerprint(typing.NamedTuple):
+    """Objects and state on which an encoded event depends"""
+
+    # The attribute values of the event. Together with the fragment they
+    # are kept, so that their ids can't be reused by other objects.
+    value_tuple: tuple
+    # '(index of the attribute value, function which fetches its state)'
+    state_getter_tuple: tuple[
+        tuple[int, typing.Callable[[typing.Any], typing.Any]], ...
+    ]
+    state_tuple: tuple
+
+
+class _Fragment(typing.NamedTuple):
+    """Encoded subtree of an event"""
+
+    event: core_events.abc.Event
+    fingerprint: typing.Optional[_Fingerprint]
+    encoded: typing.Union[str, MMMLHeaderAndBlock]
+    child_tuple: tuple[_Fragment, ...]
+    # MMML of the subtree. Unless it's the root it's indented by one level.
+    text: str
+    is_indented: bool
+
+
+class IncrementalEventToMMMLExpression(core_converters.abc.Converter):
+    """Encode events and reuse the MMML of all subtrees which didn't change.
+
+    :param check_state: If ``True`` changes of attribute values in place
+        (e.g. of the articulation of a note) are noticed. Otherwise only
+        the identity of attribute values is compared, which is much
+        faster, but each change in place needs to be reported with
+        :meth:`invalidate`. Default to ``True``.
+    :type check_state: bool
+
+    If an event is encoded again (e.g. to save a score after each edit),
+    only events which changed since the last conversion are passed to
+    their encoder. The MMML of each unchanged subtree is reused, the MMML
+    of each changed subtree is spliced together from the MMML of its
+    children. As long as all changes are noticed, the returned expression
+    is the same as the expression returned by
+    :class:`EventToMMMLExpression`.
+
+    An event is unchanged if it's the same object as before, if each of
+    its attribute values still is the same object as before and if the
+    items of list attributes (e.g. of ``pitch_list``) and the length of
+    nested events (e.g. of ``grace_note_consecution``) are unchanged. If
+    ``check_state`` is ``True`` furthermore the attributes of attribute
+    values and list items (e.g. of a pitch) and the indicators of
+    indicator collections need to be unchanged. Changes which are nested
+    deeper aren't noticed. The blocks of events are expected to be nested
+    events (like the blocks which the encoders of
+    :mod:`mutwo.mmml_converters` return), because the blocks of unchanged
+    events are reused.
+
+    **Example:**
+
+    >>> from mutwo import core_events, mmml_converters, music_events
+    >>> cns = core_events.Consecution(
+    ...     [music_events.NoteLike('c', 1), music_events.NoteLike('d', 1)]
+    ... )
+    >>> c = mmml_converters.IncrementalEventToMMMLExpression()
+    >>> print(c.convert(cns))
+    cns
+    <BLANKLINE>
+        n 1 c4 _ _ _
+        n 1 d4 _ _ _
+    <BLANKLINE>
+    >>> cns[1].pitch_list = 'e'
+    >>> cns[0].playing_indicator_collection.articulation.name = '.'
+    >>> print(c.convert(cns))
+    cns
+    <BLANKLINE>
+        n 1 c4 _ articulation.name=. _
+        n 1 e4 _ _ _
+    <BLANKLINE>
+    >>> c.encoded_event_count
+    2
+    """
+
+    def __init__(self, check_state: bool = True):
+        self._check_state = check_state
+        self._fragment_dict: dict[int, _Fragment] = {}
+        # How many events had to be passed to their encoder during the
+        # last conversion
+        self.encoded_event_count: typing.Optional[int] = None
+
+    def convert(self, event: core_events.abc.Event) -> mmml_converters.MMMLExpression:
+        """Encode event to a MMML expression.
+
+        :param event: The event which is encoded.
+        :type event: core_events.abc.Event
+
+        Only the MMML of subtrees of this event is remembered for the
+        next conversion.
+        """
+        # Fragments consist of many small objects, whose creation would
+        # trigger the garbage collector again and again.
+        is_gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._convert(event)
+        finally:
+            if is_gc_enabled:
+                gc.enable()
+
+    def _convert(self, event: core_events.abc.Event) -> mmml_converters.MMMLExpression:
+        check_state = self._check_state
+        old_fragment_dict = self._fragment_dict
+        # 'id(event)' -> fragment. The fragment keeps the event, so that
+        # its id can't be reused by another object.
+        fragment_dict: dict[int, _Fragment] = {}
+        encoded_event_count = 0
+        # Each stack item is '(event, encoded, fingerprint, old_fragment,
+        # child_fragment_list, event_iterator)'. The first item only
+        # collects the fragment of the root event.
+        stack: list[tuple] = [(None, None, None, None, [], iter((event,)))]
+        while True:
+            e, encoded, fingerprint, old, child_list, event_iterator = stack[-1]
+            try:
+                e = next(event_iterator)
+            except StopIteration:
+                if len(stack) == 1:
+                    break
+                stack.pop()
+                child_tuple = tuple(child_list)
+            else:
+                old = fragment_dict.get(id(e)) or old_fragment_dict.get(id(e))
+                if old is not None and old.event is e:
+                    fingerprint, is_unchanged = _get_fingerprint(
+                        e, old.fingerprint, check_state
+                    )
+                else:
+                    is_unchanged = False
+                if is_unchanged:
+                    encoded = old.encoded
+                else:
+                    old = None
+                    encoded_event_count += 1
+                    encoded = _encode(e)
+                    # Encoders may initialize attributes (e.g. a default
+                    # tempo), so the fingerprint is fetched again.
+                    fingerprint, _ = _get_fingerprint(e, None, check_state)
+                match encoded:
+                    case MMMLHeaderAndBlock(_, block) if block:
+                        stack.append((e, encoded, fingerprint, old, [], iter(block)))
+                        continue
+                    case str() | MMMLHeaderAndBlock():
+                        child_tuple = ()
+                    case _:
+                        raise NotImplementedError(encoded)
+            is_indented = len(stack) > 1
+            if (
+                old is not None
+                and old.is_indented == is_indented
+                and len(old.child_tuple) == len(child_tuple)
+                and all(map(operator.is_, old.child_tuple, child_tuple))
+            ):
+                fragment = old
+            else:
+                fragment = _Fragment(
+                    e,
+                    fingerprint,
+                    encoded,
+                    child_tuple,
+                    _render_fragment(encoded, child_tuple, is_indented),
+                    is_indented,
+                )
+            fragment_dict[id(e)] = fragment
+            stack[-1][4].append(fragment)
+        self._fragment_dict = fragment_dict
+        self.encoded_event_count = encoded_event_count
+        (root,) = stack[0][4]
+        return root.text
+
+    def invalidate(self, event: typing.Optional[core_events.abc.Event] = None):
+        """Forget the MMML of an event, so that it's encoded again.
+
+        :param event: The event which has been changed. If ``None`` the
+            MMML of all events is forgotten. Default to ``None``.
+        :type event: typing.Optional[core_events.abc.Event]
+
+        Needs to be called after changes of an event which can't be
+        noticed (see :class:`IncrementalEventToMMMLExpression`).
+        """
+        if event is None:
+            self._fragment_dict = {}
+        else:
+            self._fragment_dict.pop(id(event), None)
+
+
+def _render_fragment(
+    encoded: typing.Union[str, MMMLHeaderAndBlock],
+    child_tuple: tuple[_Fragment, ...],
+    is_indented: bool,
+) -> str:
+    match encoded:
+        case str():
+            text = encoded
+        case MMMLHeaderAndBlock(header, block):
+            if child_tuple:
+                text = "\n".join([f"{header}\n"] + [f.text for f in child_tuple] + [""])
+            elif block is not None:
+                text = f"{header}\n"
+            else:
+                text = header
+    return _indent(text) if is_indented else text
+
+
+def _get_fingerprint(
+    event: core_events.abc.Event,
+    old_fingerprint: typing.Optional[_Fingerprint],
+    check_state: bool,
+) -> tuple[typing.Optional[_Fingerprint], bool]:
+    """Get fingerprint of event and if it's the same as the old fingerprint"""
+    try:
+        value_tuple = tuple(vars(event).values())
+    except TypeError:  # Events without '__dict__' are always encoded again
+        return None, False
+    if (
+        old_fingerprint is not None
+        and len(old_fingerprint.value_tuple) == len(value_tuple)
+        # Objects are compared by identity: new objects may be equal to
+        # old objects, but their MMML may still differ.
+        and all(map(operator.is_, old_fingerprint.value_tuple, value_tuple))
+    ):
+        # Still the same objects, so they still have the same types.
+        state_getter_tuple = old_fingerprint.state_getter_tuple
+    else:
+        old_fingerprint = None
+        state_getter_tuple = tuple(
+            (i, get_state)
+            for i, value in enumerate(value_tuple)
+            if (get_state := _get_state_getter(type(value), check_state))
+        )
+    try:
+        state_tuple = tuple(
+            [get_state(value_tuple[i]) for i, get_state in state_getter_tuple]
+        )
+    except AttributeError:  # Indicators have been replaced by the user
+        return None, False
+    return _Fingerprint(value_tuple, state_getter_tuple, state_tuple), (
+        old_fingerprint is not None and old_fingerprint.state_tuple == state_tuple
+    )
+
+
+def _get_state_getter(
+    value_type: type, check_state: bool
+) -> typing.Optional[typing.Callable[[typing.Any], typing.Any]]:
+    state_getter_dict = _STATE_GETTER_DICT_TUPLE[check_state]
+    try:
+        return state_getter_dict[value_type]
+    except KeyError:
+        get_state = state_getter_dict[value_type] = _make_state_getter(
+            value_type, check_state
+        )
+        return get_state
+
+
+def _make_state_getter(
+    value_type: type, check_state: bool
+) -> typing.Optional[typing.Callable[[typing.Any], typing.Any]]:
+    if issubclass(value_type, core_events.abc.Compound):
+        # Nested events are encoded as a block and therefore have their
+        # own fragments, but the block may appear or disappear.
+        return len
+    if issubclass(value_type, list):
+        return _get_item_state if check_state else _get_item_identity
+    if not check_state or issubclass(value_type, core_events.abc.Event):
+        return None
+    if issubclass(value_type, music_parameters.abc.IndicatorCollection):
+        return _get_indicator_collection_state
+    if getattr(value_type, "__dictoffset__", 0):
+        return _get_attribute_state
+    # Objects without '__dict__', e.g. numbers or strings
+    return None
+
+
+# Type of an object -> function which fetches its state. The first dict
+# is used if 'check_state' is 'False', the second if it's 'True'.
+_STATE_GETTER_DICT_TUPLE: tuple[
+    dict[type, typing.Optional[typing.Callable[[typing.Any], typing.Any]]], ...
+] = ({}, {})
+
+
+def _get_identity(object_iterable: typing.Iterable) -> tuple[tuple[int, ...], tuple]:
+    # Ids are compared first, so that different objects are never
+    # compared by their (maybe expensive or broken) '__eq__'. The objects
+    # are kept, so that their ids can't be reused by other objects.
+    object_tuple = tuple(object_iterable)
+    return tuple(map(id, object_tuple)), object_tuple
+
+
+def _get_item_identity(value: list) -> tuple[tuple[int, ...], tuple]:
+    return _get_identity(value)
+
+
+def _get_item_state(value: list) -> tuple:
+    return _get_identity(value), tuple(map(_get_state, value))
+
+
+def _get_state(value: typing.Any) -> typing.Any:
+    if get_state := _get_state_getter(type(value), True):
+        return get_state(value)
+    return None
+
+
+def _get_attribute_state(value: typing.Any) -> tuple:
+    return tuple(vars(value).values())
+
+
+def _get_indicator_collection_state(
+    indicator_collection: music_parameters.abc.IndicatorCollection,
+) -> tuple[tuple, tuple]:
+    # Replaced indicators are noticed by comparing the indicators, which
+    # is much faster than fetching their classes. Indicators are
+    # dataclasses, so only indicators of the same class can be equal.
+    return tuple(vars(indicator_collection).values()), (
+        _get_indicator_collection_plan(type(indicator_collection)).get_value_tuple(
+            indicator_collection
+        )
+    )
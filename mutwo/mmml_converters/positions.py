@@ -0,0 +1,191 @@
+"""Map decoded events to the positions of their expressions in MMML"""
+
+from __future__ import annotations
+
+import array
+import bisect
+import typing
+
+from mutwo import mmml_converters
+
+__all__ = ("MMMLSpan", "MMMLSourceIndex")
+
+
+EventPath: typing.TypeAlias = tuple[int, ...]
+
+
+class MMMLSpan(typing.NamedTuple):
+    """Where an expression (including its block) is written.
+
+    Lines start with 1 and columns with 0. The span starts at the first
+    character of the expression header and ends after the last
+    character of the last expression in its block (or of its header if
+    its block is empty).
+    """
+
+    line_number: int
+    column: int
+    end_line_number: int
+    end_column: int
+
+
+class MMMLSourceIndex(object):
+    """Positions of all expressions of a parsed MMML expression.
+
+    :param node: The parsed MMML expression (see
+        :meth:`MMMLExpressionToEvent.parse`).
+    :type node: MMMLNode
+
+    Each expression is addressed by its path: the positions of the
+    expression and of all its parents in the blocks which contain them.
+    The root expression has the path ``()``. For compounds the path of an
+    expression is the same as the path of its event: e.g. the event of
+    the expression ``(1, 0)`` is ``event[1][0]``. For other expressions
+    it depends on their decoder where the events of their block end up
+    (e.g. ``n`` puts them in the grace notes of its note).
+
+    Positions refer to the rendered expression, so if a MMML expression
+    contains mustache tags, its lines may differ from the lines of the
+    template. Comments and empty lines are never part of an expression.
+
+    All positions are kept in a few flat arrays (one item per expression
+    in each array), so the index is also small for big scores. The parsed
+    nodes aren't referenced by the index.
+
+    **Example:**
+
+    >>> from mutwo import mmml_converters
+    >>> c = mmml_converters.MMMLExpressionToEvent()
+    >>> mmml = r'''
+    ... cns
+    ...     n 1/4 c
+    ...
+    ...     cnc
+    ...         n 1/2 d
+    ...         n 1/2 f
+    ... '''
+    >>> node = c.parse(mmml)
+    >>> index = mmml_converters.MMMLSourceIndex(node)
+    >>> event = c.materialize(node)
+    >>> index.get_span((1, 0))
+    MMMLSpan(line_number=6, column=8, end_line_number=6, end_column=15)
+    >>> index.get_span((1,))
+    MMMLSpan(line_number=5, column=4, end_line_number=7, end_column=15)
+    >>> path = index.get_path(7)
+    >>> path
+    (1, 1)
+    >>> event[path[0]][path[1]].pitch_list
+    [WesternPitch('f', 4)]
+    """
+
+    def __init__(self, node: mmml_converters.MMMLNode):
+        line_number_array, column_array, end_column_array = (
+            array.array("i"),
+            array.array("i"),
+            array.array("i"),
+        )
+        parent_array, position_array = array.array("i"), array.array("i")
+        child_count_list = []
+        # Expressions are indexed in the same order as they are written,
+        # which is the pre-order of their nodes. Each stack item is
+        # '(node, parent_index, position)'.
+        stack = [(node, -1, 0)]
+        while stack:
+            n, parent_index, position = stack.pop()
+            index = len(line_number_array)
+            line_number_array.append(n.line_number)
+            column_array.append(n.column)
+            end_column_array.append(n.end_column)
+            parent_array.append(parent_index)
+            position_array.append(position)
+            child_list = n.child_list
+            child_count_list.append(len(child_list))
+            stack.extend(
+                (child_list[p], index, p) for p in range(len(child_list) - 1, -1, -1)
+            )
+
+        expression_count = len(line_number_array)
+        # The children of expression 'i' are the expressions
+        # 'child_index_array[child_offset_array[i]:child_offset_array[i + 1]]'.
+        child_offset_array = array.array("i", (0,))
+        for child_count in child_count_list:
+            child_offset_array.append(child_offset_array[-1] + child_count)
+        child_index_array = array.array("i", (0,)) * (expression_count - 1)
+        fill_array = array.array("i", child_offset_array)
+        for index in range(1, expression_count):
+            parent_index = parent_array[index]
+            child_index_array[fill_array[parent_index]] = index
+            fill_array[parent_index] += 1
+        # Descendants of expression 'i' are the expressions after 'i'
+        # until (excluding) 'end_array[i]'.
+        end_array = array.array("i", range(1, expression_count + 1))
+        for index in range(expression_count - 1, 0, -1):
+            parent_index = parent_array[index]
+            end_array[parent_index] = max(end_array[parent_index], end_array[index])
+
+        self._line_number_array = line_number_array
+        self._column_array = column_array
+        self._end_column_array = end_column_array
+        self._parent_array = parent_array
+        self._position_array = position_array
+        self._child_offset_array = child_offset_array
+        self._child_index_array = child_index_array
+        self._end_array = end_array
+
+    def __len__(self) -> int:
+        return len(self._line_number_array)
+
+    def get_span(self, path: EventPath) -> MMMLSpan:
+        """Get where the expression with the given path is written.
+
+        :param path: The path of the expression (see :class:`MMMLSourceIndex`).
+        :type path: tuple[int, ...]
+        :raises IndexError: If no expression has this path.
+        """
+        index = self._get_index(path)
+        last_index = self._end_array[index] - 1
+        return MMMLSpan(
+            self._line_number_array[index],
+            self._column_array[index],
+            self._line_number_array[last_index],
+            self._end_column_array[last_index],
+        )
+
+    def get_path(self, line_number: int) -> typing.Optional[EventPath]:
+        """Get path of the innermost expression whose span contains a line.
+
+        :param line_number: A line of the MMML expression (starting with 1).
+        :type line_number: int
+        :return: The path or ``None`` if the line is outside of the root
+            expression.
+        """
+        line_number_array, end_array = self._line_number_array, self._end_array
+        index = bisect.bisect_right(line_number_array, line_number) - 1
+        # The last expression which starts before the line may already
+        # be closed: its parents may still contain the line.
+        while index >= 0 and line_number_array[end_array[index] - 1] < line_number:
+            index = self._parent_array[index]
+        if index < 0:
+            return None
+        return self._get_path(index)
+
+    def _get_index(self, path: EventPath) -> int:
+        child_offset_array = self._child_offset_array
+        index = 0
+        for position in path:
+            offset = child_offset_array[index]
+            child_count = child_offset_array[index + 1] - offset
+            if position < 0:
+                position += child_count
+            if not 0 <= position < child_count:
+                raise IndexError(f"No expression has the path '{path}'.")
+            index = self._child_index_array[offset + position]
+        return index
+
+    def _get_path(self, index: int) -> EventPath:
+        parent_array, position_array = self._parent_array, self._position_array
+        position_list = []
+        while index > 0:
+            position_list.append(position_array[index])
+            index = parent_array[index]
+        return tuple(reversed(position_list))
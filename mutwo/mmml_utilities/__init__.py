@@ -1,2 +1,4 @@
 from .exceptions import *
 from .codes import *
+from .caches import *
+from .parallel import *
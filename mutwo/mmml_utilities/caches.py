@@ -0,0 +1,111 @@
+import collections
+import typing
+
+__all__ = ("LRUCache", "CacheInfo")
+
+
+class CacheInfo(typing.NamedTuple):
+    """Statistics of a :class:`LRUCache`"""
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: typing.Optional[int]
+    currsize: int
+    max_byte_size: typing.Optional[int]
+    byte_size: int
+
+
+class LRUCache(object):
+    """Memory bounded cache which drops the least recently used items first.
+
+    :param maxsize: How many items the cache can hold at most. If ``None``
+        the item count is unlimited. Default to 128.
+    :type maxsize: typing.Optional[int]
+    :param max_byte_size: How many bytes the cache can hold at most. The
+        byte size of each item has to be declared when it's added to the
+        cache. If ``None`` the byte size is unlimited. Default to ``None``.
+    :type max_byte_size: typing.Optional[int]
+
+    **Example:**
+
+    >>> from mutwo import mmml_utilities
+    >>> cache = mmml_utilities.LRUCache(maxsize=2)
+    >>> cache.set("a", 1)
+    >>> cache.set("b", 2)
+    >>> cache["a"]
+    1
+    >>> cache.set("c", 3)
+    >>> "b" in cache
+    False
+    >>> cache.cache_info()
+    CacheInfo(hits=1, misses=0, evictions=1, maxsize=2, currsize=2, max_byte_size=None, byte_size=0)
+    """
+
+    def __init__(
+        self,
+        maxsize: typing.Optional[int] = 128,
+        max_byte_size: typing.Optional[int] = None,
+    ):
+        self._maxsize = maxsize
+        self._max_byte_size = max_byte_size
+        self.cache_clear()
+
+    def __getitem__(self, key: typing.Hashable) -> typing.Any:
+        try:
+            value, _ = self._item_dict[key]
+        except KeyError:
+            self._misses += 1
+            raise
+        self._item_dict.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._item_dict
+
+    def __len__(self) -> int:
+        return len(self._item_dict)
+
+    def set(self, key: typing.Hashable, value: typing.Any, byte_size: int = 0):
+        """Add item to cache.
+
+        :param key: The key of the item.
+        :type key: typing.Hashable
+        :param value: The item.
+        :type value: typing.Any
+        :param byte_size: The memory footprint of the item. Default to 0.
+        :type byte_size: int
+
+        Items which are bigger than ``max_byte_size`` are never added.
+        """
+        if self._max_byte_size is not None and byte_size > self._max_byte_size:
+            return
+        if (item := self._item_dict.pop(key, None)) is not None:
+            self._byte_size -= item[1]
+        self._item_dict[key] = (value, byte_size)
+        self._byte_size += byte_size
+        while (self._maxsize is not None and len(self._item_dict) > self._maxsize) or (
+            self._max_byte_size is not None and self._byte_size > self._max_byte_size
+        ):
+            _, (_, dropped_byte_size) = self._item_dict.popitem(last=False)
+            self._byte_size -= dropped_byte_size
+            self._evictions += 1
+
+    def cache_info(self) -> CacheInfo:
+        """Get hit, miss & eviction statistics and the current cache size"""
+        return CacheInfo(
+            self._hits,
+            self._misses,
+            self._evictions,
+            self._maxsize,
+            len(self._item_dict),
+            self._max_byte_size,
+            self._byte_size,
+        )
+
+    def cache_clear(self):
+        """Remove all items and reset statistics"""
+        self._item_dict: collections.OrderedDict = collections.OrderedDict()
+        self._byte_size = 0
+        self._hits = self._misses = self._evictions = 0
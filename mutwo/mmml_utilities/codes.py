@@ -23,6 +23,10 @@ class DecoderRegistry(object):
     def __contains__(self, obj: typing.Any) -> bool:
         return obj in self.__decoder_dict
 
+    def items(self) -> tuple[tuple[str, Decoder], ...]:
+        """Get all registered decoders and their names"""
+        return tuple(self.__decoder_dict.items())
+
     def register_decoder(self, function: Decoder, name: typing.Optional[str] = None):
         name = name or function.__name__
         if name in self:
@@ -31,6 +35,15 @@ class DecoderRegistry(object):
             )
         self.__decoder_dict[name] = function
 
+    def unregister_decoder(self, name: str):
+        """Remove decoder with the given name.
+
+        :param name: The name of the decoder.
+        :type name: str
+        :raises KeyError: If no decoder with this name is registered.
+        """
+        del self.__decoder_dict[name]
+
 
 class EncoderRegistry(object):
     def __init__(self):
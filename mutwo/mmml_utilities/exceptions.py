@@ -1,17 +1,79 @@
-__all__ = ("MalformedMMML", "NoDecoderExists", "NoEncoderExists")
+import typing
+
+__all__ = (
+    "MalformedMMML",
+    "InvalidArgumentCount",
+    "NoDecoderExists",
+    "NoEncoderExists",
+)
 
 
 class MalformedMMML(Exception):
-    """A malformed MMML expression"""
+    """A malformed MMML expression
+
+    :param message: Description of the problem.
+    :type message: str
+    :param line_number: The line where the problem appeared (starting
+        with 1). Default to ``None``.
+    :type line_number: typing.Optional[int]
+    """
+
+    def __init__(self, message: str = "", line_number: typing.Optional[int] = None):
+        super().__init__(message)
+        self.line_number = line_number
+
+    def __str__(self) -> str:
+        return _add_line_number(super().__str__(), self.line_number)
+
+    def __reduce__(self):
+        return type(self), (*self.args, self.line_number)
+
+
+class InvalidArgumentCount(MalformedMMML):
+    """An expression has too many or too few arguments for its decoder"""
+
+    def __init__(
+        self,
+        expression_keyword: str,
+        argument_count: int,
+        minimum: int,
+        maximum: typing.Optional[int],
+        line_number: typing.Optional[int] = None,
+    ):
+        self._init_args = (expression_keyword, argument_count, minimum, maximum)
+        if maximum is None:
+            expected = f"at least {minimum}"
+        elif minimum == maximum:
+            expected = str(minimum)
+        else:
+            expected = f"{minimum} to {maximum}"
+        super().__init__(
+            f"Decoder '{expression_keyword}' takes {expected} argument(s), "
+            f"but {argument_count} were given.",
+            line_number,
+        )
+
+    def __reduce__(self):
+        return type(self), (*self._init_args, self.line_number)
 
 
 class NoDecoderExists(Exception):
     """A decoder exists for a given MMML expression"""
 
-    def __init__(self, expression_keyword: str):
+    def __init__(
+        self, expression_keyword: str, line_number: typing.Optional[int] = None
+    ):
         super().__init__(
             f"No decoder has been defined for expression '{expression_keyword}'."
         )
+        self.expression_keyword = expression_keyword
+        self.line_number = line_number
+
+    def __str__(self) -> str:
+        return _add_line_number(super().__str__(), self.line_number)
+
+    def __reduce__(self):
+        return type(self), (self.expression_keyword, self.line_number)
 
 
 class NoEncoderExists(Exception):
@@ -19,3 +81,11 @@ class NoEncoderExists(Exception):
 
     def __init__(self, event_type):
         super().__init__(f"No encoder has been defined for '{event_type}'.")
+
+
+def _add_line_number(message: str, line_number: typing.Optional[int]) -> str:
+    # The line number is often only known after the error has been
+    # created (e.g. errors of decoders), so it isn't part of the message.
+    if line_number is None:
+        return message
+    return f"Line {line_number}: {message}"
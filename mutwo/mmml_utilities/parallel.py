@@ -0,0 +1,83 @@
+import concurrent.futures
+import multiprocessing
+import typing
+
+__all__ = ("parallel_map",)
+
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+
+def parallel_map(
+    function: typing.Callable[[typing.Any, T], R],
+    shared: typing.Any,
+    argument_sequence: typing.Sequence[T],
+    max_workers: typing.Optional[int] = None,
+    use_processes: bool = True,
+    mp_context: typing.Optional[multiprocessing.context.BaseContext] = None,
+) -> list[R]:
+    """Call function with shared data and each argument in parallel.
+
+    :param function: Is called as ``function(shared, argument)``. For
+        worker processes it needs to be picklable.
+    :type function: typing.Callable[[typing.Any, T], R]
+    :param shared: Data which all calls need.
+    :type shared: typing.Any
+    :param argument_sequence: The arguments of all calls.
+    :type argument_sequence: typing.Sequence[T]
+    :param max_workers: How many workers are used. If ``None`` the
+        default of :mod:`concurrent.futures` is used. Default to ``None``.
+    :type max_workers: typing.Optional[int]
+    :param use_processes: If ``True`` the workers are processes,
+        otherwise threads. Default to ``True``.
+    :type use_processes: bool
+    :param mp_context: The context with which worker processes are
+        started. If ``None`` the default start method of the platform is
+        used. Default to ``None``.
+    :type mp_context: typing.Optional[multiprocessing.context.BaseContext]
+    :return: The results of all calls in the order of their arguments.
+
+    The shared data is sent only once to each worker process. Processes
+    which are started with the 'fork' method (e.g. with
+    ``multiprocessing.get_context("fork")``) simply inherit it, so that
+    only arguments and results are pickled. But forking a process which
+    runs multiple threads can deadlock, so 'fork' is never used unless
+    it's requested.
+
+    **Example:**
+
+    >>> from mutwo import mmml_utilities
+    >>> mmml_utilities.parallel_map(pow, 2, [1, 2, 3], use_processes=False)
+    [2, 4, 8]
+    """
+    if not use_processes:
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            return list(
+                executor.map(
+                    function, [shared] * len(argument_sequence), argument_sequence
+                )
+            )
+    # The shared data is passed only once to each worker process and
+    # forked workers simply inherit it.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers,
+        mp_context=mp_context,
+        initializer=_initialize,
+        initargs=(function, shared),
+    ) as executor:
+        return list(executor.map(_call, argument_sequence))
+
+
+# Function and shared data of the current worker process
+_WORKER_STATE: typing.Optional[tuple[typing.Callable, typing.Any]] = None
+
+
+def _initialize(function: typing.Callable, shared: typing.Any):
+    global _WORKER_STATE
+    _WORKER_STATE = (function, shared)
+
+
+def _call(argument: typing.Any) -> typing.Any:
+    function, shared = _WORKER_STATE
+    return function(shared, argument)
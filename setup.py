@@ -9,7 +9,7 @@ VERSION = version["VERSION"]
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
 
-extras_require = {"testing": ["pytest>=7.1.1"]}
+extras_require = {"testing": ["pytest>=7.1.1"], "columnar": ["numpy"]}
 
 setuptools.setup(
     name="mutwo.mmml",
@@ -1,5 +1,21 @@
+import asyncio
+import concurrent.futures
+import fractions
+import gzip
+import io
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import threading
 import unittest
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from mutwo import core_events
 from mutwo import mmml_converters
 from mutwo import mmml_utilities
@@ -23,6 +39,15 @@ class MMMLExpressionToEventTest(unittest.TestCase):
         # Comments
         self.assertTrue(self.c("{{! this is a comment }}\n" "n\n" "{{! comment2 }}"))
 
+        # Same template with different data
+        mmml = "cns\n{{#notes}}\n    n {{duration}} {{pitch}}\n{{/notes}}"
+        for notes in ([], [dict(duration="1/4", pitch="c")], [dict(duration=2)] * 3):
+            self.reset()
+            self.assertEqual(
+                self.c(mmml, notes=notes),
+                cns([n(note.get("pitch", []), note["duration"]) for note in notes]),
+            )
+
     def test_multiple_expressions(self):
         """Test that only one MMML expression is allowed per string"""
 
@@ -34,6 +59,38 @@ class MMMLExpressionToEventTest(unittest.TestCase):
     def test_bad_indentation(self):
         """Test that bad indentation is forbidden"""
         self.assertRaises(mmml_utilities.MalformedMMML, self.c, ("cns\n" "        n\n"))
+        # Also in nested blocks
+        self.assertRaises(
+            mmml_utilities.MalformedMMML,
+            self.c,
+            ("cns\n" "    cns\n" "            n\n"),
+        )
+
+    def test_deep_nesting(self):
+        """Test that deeply nested expressions are parsed correctly"""
+
+        depth = 50
+        mmml = "\n".join(
+            f"{mmml_converters.constants.INDENTATION * i}cns" for i in range(depth)
+        )
+        mmml += f"\n{mmml_converters.constants.INDENTATION * depth}n 1/4 c"
+        event = n("c", "1/4")
+        for _ in range(depth):
+            event = cns([event])
+        self.assertEqual(self.c(mmml), event)
+
+    def test_very_deep_nesting(self):
+        """Test that nesting depth isn't limited by Python's recursion limit"""
+
+        depth = sys.getrecursionlimit() * 2
+        mmml = "\n".join(
+            f"{mmml_converters.constants.INDENTATION * i}cns" for i in range(depth)
+        )
+        event = self.c(mmml)
+        for _ in range(depth - 1):
+            self.assertEqual(len(event), 1)
+            event = event[0]
+        self.assertEqual(event, cns())
 
     def test_no_expression(self):
         """Test that no expression is forbidden"""
@@ -110,6 +167,17 @@ n 1 c4 mf
             ),
         )
 
+    def test_decoder_n_independent_parameters(self):
+        """Test that notes with equal arguments don't share parameter objects"""
+
+        n0, n1 = self.c("cns\n    n 1/4 c4 p\n    n 1/4 c4 p")
+        self.assertEqual(n0, n1)
+        for parameter_name in ("duration", "volume"):
+            self.assertIsNot(getattr(n0, parameter_name), getattr(n1, parameter_name))
+        self.assertIsNot(n0.pitch_list[0], n1.pitch_list[0])
+        n0.pitch_list[0].octave = 5
+        self.assertEqual(n1.pitch_list[0].octave, 4)
+
     def test_decoder_r(self):
         """Test that builtin decoder 'r' returns NoteLike with correct attr"""
 
@@ -163,11 +231,812 @@ n 1 c4 mf
 
         self.reset()
 
+    def test_iter_events(self):
+        """Test that events of the root block are yielded one by one"""
+
+        mmml = "cns\n" "    n 1/4 c\n" "    cns\n" "    cnc\n" "        n\n" "    n _ d"
+        self.assertEqual(list(self.c.iter_events(mmml)), list(self.c(mmml)))
+        self.reset()
+        self.assertEqual(list(self.c.iter_events("n")), [])
+        self.assertRaises(
+            mmml_utilities.MalformedMMML, list, self.c.iter_events("n\nn")
+        )
+
+    def test_parse(self):
+        """Test that expressions can be parsed without being decoded"""
+
+        mmml = "# comment\ncns a\n    n 1/4 c\n\n    cns\n        x\n    n _ d"
+        node = self.c.parse(mmml)
+        self.assertEqual(
+            node,
+            mmml_converters.MMMLNode(
+                "cns",
+                ("a",),
+                [
+                    mmml_converters.MMMLNode("n", ("1/4", "c")),
+                    mmml_converters.MMMLNode(
+                        "cns", (), [mmml_converters.MMMLNode("x")]
+                    ),
+                    mmml_converters.MMMLNode("n", ("_", "d")),
+                ],
+            ),
+        )
+        self.assertEqual([child.line_number for child in node], [3, 5, 7])
+        self.assertEqual(node[1][0].line_number, 6)
+
+        # Decoding is deferred
+        self.assertEqual(self.c.materialize(node[0]), n("c", "1/4"))
+        self.assertEqual(self.c.materialize(node[2]), n("d"))
+        self.assertRaises(mmml_utilities.NoDecoderExists, self.c.materialize, node)
+
+    def test_check(self):
+        """Test that all errors are found without decoding the expression"""
+
+        self.assertEqual(self.c.check("cns\n    n 1/4 c\n    cnc\n        r"), ())
+
+        mmml = "cns\n        n\n    n 1 2 3 4 5 6 7 8\n    x\nn\n    cns a 1 2"
+        error_tuple = self.c.check(mmml)
+        self.assertEqual(
+            [type(e) for e in error_tuple],
+            [
+                mmml_utilities.MalformedMMML,
+                mmml_utilities.InvalidArgumentCount,
+                mmml_utilities.NoDecoderExists,
+                mmml_utilities.MalformedMMML,
+                mmml_utilities.InvalidArgumentCount,
+            ],
+        )
+        self.assertEqual([e.line_number for e in error_tuple], [2, 3, 4, 5, 6])
+
+        self.assertEqual(len(self.c.check("")), 1)
+
+    def test_check_required_argument(self):
+        """Test that missing arguments are found"""
+
+        def required_argument(event_tuple, a, b=1):
+            return cns()
+
+        mmml_converters.register_decoder(required_argument)
+        self.addCleanup(mmml_converters.unregister_decoder, "required_argument")
+        c = mmml_converters.MMMLExpressionToEvent()
+        self.assertEqual(c.check("required_argument 1 2"), ())
+        self.assertEqual(len(c.check("required_argument")), 1)
+        (error,) = c.check("required_argument _ 2")
+        self.assertIs(type(error), mmml_utilities.MalformedMMML)
+        self.assertEqual(
+            str(error),
+            "Line 1: Required argument 'a' of decoder 'required_argument' "
+            "can't be skipped with '_'.",
+        )
+        # Missing argument can be set by previous expression
+        self.assertEqual(self.c.check("required_argument"), ())
+        # ... but ignored arguments are never set by previous expressions.
+        self.assertEqual(len(self.c.check("required_argument _")), 1)
+        # Decoding raises the same errors as 'check' reports
+        for mmml in ("required_argument", "required_argument _ 2"):
+            (error,) = c.check(mmml)
+            with self.assertRaises(mmml_utilities.MalformedMMML) as context:
+                c(mmml)
+            self.assertIs(type(context.exception), type(error))
+            self.assertEqual(str(context.exception), str(error))
+
+    def test_decoder_signature(self):
+        """Test that header arguments are mapped to the decoders signature"""
+
+        def signature_test(event_tuple, a="a", *, b="b"):
+            c = "c"
+            return cns(tag=f"{a}{b}{c}")
+
+        mmml_converters.register_decoder(signature_test)
+        self.addCleanup(mmml_converters.unregister_decoder, "signature_test")
+        self.assertEqual(self.c("signature_test"), cns(tag="abc"))
+        self.assertEqual(self.c("signature_test x"), cns(tag="xbc"))
+        self.assertEqual(self.c("signature_test _"), cns(tag="abc"))
+        # Keyword-only parameters and local variables can't be set
+        self.assertRaises(
+            mmml_utilities.InvalidArgumentCount, self.c, "signature_test x y"
+        )
+        self.assertRaises(
+            mmml_utilities.InvalidArgumentCount, self.c, "n 1 c p _ _ _ _ x"
+        )
+
     def test_empty_argument(self):
         """Ensure that MMML takes the decoders default value if magic '_' is given as an argument"""
         self.assertEqual(n(volume="pppp"), self.c("n _ _ pppp"))
         self.assertEqual(n(volume="pppp", duration="5/4"), self.c("n 5/4 _ pppp"))
 
+    def test_error_line_number(self):
+        """Test that decoding errors report the line of their expression"""
+
+        for mmml, error_type, line_number in (
+            ("cns\n    n\n\n    x", mmml_utilities.NoDecoderExists, 4),
+            (
+                "cns\n    cns\n        n 1 c p _ _ _ _ x",
+                mmml_utilities.InvalidArgumentCount,
+                3,
+            ),
+        ):
+            with self.assertRaises(error_type) as context:
+                self.c(mmml)
+            self.assertEqual(context.exception.line_number, line_number)
+            self.assertTrue(str(context.exception).startswith(f"Line {line_number}:"))
+
+        # Errors of decoders keep their type.
+        with self.assertRaises(Exception) as context:
+            self.c("cns\n    n 1/4 c\n    n 1/4 c xyz")
+        self.assertNotIsInstance(context.exception, mmml_utilities.MalformedMMML)
+        self.assertEqual(context.exception.line_number, 3)
+        if sys.version_info >= (3, 11):
+            self.assertIn("line 3", context.exception.__notes__[-1])
+
+
+class MMMLSourceIndexTest(unittest.TestCase):
+    mmml = (
+        "# comment\n"
+        "cns a\n"
+        "    n 1/4 c\n"
+        "\n"
+        "    cnc\n"
+        "        n 1/2 d\n"
+        "         n 1/2 e  \n"
+        "    # comment\n"
+        "    n 1 f\n"
+        "\n"
+    )
+
+    def setUp(self):
+        self.c = mmml_converters.MMMLExpressionToEvent()
+        self.node = self.c.parse(self.mmml)
+        self.index = mmml_converters.MMMLSourceIndex(self.node)
+
+    def test_get_span(self):
+        span = mmml_converters.MMMLSpan
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.get_span(()), span(2, 0, 9, 9))
+        self.assertEqual(self.index.get_span((1,)), span(5, 4, 7, 16))
+        self.assertEqual(self.index.get_span((1, 1)), span(7, 9, 7, 16))
+        self.assertEqual(self.index.get_span((-1,)), span(9, 4, 9, 9))
+        self.assertRaises(IndexError, self.index.get_span, (3,))
+        self.assertRaises(IndexError, self.index.get_span, (0, 0))
+
+    def test_get_path(self):
+        event = self.c.materialize(self.node)
+        self.assertEqual(
+            [self.index.get_path(line_number) for line_number in range(12)],
+            [None, None, (), (0,), (), (1,), (1, 0), (1, 1), (), (2,), None, None],
+        )
+        for line_number in (3, 6, 7, 9):
+            e = event
+            for position in self.index.get_path(line_number):
+                e = e[position]
+            self.assertEqual(e, self.c(self.mmml.split("\n")[line_number - 1].strip()))
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        mmml = "\n".join(
+            f"{mmml_converters.constants.INDENTATION * i}cns" for i in range(depth)
+        )
+        index = mmml_converters.MMMLSourceIndex(self.c.parse(mmml))
+        self.assertEqual(index.get_path(depth), (0,) * (depth - 1))
+        self.assertEqual(index.get_span(())[2], depth)
+
+
+class MMMLExpressionToEventParallelTest(unittest.TestCase):
+    mmml = r"""
+cnc
+    cns a
+        n 1/4 c ff
+        n _ d
+
+        cns
+            n 1/8
+            r
+
+    n 1/2
+    cns
+        n
+        n _ e p
+    r _ pp
+"""
+
+    def test_parallel(self):
+        for use_defaults in (False, True):
+            expected_event = mmml_converters.MMMLExpressionToEvent(use_defaults)(
+                self.mmml
+            )
+            for use_processes in (False, True):
+                for parallel_depth in (1, 2, 3):
+                    c = mmml_converters.MMMLExpressionToEvent(
+                        use_defaults,
+                        max_workers=2,
+                        use_processes=use_processes,
+                        parallel_threshold=1,
+                        chunk_event_count=2,
+                        parallel_depth=parallel_depth,
+                    )
+                    self.assertEqual(c(self.mmml), expected_event)
+
+    def test_parallel_defaults(self):
+        c = mmml_converters.MMMLExpressionToEvent(
+            True, max_workers=2, use_processes=False, parallel_threshold=1
+        )
+        serial_c = mmml_converters.MMMLExpressionToEvent(True)
+        for _ in range(2):
+            self.assertEqual(c(self.mmml), serial_c(self.mmml))
+        self.assertEqual(c("n"), serial_c("n"))
+
+    def test_parallel_error(self):
+        mmml = "cnc\n    n 1/4\n    cns\n        n 1/4 c mf _ _ _ _ _\n    x"
+        c = mmml_converters.MMMLExpressionToEvent(
+            max_workers=2, parallel_threshold=1, chunk_event_count=1
+        )
+        self.assertRaises(mmml_utilities.InvalidArgumentCount, c, mmml)
+
+    def test_parallel_mp_context(self):
+        c = mmml_converters.MMMLExpressionToEvent(
+            max_workers=2,
+            parallel_threshold=1,
+            chunk_event_count=2,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        expected_event = mmml_converters.MMMLExpressionToEvent()(self.mmml)
+        self.assertEqual(c(self.mmml), expected_event)
+
+
+class MMMLExpressionToEventThreadTest(unittest.TestCase):
+    mmml_tuple = (
+        "cns\n    n 1/4 c ff\n    n 1/8\n    r",
+        "cns\n    n 1/2 d\n    n _ e pp",
+        "cnc\n    n\n    cns\n        n 3/4 f p\n        n",
+    )
+
+    def test_shared_converter(self):
+        c = mmml_converters.MMMLExpressionToEvent(True, keep_defaults=False)
+        expected_event_list = [
+            mmml_converters.MMMLExpressionToEvent(True)(mmml)
+            for mmml in self.mmml_tuple
+        ]
+        mmml_list = list(self.mmml_tuple) * 100
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            event_list = list(executor.map(c, mmml_list))
+        self.assertEqual(event_list, expected_event_list * 100)
+
+    def test_keep_defaults(self):
+        c = mmml_converters.MMMLExpressionToEvent(True)
+        self.assertEqual(c("n 1/4 d pp"), n("d", "1/4", "pp"))
+        self.assertEqual(c("n 1/2"), n("d", "1/2", "pp"))
+
+        c = mmml_converters.MMMLExpressionToEvent(True, keep_defaults=False)
+        self.assertEqual(c("n 1/4 d pp"), n("d", "1/4", "pp"))
+        self.assertEqual(c("n 1/2"), n(duration="1/2"))
+
+    def test_failed_conversion(self):
+        """Defaults of a failed conversion are never kept"""
+        c = mmml_converters.MMMLExpressionToEvent(True)
+        self.assertRaises(
+            mmml_utilities.NoDecoderExists, c, "cns\n    n 1/4 d pp\n    x"
+        )
+        self.assertEqual(c("n 1/2"), n(duration="1/2"))
+
+
+class MMMLExpressionToEventCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = mmml_utilities.LRUCache()
+        self.c = mmml_converters.MMMLExpressionToEvent(cache=self.cache)
+
+    def test_cache(self):
+        mmml = "cns\n    n 1/4 c\n    n 1/4 d"
+        e0 = self.c(mmml)
+        e1 = self.c(mmml)
+        self.assertEqual(e0, e1)
+        info = self.cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+        # Results of cache hits can be mutated safely
+        e1[0].duration = 3
+        self.assertNotEqual(e0, e1)
+        self.assertEqual(e0, self.c(mmml))
+
+    def test_cache_byte_size(self):
+        """Test that the byte size of a cache item is the size of its event"""
+
+        mmml = "cns\n" + "    n 1/4 c\n" * 100
+        self.c(mmml)
+        byte_size = self.cache.cache_info().byte_size
+        self.assertGreater(byte_size, len(pickle.dumps(self.c(mmml))))
+        self.assertGreater(byte_size, 10 * sys.getsizeof(mmml))
+
+        # Items which are bigger than the cache are dropped
+        cache = mmml_utilities.LRUCache(max_byte_size=byte_size - 1)
+        c = mmml_converters.MMMLExpressionToEvent(cache=cache)
+        self.assertEqual(c(mmml), self.c(mmml))
+        self.assertEqual(cache.cache_info().currsize, 0)
+
+    def test_cache_unpicklable_event(self):
+        def unpicklable(event_tuple):
+            return cns(tag=lambda: None)
+
+        mmml_converters.register_decoder(unpicklable)
+        self.addCleanup(mmml_converters.unregister_decoder, "unpicklable")
+        self.c("unpicklable")
+        self.assertEqual(self.cache.cache_info().currsize, 0)
+
+    def test_cache_with_defaults(self):
+        c = mmml_converters.MMMLExpressionToEvent(use_defaults=True, cache=self.cache)
+        self.assertEqual(c("n 1/4 c ff"), n("c", "1/4", "ff"))
+        self.assertEqual(c("n 1/2"), n("c", "1/2", "ff"))
+        self.assertEqual(c("n 1/4 d pp"), n("d", "1/4", "pp"))
+        # Defaults are different, so the cached result can't be used
+        self.assertEqual(c("n 1/2"), n("d", "1/2", "pp"))
+        c.reset_defaults()
+        self.assertEqual(c("n 1/4 c ff"), n("c", "1/4", "ff"))
+        self.assertEqual(self.cache.cache_info().hits, 1)
+        # Cache hits also set defaults
+        self.assertEqual(c("n 1/2"), n("c", "1/2", "ff"))
+        self.assertEqual(self.cache.cache_info().hits, 2)
+
+
+class IncrementalMMMLExpressionToEventTest(unittest.TestCase):
+    mmml = "cns\n    cns\n        n 1/4 c ff\n        n 1/4 d\n\n    cns\n        n 1/2 e\n    n 1/4"
+
+    def setUp(self):
+        self.expression_to_event = mmml_converters.MMMLExpressionToEvent(
+            True, keep_defaults=False
+        )
+        self.c = mmml_converters.IncrementalMMMLExpressionToEvent(
+            self.expression_to_event
+        )
+        self.c.convert(self.mmml)
+
+    def edit(self, start, stop, text):
+        event = self.c.edit(start, stop, text)
+        self.assertEqual(event, self.expression_to_event(self.c.expression))
+        return event
+
+    def test_edit(self):
+        c = mmml_converters.IncrementalMMMLExpressionToEvent()
+        previous_event = c.convert(self.mmml)
+        event = c.edit(4, 5, "        n 1/8 d")
+        self.assertEqual(event[0][1], n("d", "1/8"))
+        # Unchanged events are reused
+        self.assertIs(event[1], previous_event[1])
+
+    def test_edit_structure(self):
+        # Insert a block
+        self.edit(3, 3, "        cnc\n            n 1/8 f\n            r")
+        # Append to a block
+        self.edit(11, 11, "        r 1/4")
+        # Remove a block
+        self.edit(9, 12, "")
+        self.edit(1, 1, "# comment")
+        # Move an expression into the block of its previous sibling
+        self.assertEqual(len(self.edit(11, 12, "        n 1/4")), 1)
+
+    def test_defaults(self):
+        """Changed defaults are passed to the following expressions"""
+        event = self.edit(3, 4, "        n 1/4 c pp")
+        self.assertEqual(
+            [e.volume for e in (event[0][1], event[1][0], event[2])],
+            [music_parameters.WesternVolume("pp")] * 3,
+        )
+
+    def test_defaults_of_root_edit(self):
+        """Edits of the root start with the defaults of the first conversion"""
+        c = mmml_converters.IncrementalMMMLExpressionToEvent(
+            mmml_converters.MMMLExpressionToEvent(use_defaults=True)
+        )
+        event = c.convert("cns\n    n 1/4\n    n 1 c ff")
+        self.assertEqual(c.edit(1, 2, "cns"), event)
+        self.assertEqual(c.edit(1, 2, "cns a"), cns(list(event), tag="a"))
+
+    def test_error(self):
+        self.assertRaises(mmml_utilities.NoDecoderExists, self.c.edit, 4, 5, "    x")
+        self.assertRaises(mmml_utilities.MalformedMMML, self.c.edit, 4, 5, "n")
+        self.assertRaises(ValueError, self.c.edit, 3, 20, "")
+        # The expression is unchanged
+        self.assertEqual(self.c.expression, self.mmml)
+        self.edit(4, 5, "        n 1/8 d")
+
+    def test_mustache(self):
+        self.c.convert("cns\n    n {{duration}} c", duration="1/2")
+        self.assertEqual(
+            self.c.edit(3, 3, "    n {{duration}} d"),
+            cns([n("c", "1/2"), n("d", "1/2")]),
+        )
+
+
+@unittest.skipIf(numpy is None, "numpy isn't installed")
+class MMMLExpressionToNoteColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.c = mmml_converters.MMMLExpressionToNoteColumns(
+            mmml_converters.MMMLExpressionToEvent(use_defaults=True)
+        )
+        self.mmml = (
+            "cns\n"
+            "    n 1/4 c,e ff\n"
+            "    n _ 7/4\n"
+            "    r 0.5\n"
+            "    # comment\n"
+            "    n 3/2 _ _ articulation.name=.\n"
+            "    n"
+        )
+
+    def test_convert(self):
+        columns = self.c(self.mmml)
+        event = mmml_converters.MMMLExpressionToEvent(use_defaults=True)(self.mmml)
+        self.assertEqual(columns.duration.tolist(), [0.25, 1, 0.5, 1.5, 1.5])
+        self.assertEqual(columns.duration_numerator.tolist(), [1, 1, 1, 3, 3])
+        self.assertEqual(columns.duration_denominator.tolist(), [4, 1, 2, 2, 2])
+        self.assertEqual(columns.pitch_offset.tolist(), [0, 2, 3, 3, 3, 3])
+        self.assertEqual(
+            columns.frequency.tolist(),
+            [p.hertz for note in event for p in note.pitch_list],
+        )
+        self.assertEqual(
+            columns.midi_pitch_number.tolist(),
+            [p.midi_pitch_number for note in event for p in note.pitch_list],
+        )
+        self.assertEqual(
+            columns.amplitude.tolist(), [note.volume.amplitude for note in event]
+        )
+        # '_' is the default of the decoder, which is no pitch.
+        self.assertEqual(columns.is_rest.tolist(), [False, False, True, True, True])
+        self.assertEqual(columns.header_tuple[1], ("n", ("_", "7/4", "ff")))
+
+    def test_materialize(self):
+        event = mmml_converters.MMMLExpressionToEvent(use_defaults=True)(self.mmml)
+        columns = self.c(self.mmml)
+        self.assertEqual(list(columns.materialize()), list(event))
+        self.assertEqual(columns.materialize_note(2), event[2])
+
+    def test_defaults(self):
+        self.c("cns\n    n 1/8 d pp")
+        columns = self.c("cns\n    n")
+        self.assertEqual(columns.duration.tolist(), [0.125])
+        self.assertEqual(columns.header_tuple, (("n", ("1/8", "d", "pp")),))
+        c = mmml_converters.MMMLExpressionToNoteColumns()
+        self.assertEqual(c("cns\n    n 1/8 d\n    n").duration.tolist(), [0.125, 1])
+        self.assertEqual(len(c("cns").duration), 0)
+
+    def test_error(self):
+        self.assertRaises(ValueError, self.c, "cns\n    cns")
+        self.assertRaises(ValueError, self.c, "cns\n    n\n        n")
+        self.assertRaises(mmml_utilities.NoDecoderExists, self.c, "cns\n    x")
+        with self.assertRaises(mmml_utilities.InvalidArgumentCount) as context:
+            self.c("cns\n    r\n    r 1 2 3 4 5 6 7")
+        self.assertEqual(context.exception.line_number, 3)
+
+    def test_custom_note_decoder(self):
+        decoder_registry = mmml_converters.constants.DECODER_REGISTRY
+        self.addCleanup(mmml_converters.register_decoder, decoder_registry["n"], "n")
+
+        def n(event_tuple, duration, *pitch):
+            return music_events.NoteLike(list(pitch), duration)
+
+        mmml_converters.register_decoder(n)
+        c = mmml_converters.MMMLExpressionToNoteColumns()
+        columns = c("cns\n    n 1/4 c e")
+        self.assertEqual(columns.duration.tolist(), [0.25])
+        self.assertEqual(columns.header_tuple, (("n", ("1/4", "c", "e")),))
+        with self.assertRaises(mmml_utilities.InvalidArgumentCount) as context:
+            c("cns\n    n 1/4\n    n")
+        self.assertEqual(context.exception.line_number, 3)
+        with self.assertRaises(mmml_utilities.MalformedMMML) as context:
+            c("cns\n    n _ c")
+        self.assertEqual(
+            str(context.exception),
+            "Line 2: Required argument 'duration' of decoder 'n' can't be "
+            "skipped with '_'.",
+        )
+
+
+@unittest.skipIf(numpy is None, "needs numpy")
+class ColumnarNotesToMMMLExpressionTest(unittest.TestCase):
+    def setUp(self):
+        self.c = mmml_converters.ColumnarNotesToMMMLExpression()
+
+    def test_convert(self):
+        columns = (
+            numpy.array([0.25, 1, 0.25, 0.5]),
+            numpy.array(["c4", "e4", "3/2", "c4", "g4"]),
+            [0, 2, 3, 3, 5],
+            ["ff", "mf", "ff", "p"],
+            [False, False, False, True],
+        )
+        for compound in (
+            core_events.Consecution(),
+            core_events.Concurrence(tag="piano"),
+            core_events.Consecution(tempo=120),
+        ):
+            event = type(compound)(
+                [
+                    music_events.NoteLike(["c4", "e4"], 0.25, "ff"),
+                    music_events.NoteLike(["3/2"], 1, "mf"),
+                    music_events.NoteLike([], 0.25, "ff"),
+                    music_events.NoteLike([], 0.5, "p"),
+                ],
+                tag=compound.tag,
+                tempo=compound.tempo,
+            )
+            self.assertEqual(
+                self.c(*columns, compound=compound), mmml_converters.encode_event(event)
+            )
+
+    def test_convert_objects(self):
+        duration = numpy.array([fractions.Fraction(1, 3), 0.5, 0.5], dtype=object)
+        pitch = numpy.array(
+            [music_parameters.WesternPitch("d", 5), "d5", "d5"], dtype=object
+        )
+        event = core_events.Consecution(
+            [
+                music_events.NoteLike(p, d)
+                for p, d in zip(pitch.tolist(), duration.tolist())
+            ]
+        )
+        self.assertEqual(self.c(duration, pitch), mmml_converters.encode_event(event))
+
+    def test_convert_rests(self):
+        self.assertEqual(self.c([1, 2]), "cns\n\n    r 1 _ _ _\n    r 2 _ _ _\n")
+        self.assertEqual(self.c([]), "cns\n")
+        self.assertEqual(
+            self.c([], compound=core_events.Concurrence(tag="x")), "cnc x\n"
+        )
+
+    def test_write(self):
+        c = mmml_converters.ColumnarNotesToMMMLExpression(chunk_line_count=2)
+        chunk_list = []
+        c.write(list(range(1, 6)), chunk_list, ["c"] * 5)
+        self.assertEqual(len(chunk_list), 5)
+        self.assertEqual("".join(chunk_list), self.c(list(range(1, 6)), ["c"] * 5))
+
+    def test_error(self):
+        self.assertRaises(ValueError, self.c, [1, 2], ["c"])
+        self.assertRaises(ValueError, self.c, [1, 2], ["c"], [0, 1])
+        self.assertRaises(ValueError, self.c, [1, 2], ["c"], [0, 1, 2])
+        self.assertRaises(ValueError, self.c, [1], volume=["p", "p"])
+        self.assertRaises(ValueError, self.c, [[1]])
+
+
+class MMMLFileToEventTest(unittest.TestCase):
+    mmml = "cns\n    # comment\n    n 1/4 c\n\n    cnc\n        n 1/2 d\n"
+
+    def setUp(self):
+        self.c = mmml_converters.MMMLFileToEvent(use_defaults=True)
+        c = mmml_converters.MMMLExpressionToEvent(use_defaults=True)
+        self.expected_event = c(self.mmml)
+
+    def test_path(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "test.mmml")
+            with open(path, "w") as f:
+                f.write(self.mmml)
+            self.assertEqual(self.c(path), self.expected_event)
+
+    def test_file_object(self):
+        self.assertEqual(self.c(io.StringIO(self.mmml)), self.expected_event)
+
+    def test_mustache(self):
+        f = io.StringIO("cns\n    n {{duration}} c\n\n    cnc\n        n 1/2 d\n")
+        self.assertEqual(self.c(f, duration="1/4"), self.expected_event)
+
+    def test_no_expression(self):
+        self.assertRaises(mmml_utilities.MalformedMMML, self.c, io.StringIO(""))
+
+    def test_parse(self):
+        self.assertEqual(
+            self.c.materialize(self.c.parse(io.StringIO(self.mmml))),
+            self.expected_event,
+        )
+
+    def test_iter_events(self):
+        f = io.StringIO(self.mmml)
+        event_iterator = self.c.iter_events(f)
+        self.assertEqual(next(event_iterator), self.expected_event[0])
+        # Events are decoded while reading the file
+        self.assertLess(f.tell(), len(self.mmml))
+        self.assertEqual(list(event_iterator), list(self.expected_event[1:]))
+
+
+class _RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Record the generator of each executor job"""
+
+    def __init__(self):
+        super().__init__(2)
+        self.step_iterator_list = []
+
+    def submit(self, function, step_iterator):
+        self.step_iterator_list.append(step_iterator)
+        return super().submit(function, step_iterator)
+
+
+class AsyncMMMLFileToEventTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.mmml = "cns\n" + "    cns\n        n 1/4 c ff\n        r\n" * 50
+        self.expected_event = mmml_converters.MMMLExpressionToEvent(True)(self.mmml)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.mmml")
+        with open(self.path, "w") as f:
+            f.write(self.mmml)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_convert(self):
+        converter = mmml_converters.MMMLFileToEvent(True, keep_defaults=False)
+        for chunk_event_count in (1, 7, 1000):
+            c = mmml_converters.AsyncMMMLFileToEvent(
+                converter, chunk_event_count=chunk_event_count
+            )
+            self.assertEqual(await c.convert(self.path), self.expected_event)
+            self.assertEqual(
+                await c.convert(io.StringIO(self.mmml)), self.expected_event
+            )
+
+    async def test_mustache(self):
+        c = mmml_converters.AsyncMMMLFileToEvent()
+        self.assertEqual(
+            await c.convert(io.StringIO("n {{duration}} c"), duration="1/2"),
+            n("c", "1/2"),
+        )
+
+    async def test_error(self):
+        c = mmml_converters.AsyncMMMLFileToEvent()
+        with self.assertRaises(mmml_utilities.NoDecoderExists):
+            await c.convert(io.StringIO("cns\n    x"))
+
+    async def test_max_concurrency(self):
+        for max_concurrency, is_interleaved in ((None, True), (1, False)):
+            with _RecordingExecutor() as executor:
+                c = mmml_converters.AsyncMMMLFileToEvent(
+                    executor=executor,
+                    max_concurrency=max_concurrency,
+                    chunk_event_count=1,
+                )
+                self.assertEqual(
+                    await asyncio.gather(c.convert(self.path), c.convert(self.path)),
+                    [self.expected_event] * 2,
+                )
+            step_iterator_list = executor.step_iterator_list
+            change_count = sum(
+                s0 is not s1
+                for s0, s1 in zip(step_iterator_list, step_iterator_list[1:])
+            )
+            self.assertEqual(change_count > 1, is_interleaved)
+
+    async def test_cancel(self):
+        f = io.StringIO(self.mmml)
+        with _RecordingExecutor() as executor:
+            c = mmml_converters.AsyncMMMLFileToEvent(
+                executor=executor, chunk_event_count=1
+            )
+            task = asyncio.create_task(c.convert(f))
+            while len(executor.step_iterator_list) < 3:
+                await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        # No further step has been started after the cancellation
+        self.assertEqual(len(executor.step_iterator_list), 3)
+        self.assertLess(f.tell(), len(self.mmml))
+
+
+class CompiledMMMLFileToEventTest(unittest.TestCase):
+    mmml = "cns\n    n 1/4 c ff\n    n {{duration}}\n"
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.mmml")
+        self.write(self.mmml)
+        self.c = mmml_converters.CompiledMMMLFileToEvent(
+            mmml_converters.MMMLFileToEvent(True, keep_defaults=False)
+        )
+        self.compiled_path = os.path.join(self.directory.name, "test.mmmlc")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, mmml):
+        with open(self.path, "w") as f:
+            f.write(mmml)
+
+    def compile(self, duration="1/2", is_compiled=True):
+        """Convert file and test if it has been compiled again"""
+        inode = (
+            os.stat(self.compiled_path).st_ino
+            if os.path.exists(self.compiled_path)
+            else None
+        )
+        event = self.c(self.path, duration=duration)
+        self.assertEqual(os.stat(self.compiled_path).st_ino != inode, is_compiled)
+        return event
+
+    def test_convert(self):
+        self.compile()
+        self.assertEqual(
+            self.compile(is_compiled=False),
+            cns([n("c", "1/4", "ff"), n("c", "1/2", "ff")]),
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)), ["test.mmml", "test.mmmlc"]
+        )
+
+    def test_invalidation(self):
+        self.compile()
+        # Mustache data
+        self.compile("1/8")
+        self.compile("1/8", is_compiled=False)
+        # Content
+        self.write(self.mmml.replace("ff", "pp"))
+        self.compile("1/8")
+        # Decoders
+        mmml_converters.register_decoder(lambda event_tuple: cns(), "test_compiled")
+        self.addCleanup(mmml_converters.unregister_decoder, "test_compiled")
+        self.compile("1/8")
+        self.compile("1/8", is_compiled=False)
+        # Broken file
+        with open(self.compiled_path, "r+b") as f:
+            f.truncate(40)
+        self.compile("1/8")
+
+    def test_defaults(self):
+        self.c = mmml_converters.CompiledMMMLFileToEvent(
+            mmml_converters.MMMLFileToEvent(True)
+        )
+        self.write("n 1/4 c ff")
+        self.compile()
+        self.write("n 1/2")
+        self.assertEqual(self.compile(), n("c", "1/2", "ff"))
+        self.c._converter.reset_defaults()
+        # Defaults are different, so the compiled file can't be used
+        self.assertEqual(self.compile(), n(duration="1/2"))
+
+    def test_mustache_data_with_same_repr(self):
+        class Duration(str):
+            def __repr__(self):
+                return "Duration"
+
+        self.assertEqual(self.compile(Duration("1/4"))[1], n("c", "1/4", "ff"))
+        self.assertEqual(self.compile(Duration("1/2"))[1], n("c", "1/2", "ff"))
+        # Different mustache data which is rendered to the same
+        # expression can use the same compiled file.
+        self.compile(fractions.Fraction(1, 2), is_compiled=False)
+
+    def test_non_string_defaults(self):
+        get_key = mmml_converters.compiled._get_key
+        self.assertNotEqual(
+            get_key("n", {"n": (fractions.Fraction(1, 4),)}, True),
+            get_key("n", {"n": (fractions.Fraction(1, 2),)}, True),
+        )
+        self.assertNotEqual(
+            get_key("n", {"n": ("1/4",)}, True),
+            get_key("n", {"n": (fractions.Fraction(1, 4),)}, True),
+        )
+        # Defaults which can't be pickled can't be cached.
+        self.assertIsNone(get_key("n", {"n": (threading.Lock(),)}, True))
+
+    def test_unpicklable_event(self):
+        def unpicklable(event_tuple):
+            return cns(tag=threading.Lock())
+
+        mmml_converters.register_decoder(unpicklable)
+        self.addCleanup(mmml_converters.unregister_decoder, "unpicklable")
+        self.write("unpicklable")
+        self.assertIsInstance(self.c(self.path).tag, type(threading.Lock()))
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as d:
+            c = mmml_converters.CompiledMMMLFileToEvent(directory=d)
+            compiled_path = c.get_compiled_path(self.path)
+            self.assertEqual(os.path.dirname(compiled_path), d)
+            self.assertEqual(c(self.path, duration="1/2"), c(self.path, duration="1/2"))
+            self.assertEqual(os.listdir(d), [os.path.basename(compiled_path)])
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
+    def test_file_object(self):
+        self.assertEqual(self.c(io.StringIO("r 1/4")), n(duration="1/4"))
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
 
 class EventToMMMLExpressionTest(unittest.TestCase):
     def setUp(self):
@@ -194,6 +1063,43 @@ class EventToMMMLExpressionTest(unittest.TestCase):
         note.grace_note_consecution.append(n("c", "1/4", "p"))
         self.assertEqual(self.c(note), "n 1/4 d4 p _ _\n\n    n 1/4 c4 p _ _\n")
 
+    def test_encoder_registry(self):
+        """Builtin encoders return strings, which other encoders can embed"""
+
+        encoder_registry = mmml_converters.constants.ENCODER_REGISTRY
+        note = n("d", "1/4", "p")
+        note.grace_note_consecution.append(n("c", "1/4", "p"))
+        for event in (note, n("c"), chn(duration=1), cns([n(), cnc([n("e")])])):
+            self.assertEqual(encoder_registry[type(event)](event), self.c(event))
+        self.assertEqual(
+            encoder_registry[music_events.NoteLike](n("c")), "n 1 c4 _ _ _"
+        )
+
+        note_like = encoder_registry[music_events.NoteLike]
+        self.addCleanup(
+            mmml_converters.register_encoder(music_events.NoteLike), note_like
+        )
+        mmml_converters.register_encoder(music_events.NoteLike)(
+            lambda note: f"{note_like(note)} # note"
+        )
+        self.assertEqual(
+            self.c(cns([n("c"), chn(duration=1)])),
+            "cns\n\n    n 1 c4 _ _ _ # note\n    r 1 _ _ _ # note\n",
+        )
+
+    def test_render_encoded(self):
+        self.assertEqual(
+            mmml_converters.render_encoded(
+                mmml_converters.MMMLHeaderAndBlock("cns", [n(), cnc([n("e")])])
+            ),
+            self.c(cns([n(), cnc([n("e")])])),
+        )
+        self.assertEqual(
+            mmml_converters.render_encoded(mmml_converters.MMMLHeaderAndBlock("n 1")),
+            "n 1",
+        )
+        self.assertEqual(mmml_converters.render_encoded("n 1\nr 1"), "n 1\nr 1")
+
     def test_note_like_just_intonation_pitch_1_1(self):
         """Ensure 1/1 JI pitch is rendered as '1/1' and not as '1',
         because otherwise the 'MMMLExpressionToEvent' converter
@@ -211,7 +1117,9 @@ class EventToMMMLExpressionTest(unittest.TestCase):
     def test_consecution(self):
         self.assertEqual(self.c(cns()), "cns\n")
         self.assertEqual(self.c(cns(tag="abc")), "cns abc\n")
-        self.assertEqual(self.c(cns([n(), n()])), "cns\n\n    r 1 _ _ _\n    r 1 _ _ _\n")
+        self.assertEqual(
+            self.c(cns([n(), n()])), "cns\n\n    r 1 _ _ _\n    r 1 _ _ _\n"
+        )
         self.assertEqual(
             self.c(cns([n(), cns([n()])])),
             "cns\n\n    r 1 _ _ _\n    cns\n\n        r 1 _ _ _\n\n",
@@ -221,16 +1129,289 @@ class EventToMMMLExpressionTest(unittest.TestCase):
             self.c(cns(tempo=[[0, 20], [1, 30]])), "cns _ [[0,20],[1,30]]\n"
         )
 
+    def test_very_deep_nesting(self):
+        """Test that nesting depth isn't limited by Python's recursion limit"""
+
+        depth = sys.getrecursionlimit() * 2
+        event = n()
+        for _ in range(depth):
+            event = cns([event])
+        mmml = self.c(event)
+        line_list = mmml.split("\n")
+        self.assertEqual(len(line_list), (depth * 3) + 1)
+        indentation = mmml_converters.constants.INDENTATION
+        self.assertEqual(line_list[depth * 2], f"{indentation * depth}r 1 _ _ _")
+
+    def test_write(self):
+        event = cnc([cns([n("c", "1/4"), n()], tag="a"), cns([cns([n()])])])
+        expected_mmml = self.c(event)
+        f = io.StringIO()
+        self.c.write(event, f)
+        self.assertEqual(f.getvalue(), expected_mmml)
+        chunk_list = []
+        mmml_converters.write_event(event, chunk_list, chunk_line_count=2)
+        self.assertGreater(len(chunk_list), 1)
+        self.assertEqual("".join(chunk_list), expected_mmml)
+
+    def test_deduplicate(self):
+        bar = cns([n("c", "1/4"), cnc([n("d", "1/8"), n()])], tag="bar")
+        # Repetitions of the same object and of equal objects
+        event = cnc(
+            [cns([bar, bar, bar.copy()]), cns([bar]), cnc(), cnc([cnc(), cns([])])]
+        )
+        c = mmml_converters.EventToMMMLExpression(deduplicate=True)
+        self.assertEqual(c(event), self.c(event))
+        self.assertEqual(
+            c.deduplication_info,
+            mmml_converters.DeduplicationInfo(
+                event_count=27,
+                encoded_event_count=17,
+                unique_subtree_count=11,
+                reused_subtree_count=8,
+            ),
+        )
+        chunk_list = []
+        c.write(event, chunk_list)
+        self.assertEqual("".join(chunk_list), self.c(event))
+
+    def test_parallel(self):
+        event = cnc(
+            [cns([n("c", "1/4"), n()], tag="a"), cns([cns([n()]), n("d")]), cnc()]
+        )
+        expected_mmml = self.c(event)
+        for use_processes in (False, True):
+            for parallel_threshold in (1, 100):
+                c = mmml_converters.EventToMMMLExpression(
+                    max_workers=2,
+                    use_processes=use_processes,
+                    parallel_threshold=parallel_threshold,
+                    chunk_event_count=2,
+                )
+                self.assertEqual(c(event), expected_mmml)
+        # Events without block are always encoded serially
+        self.assertEqual(c(n()), self.c(n()))
+        self.assertEqual(c(cns()), self.c(cns()))
+
+    def test_parallel_mp_context(self):
+        event = cnc([cns([n("c", "1/4"), n()]), cns([n("d")]), cnc()])
+        c = mmml_converters.EventToMMMLExpression(
+            max_workers=2,
+            parallel_threshold=1,
+            chunk_event_count=2,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.assertEqual(c(event), self.c(event))
+
     def test_concurrence(self):
         self.assertEqual(self.c(cnc()), "cnc\n")
         self.assertEqual(self.c(cnc(tag="abc")), "cnc abc\n")
-        self.assertEqual(self.c(cnc([n(), n()])), "cnc\n\n    r 1 _ _ _\n    r 1 _ _ _\n")
+        self.assertEqual(
+            self.c(cnc([n(), n()])), "cnc\n\n    r 1 _ _ _\n    r 1 _ _ _\n"
+        )
         self.assertEqual(
             self.c(cnc([n(), cnc([n()])])),
             "cnc\n\n    r 1 _ _ _\n    cnc\n\n        r 1 _ _ _\n\n",
         )
 
 
+class IncrementalEventToMMMLExpressionTest(unittest.TestCase):
+    def setUp(self):
+        self.c = mmml_converters.IncrementalEventToMMMLExpression()
+        self.event = cns(
+            [
+                cns([n("c", "1/4"), n("d", "1/4")]),
+                cnc([n("e", "1/2"), cns([n("f", "1/2")])]),
+            ]
+        )
+
+    def assertConverted(self, event, encoded_event_count, c=None):
+        c = c or self.c
+        self.assertEqual(c(event), mmml_converters.encode_event(event))
+        self.assertEqual(c.encoded_event_count, encoded_event_count)
+
+    def test_convert(self):
+        self.assertConverted(self.event, 8)
+        self.assertConverted(self.event, 0)
+        self.assertConverted(n(), 1)
+        self.assertConverted(cns(), 1)
+
+    def test_changed_attribute(self):
+        self.assertConverted(self.event, 8)
+        self.event[0][1].pitch_list = "g"
+        self.assertConverted(self.event, 1)
+        self.event[1].tag = "voice"
+        self.assertConverted(self.event, 1)
+        self.event[1][1][0] = n("a", "1/2")
+        self.assertConverted(self.event, 1)
+
+    def test_changed_state(self):
+        self.assertConverted(self.event, 8)
+        self.event[0][0].playing_indicator_collection.articulation.name = "."
+        self.assertConverted(self.event, 1)
+        self.event[0][0].pitch_list[0].octave = 5
+        self.assertConverted(self.event, 1)
+        self.event[0][0].pitch_list.append(music_parameters.WesternPitch("e"))
+        self.assertConverted(self.event, 1)
+        self.event[0][1].grace_note_consecution.append(n("c", "1/8"))
+        self.assertConverted(self.event, 2)
+        self.event[0][1].grace_note_consecution[0].volume = "p"
+        self.assertConverted(self.event, 1)
+
+    def test_changed_block(self):
+        self.assertConverted(self.event, 8)
+        self.event[0].append(n("e", "1/4"))
+        self.assertConverted(self.event, 1)
+        del self.event[1][1]
+        self.assertConverted(self.event, 0)
+        self.event[0].reverse()
+        self.assertConverted(self.event, 0)
+        # Events can be moved to another depth
+        self.event[1].append(self.event[0].pop())
+        self.assertConverted(self.event, 0)
+        # Only the MMML of the last converted event is remembered
+        self.assertConverted(self.event[1], 0)
+        self.assertConverted(self.event, 4)
+
+    def test_repeated_event(self):
+        bar = cns([n("c", "1/4")])
+        event = cns([bar, bar, cns([bar])])
+        self.assertConverted(event, 4)
+        bar[0].pitch_list = "d"
+        self.assertConverted(event, 1)
+
+    def test_check_state(self):
+        c = mmml_converters.IncrementalEventToMMMLExpression(check_state=False)
+        self.assertConverted(self.event, 8, c)
+        note = self.event[0][0]
+        note.pitch_list = "g"
+        self.assertConverted(self.event, 1, c)
+        note.playing_indicator_collection.articulation.name = "."
+        self.assertNotEqual(c(self.event), mmml_converters.encode_event(self.event))
+        c.invalidate(note)
+        self.assertConverted(self.event, 1, c)
+        c.invalidate()
+        self.assertConverted(self.event, 8, c)
+
+
+class EventToMMMLFileTest(unittest.TestCase):
+    def setUp(self):
+        self.event = cns([n("c", "1/4"), cnc([n("d", "1/2"), n()])] * 20)
+        self.mmml = mmml_converters.EventToMMMLExpression()(self.event)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.mmml")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_path(self):
+        mmml_converters.EventToMMMLFile(buffer_size=16).convert(self.event, self.path)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), self.mmml)
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+        self.assertEqual(mmml_converters.MMMLFileToEvent()(self.path), self.event)
+
+    def test_file_object(self):
+        f = io.BytesIO()
+        mmml_converters.EventToMMMLFile().convert(self.event, f)
+        self.assertEqual(f.getvalue().decode("utf-8"), self.mmml)
+
+    def test_buffer_size_counts_bytes(self):
+        class File(io.BytesIO):
+            def __init__(self):
+                super().__init__()
+                self.write_list = []
+
+            def write(self, data):
+                self.write_list.append(data)
+                return super().write(data)
+
+        f = File()
+        sink = mmml_converters.backends._BufferedBinarySink(f, 4)
+        # 3 characters, but 6 bytes
+        sink.write("äöü")
+        self.assertEqual(f.write_list, ["äöü".encode("utf-8")])
+        sink.write("abc")
+        self.assertEqual(len(f.write_list), 1)
+        sink.flush()
+        self.assertEqual(f.getvalue().decode("utf-8"), "äöüabc")
+
+    def test_compress(self):
+        mmml_converters.EventToMMMLFile(compress=True).convert(self.event, self.path)
+        with gzip.open(self.path, "rt") as f:
+            self.assertEqual(f.read(), self.mmml)
+
+    def test_atomic(self):
+        class NoEncoder(chn):
+            pass
+
+        with open(self.path, "w") as f:
+            f.write("n")
+        for c in (
+            mmml_converters.EventToMMMLFile(buffer_size=1),
+            mmml_converters.EventToMMMLFile(buffer_size=1, compress=True),
+        ):
+            self.assertRaises(
+                mmml_utilities.NoEncoderExists,
+                c.convert,
+                cns([n(), NoEncoder(1)]),
+                self.path,
+            )
+            # Previous file is still there
+            with open(self.path) as f:
+                self.assertEqual(f.read(), "n")
+            self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
+
+class AsyncEventToMMMLFileTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.event = cns([n("c", "1/4"), cnc([n("d", "1/2"), n()])] * 200)
+        self.mmml = mmml_converters.EventToMMMLExpression()(self.event)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.mmml")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_convert(self):
+        c = mmml_converters.AsyncEventToMMMLFile(chunk_event_count=7)
+        await c.convert(self.event, self.path)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), self.mmml)
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
+        f = io.BytesIO()
+        await c.convert(self.event, f)
+        self.assertEqual(f.getvalue().decode("utf-8"), self.mmml)
+
+    async def test_compress(self):
+        c = mmml_converters.AsyncEventToMMMLFile(
+            mmml_converters.EventToMMMLFile(compress=True)
+        )
+        await c.convert(self.event, self.path)
+        with gzip.open(self.path, "rt") as f:
+            self.assertEqual(f.read(), self.mmml)
+
+    async def test_cancel(self):
+        with open(self.path, "w") as f:
+            f.write("n")
+        with _RecordingExecutor() as executor:
+            c = mmml_converters.AsyncEventToMMMLFile(
+                mmml_converters.EventToMMMLFile(buffer_size=1),
+                executor=executor,
+                chunk_event_count=1,
+            )
+            task = asyncio.create_task(c.convert(self.event, self.path))
+            while len(executor.step_iterator_list) < 3:
+                await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        # Previous file is still there and the temporary file is removed
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "n")
+        self.assertEqual(os.listdir(self.directory.name), ["test.mmml"])
+
+
 class ParameterToMMMLStringTest(unittest.TestCase):
     def test_pitch_interval(self):
         c = mmml_converters.PitchIntervalToMMMLString()
@@ -238,3 +1419,51 @@ class ParameterToMMMLStringTest(unittest.TestCase):
         _(music_parameters.WesternPitchInterval("p4"), "p4")
         _(music_parameters.JustIntonationPitch("3/2"), "3/2")
         _(music_parameters.DirectPitchInterval(200), "200")
+
+    def test_indicator_collection(self):
+        c = mmml_converters.IndicatorCollectionToMMMLString()
+        pic = music_parameters.PlayingIndicatorCollection()
+        self.assertEqual(c.convert(pic), "_")
+        pic.tie.is_active = True
+        pic.articulation.name = ">"
+        self.assertEqual(c.convert(pic), "tie.is_active=True;articulation.name=>")
+        # Cached results must follow changes of the indicators
+        pic.articulation.name = "."
+        self.assertEqual(c.convert(pic), "tie.is_active=True;articulation.name=.")
+        pic.articulation.name = None
+        pic.tie.is_active = False
+        self.assertEqual(c.convert(pic), "_")
+        # Equal values of different types are rendered differently
+        for index in (1, 1.0, True):
+            pic.cue.index = index
+            self.assertEqual(c.convert(pic), f"cue.index={index}")
+        # Equal floats can also be rendered differently
+        for index in (0.0, -0.0, 0.0):
+            pic.cue.index = index
+            self.assertEqual(c.convert(pic), f"cue.index={index}")
+
+    def test_indicator_collection_ottava_0(self):
+        c = mmml_converters.IndicatorCollectionToMMMLString()
+        nic = music_parameters.NotationIndicatorCollection()
+        for octave_count, mmml in ((1, "ottava.octave_count=1"), (0, "_")):
+            nic.ottava.octave_count = octave_count
+            self.assertEqual(c.convert(nic), mmml)
+
+    def test_indicator_collection_custom_indicator(self):
+        class Glow(music_parameters.abc.ExplicitPlayingIndicator):
+            brightness = 3
+
+            def get_arguments_dict(self):
+                return {"brightness": self.brightness}
+
+        class Collection(music_parameters.PlayingIndicatorCollection):
+            pass
+
+        Collection.register(Glow, "glow")
+        c = mmml_converters.IndicatorCollectionToMMMLString()
+        pic = Collection()
+        self.assertEqual(c.convert(pic), "_")
+        pic.glow.is_active = True
+        self.assertEqual(c.convert(pic), "glow.brightness=3")
+        pic.glow.brightness = 4
+        self.assertEqual(c.convert(pic), "glow.brightness=4")
@@ -0,0 +1,93 @@
+import multiprocessing
+import pickle
+import unittest
+
+from mutwo import mmml_utilities
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_maxsize(self):
+        cache = mmml_utilities.LRUCache(maxsize=2)
+        cache.set(0, "a")
+        cache.set(1, "b")
+        self.assertEqual(cache[0], "a")
+        cache.set(2, "c")
+        # '1' is the least recently used item
+        self.assertNotIn(1, cache)
+        self.assertIn(0, cache)
+        self.assertIn(2, cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_max_byte_size(self):
+        cache = mmml_utilities.LRUCache(maxsize=None, max_byte_size=10)
+        cache.set(0, "a", 4)
+        cache.set(1, "b", 4)
+        cache.set(2, "c", 4)
+        self.assertNotIn(0, cache)
+        self.assertEqual(cache.cache_info().byte_size, 8)
+        # Too big for the cache
+        cache.set(3, "d", 11)
+        self.assertNotIn(3, cache)
+        # Override item
+        cache.set(2, "c", 2)
+        self.assertEqual(cache.cache_info().byte_size, 6)
+
+    def test_cache_info(self):
+        cache = mmml_utilities.LRUCache(maxsize=1)
+        cache.set(0, "a", 1)
+        cache[0]
+        self.assertRaises(KeyError, cache.__getitem__, 1)
+        cache.set(1, "b", 1)
+        self.assertEqual(
+            cache.cache_info(), mmml_utilities.CacheInfo(1, 1, 1, 1, 1, None, 1)
+        )
+        cache.cache_clear()
+        self.assertEqual(
+            cache.cache_info(), mmml_utilities.CacheInfo(0, 0, 0, 1, 0, None, 0)
+        )
+
+
+class ExceptionTest(unittest.TestCase):
+    def test_pickle(self):
+        for exception in (
+            mmml_utilities.MalformedMMML("bad", 3),
+            mmml_utilities.InvalidArgumentCount("n", 8, 0, 7, 2),
+            mmml_utilities.NoDecoderExists("x", 1),
+        ):
+            e = pickle.loads(pickle.dumps(exception))
+            self.assertEqual(type(e), type(exception))
+            self.assertEqual(str(e), str(exception))
+            self.assertEqual(e.line_number, exception.line_number)
+
+
+class DecoderRegistryTest(unittest.TestCase):
+    def test_unregister_decoder(self):
+        registry = mmml_utilities.DecoderRegistry()
+        registry.register_decoder(lambda event_tuple: None, "x")
+        self.assertIn("x", registry)
+        registry.unregister_decoder("x")
+        self.assertNotIn("x", registry)
+        self.assertRaises(KeyError, registry.unregister_decoder, "x")
+
+
+class ParallelMapTest(unittest.TestCase):
+    def test_parallel_map(self):
+        for use_processes in (False, True):
+            self.assertEqual(
+                mmml_utilities.parallel_map(
+                    divmod, 10, [1, 2, 3, 4], max_workers=2, use_processes=use_processes
+                ),
+                [(10, 0), (5, 0), (3, 1), (2, 2)],
+            )
+
+    def test_parallel_map_with_mp_context(self):
+        self.assertEqual(
+            mmml_utilities.parallel_map(
+                divmod,
+                10,
+                [1, 2, 3],
+                max_workers=2,
+                mp_context=multiprocessing.get_context("spawn"),
+            ),
+            [(10, 0), (5, 0), (3, 1)],
+        )